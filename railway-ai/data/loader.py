@@ -97,6 +97,17 @@ class RailwayDataLoader:
                 
         return self.data_tables
     
+    def execute_query(self, query, params=None):
+        """Run a read query on this loader's connection and return a DataFrame"""
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                return pd.read_sql_query(query, self.conn, params=params)
+        except Exception:
+            # Leave the connection usable for the next query
+            self.conn.rollback()
+            raise
+    
     def get_table_data(self, table_name):
         """Get specific table data"""
         return self.data_tables.get(table_name, pd.DataFrame())
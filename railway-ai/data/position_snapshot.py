@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - LIVE POSITION SNAPSHOT
+==========================================
+In-memory snapshot of current train positions, refreshed in the background
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Latest report per train in the last hour; the train's status is its most
+# recent movement (one row via LATERAL, instead of a join fanning out per movement)
+LIVE_POSITIONS_QUERY = """
+SELECT
+    latest.train_id,
+    t.name AS train_name,
+    s1.lat AS from_lat,
+    s1.lon AS from_lng,
+    s2.lat AS to_lat,
+    s2.lon AS to_lng,
+    latest.speed_kmph,
+    tm.status,
+    t.priority,
+    t.type,
+    tr.distance_km,
+    latest.position_km,
+    latest.timestamp
+FROM (
+    SELECT DISTINCT ON (train_id) train_id, track_id, position_km, speed_kmph, timestamp
+    FROM real_time_positions
+    WHERE timestamp > NOW() - INTERVAL '1 hour'
+    ORDER BY train_id, timestamp DESC
+) latest
+JOIN trains t ON latest.train_id = t.id
+JOIN tracks tr ON latest.track_id = tr.id
+JOIN stations s1 ON tr.from_station = s1.id
+JOIN stations s2 ON tr.to_station = s2.id
+LEFT JOIN LATERAL (
+    SELECT status FROM train_movements m
+    WHERE m.train_id = latest.train_id
+    ORDER BY m.entry_time DESC NULLS LAST
+    LIMIT 1
+) tm ON TRUE
+ORDER BY latest.timestamp DESC
+LIMIT %(limit)s
+"""
+
+POSITION_FIELDS = ['train_id', 'train_name', 'lat', 'lng', 'speed', 'status', 'priority', 'type']
+
+
+def interpolate_positions(rows):
+    """Map fields of every train, interpolating lat/lng along its track (vectorized)"""
+    distance = pd.to_numeric(rows['distance_km'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    position = pd.to_numeric(rows['position_km'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        progress = np.where(distance > 0, np.minimum(position / distance, 1.0), 0.0)
+
+    from_lat = rows['from_lat'].to_numpy(dtype=float)
+    from_lng = rows['from_lng'].to_numpy(dtype=float)
+    return pd.DataFrame({
+        'train_id': rows['train_id'].astype(int).to_numpy(),
+        'train_name': rows['train_name'].to_numpy(),
+        'lat': from_lat + (rows['to_lat'].to_numpy(dtype=float) - from_lat) * progress,
+        'lng': from_lng + (rows['to_lng'].to_numpy(dtype=float) - from_lng) * progress,
+        'speed': pd.to_numeric(rows['speed_kmph'], errors='coerce').fillna(0).to_numpy(dtype=float),
+        'status': rows['status'].fillna('UNKNOWN').to_numpy(),
+        'priority': pd.to_numeric(rows['priority'], errors='coerce').fillna(0).astype(int).to_numpy(),
+        'type': rows['type'].to_numpy()
+    })
+
+
+class PositionSnapshot:
+    """One immutable refresh result: the positions frame, its JSON body and ETag"""
+
+    def __init__(self, positions, version, refreshed_at):
+        self.positions = positions
+        self.version = version
+        self.refreshed_at = refreshed_at
+
+        records = [dict(zip(POSITION_FIELDS, values))
+                   for values in zip(*(positions[field].tolist() for field in POSITION_FIELDS))]
+        self.body = json.dumps(records, separators=(',', ':')).encode('utf-8')
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=16).hexdigest() + '"'
+
+
+class PositionSnapshotCache:
+    """Keeps the current live-positions snapshot in memory.
+
+    A background task re-runs the positions query every
+    `refresh_seconds` on one long-lived loader connection (in a worker
+    thread, so the event loop keeps serving) and swaps in the new
+    snapshot. Requests read the current snapshot only, so any number of
+    polling clients costs one query per refresh interval. The version
+    only moves when the content (and therefore the ETag) changes.
+    """
+
+    def __init__(self, loader_factory, refresh_seconds=2.0, limit=100):
+        self.loader_factory = loader_factory
+        self.refresh_seconds = refresh_seconds
+        self.limit = limit
+
+        self.snapshot = None
+        self.loader = None
+        self.last_error = None
+        self.stats = {'refreshes': 0, 'changes': 0, 'failures': 0, 'last_refresh_seconds': 0.0}
+        self._task = None
+        self._ready = asyncio.Event()
+        self._listeners = []
+
+    def refresh(self):
+        """Run the query and swap in a new snapshot; returns True if the content changed"""
+        started = time.perf_counter()
+        if self.loader is None:
+            self.loader = self.loader_factory()
+        rows = self.loader.execute_query(LIVE_POSITIONS_QUERY, params={'limit': self.limit})
+        positions = interpolate_positions(rows)
+
+        version = self.snapshot.version if self.snapshot is not None else 0
+        snapshot = PositionSnapshot(positions, version + 1, datetime.now())
+        changed = self.snapshot is None or snapshot.etag != self.snapshot.etag
+        if changed:
+            self.snapshot = snapshot
+            self.stats['changes'] += 1
+        self.stats['refreshes'] += 1
+        self.stats['last_refresh_seconds'] = time.perf_counter() - started
+        return changed
+
+    def add_listener(self, callback):
+        """Call `callback(snapshot)` on the event loop after every content change"""
+        self._listeners.append(callback)
+
+    async def _run(self):
+        while True:
+            try:
+                changed = await asyncio.to_thread(self.refresh)
+                self.last_error = None
+                self._ready.set()
+                if changed:
+                    for callback in self._listeners:
+                        callback(self.snapshot)
+            except asyncio.CancelledError:
+                raise
+            except (Exception, SystemExit) as e:
+                # establish_database_connection exits on failure; keep serving the
+                # last good snapshot and reconnect on the next refresh instead
+                self.stats['failures'] += 1
+                if self.last_error is None:
+                    print(f"❌ Live position refresh failed: {e}")
+                self.last_error = str(e) or type(e).__name__
+                self._discard_loader()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        """Start the background refresher on the running event loop"""
+        if self._task is None:
+            self._ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def current(self, timeout=5.0):
+        """The current snapshot, waiting briefly for the first refresh"""
+        if self.snapshot is None:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.snapshot
+
+    async def stop(self):
+        """Stop the refresher and close its connection"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._discard_loader()
+
+    def _discard_loader(self):
+        if self.loader is not None:
+            try:
+                self.loader.conn.close()
+            except Exception:
+                pass
+            self.loader = None
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - LIVE POSITION STREAM
+========================================
+Quantised, delta-encoded position updates pushed to map clients as server-sent events
+"""
+
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+
+# Quantisation: lat/lng in 1e-5 degrees (about 1 m), speed in whole km/h
+LATLNG_SCALE = 100000
+SPEED_SCALE = 1
+
+STATE_FIELDS = ['lat', 'lng', 'speed', 'status']
+STATIC_FIELDS = ['train_name', 'priority', 'type']
+
+
+def quantise_positions(positions):
+    """Integer lat/lng/speed per train, indexed by train_id"""
+    positions = positions.drop_duplicates('train_id')
+    return pd.DataFrame({
+        'lat': np.round(positions['lat'].to_numpy(dtype=float) * LATLNG_SCALE).astype(np.int64),
+        'lng': np.round(positions['lng'].to_numpy(dtype=float) * LATLNG_SCALE).astype(np.int64),
+        'speed': np.round(positions['speed'].to_numpy(dtype=float) * SPEED_SCALE).astype(np.int64),
+        'status': positions['status'].to_numpy(),
+        'train_name': positions['train_name'].to_numpy(),
+        'priority': positions['priority'].to_numpy(),
+        'type': positions['type'].to_numpy()
+    }, index=pd.Index(positions['train_id'].to_numpy(), name='train_id'))
+
+
+def sse_message(event, data, event_id=None):
+    """One server-sent event as bytes"""
+    lines = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{lines}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode('utf-8')
+
+
+class PositionDeltaEncoder:
+    """Turns successive position snapshots into quantised deltas.
+
+    `state` holds the quantised fleet as last broadcast. A delta lists
+    trains that appeared (full record), trains whose quantised position,
+    speed or status changed (as [train_id, dlat, dlng, dspeed, status or
+    null if unchanged]) and trains that left. Movement below the
+    quantisation step produces no update at all.
+    """
+
+    def __init__(self):
+        self.state = None
+        self.version = 0
+
+    @staticmethod
+    def _records(frame):
+        return [[train_id, lat, lng, speed, status, name, priority, train_type]
+                for train_id, lat, lng, speed, status, name, priority, train_type in zip(
+                    frame.index.tolist(), frame['lat'].tolist(), frame['lng'].tolist(),
+                    frame['speed'].tolist(), frame['status'].tolist(), frame['train_name'].tolist(),
+                    frame['priority'].tolist(), frame['type'].tolist())]
+
+    def full(self):
+        """The whole fleet as one message payload"""
+        return {
+            'v': self.version,
+            'scale': {'latlng': LATLNG_SCALE, 'speed': SPEED_SCALE},
+            'fields': ['train_id', 'lat', 'lng', 'speed', 'status'] + STATIC_FIELDS,
+            'trains': self._records(self.state) if self.state is not None else []
+        }
+
+    def encode(self, positions):
+        """Advance to a new snapshot; returns the delta payload, or None if nothing changed"""
+        current = quantise_positions(positions)
+        previous = self.state
+        self.state = current
+        if previous is None:
+            self.version += 1
+            return {'v': self.version, 'added': self._records(current), 'changed': [], 'removed': []}
+
+        kept = current.index.isin(previous.index)
+        added = current[~kept]
+        removed = previous.index[~previous.index.isin(current.index)]
+
+        now = current[kept]
+        before = previous.reindex(now.index)
+        d_lat = now['lat'].to_numpy() - before['lat'].to_numpy()
+        d_lng = now['lng'].to_numpy() - before['lng'].to_numpy()
+        d_speed = now['speed'].to_numpy() - before['speed'].to_numpy()
+        status_changed = now['status'].to_numpy() != before['status'].to_numpy()
+        moved = (d_lat != 0) | (d_lng != 0) | (d_speed != 0) | status_changed
+
+        if not moved.any() and added.empty and removed.empty:
+            return None
+
+        rows = np.flatnonzero(moved)
+        statuses = np.where(status_changed[rows], now['status'].to_numpy()[rows], None)
+        changed = [list(values) for values in zip(
+            now.index[rows].tolist(), d_lat[rows].tolist(), d_lng[rows].tolist(),
+            d_speed[rows].tolist(), statuses.tolist())]
+
+        self.version += 1
+        return {'v': self.version, 'added': self._records(added), 'changed': changed, 'removed': removed.tolist()}
+
+
+class StreamClient:
+    """One connected map client with its own bounded outgoing queue"""
+
+    def __init__(self, max_pending):
+        # Two spare slots for the drop notice and end-of-stream marker
+        self.queue = asyncio.Queue(maxsize=max_pending + 2)
+        self.dropped = False
+        self.sent = 0
+
+
+class PositionStreamHub:
+    """Fans position deltas out to streaming clients.
+
+    Each snapshot change is delta-encoded and serialized once, and the
+    same bytes are queued for every client, so server work grows with the
+    change rate rather than with clients x fleet size. Every client has a
+    bounded queue; a client that falls `max_pending` messages behind is
+    dropped (its stream ends) instead of buffering without limit, and on
+    reconnecting starts again from a full snapshot.
+    """
+
+    def __init__(self, max_pending=30, keepalive_seconds=15.0):
+        self.max_pending = max_pending
+        self.keepalive_seconds = keepalive_seconds
+        self.encoder = PositionDeltaEncoder()
+        self.clients = set()
+        self.stats = {'connected': 0, 'dropped': 0, 'deltas': 0, 'last_delta_bytes': 0}
+
+    def publish(self, snapshot):
+        """Snapshot listener: encode the change once and queue it for every client"""
+        delta = self.encoder.encode(snapshot.positions)
+        if delta is None:
+            return
+        message = sse_message('delta', delta, self.encoder.version)
+        self.stats['deltas'] += 1
+        self.stats['last_delta_bytes'] = len(message)
+
+        for client in list(self.clients):
+            if client.queue.qsize() >= self.max_pending:
+                self._drop(client)
+            else:
+                client.queue.put_nowait(message)
+
+    def _drop(self, client):
+        """Disconnect a slow consumer; it resyncs from a full snapshot when it reconnects"""
+        client.dropped = True
+        self.clients.discard(client)
+        while not client.queue.empty():
+            client.queue.get_nowait()
+        client.queue.put_nowait(sse_message('dropped', {'reason': 'slow consumer'}))
+        client.queue.put_nowait(None)
+        self.stats['dropped'] += 1
+
+    def subscribe(self):
+        """Register a client; returns it with the full-snapshot message it starts from"""
+        client = StreamClient(self.max_pending)
+        self.clients.add(client)
+        self.stats['connected'] += 1
+        return client, sse_message('snapshot', self.encoder.full(), self.encoder.version)
+
+    def unsubscribe(self, client):
+        self.clients.discard(client)
+
+    async def stream(self):
+        """Event stream for one client: the full snapshot, then deltas as they happen"""
+        client, snapshot = self.subscribe()
+        try:
+            yield snapshot
+            while True:
+                try:
+                    message = await asyncio.wait_for(client.queue.get(), self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                client.sent += 1
+                yield message
+        finally:
+            self.unsubscribe(client)
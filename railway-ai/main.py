@@ -295,7 +295,10 @@ class DarnexRailwayAI:
             integrator = TrackMonitoringIntegrator()
             
             # Run integrated track monitoring
-            results = integrator.run_integrated_track_monitoring()
+            try:
+                results = integrator.run_integrated_track_monitoring()
+            finally:
+                integrator.close()
             
             phase_end = datetime.now()
             self.phase_times['phase3'] = format_time_duration(phase_start, phase_end)
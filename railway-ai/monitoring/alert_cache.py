@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - ALERT STATE CACHE
+=====================================
+Per (train, track, alert type) alert state with TTL expiry and severity hysteresis
+"""
+
+import pandas as pd
+
+from monitoring.decision_queue import SEVERITY_RANK
+
+# Minutes an alert stays active after the condition was last observed
+ALERT_TTL_MINUTES = {
+    'EMERGENCY_STOP': 10,
+    'REROUTE': 10,
+    'STATIONARY_BLOCKAGE': 15,
+    'TRACK_CONFLICT': 5,
+    'PREDICTED_CONFLICT': 5
+}
+
+
+class AlertStateCache:
+    """Remembers every active alert so only changes are emitted downstream.
+
+    An observation of an unknown (train, track, alert type) key emits NEW;
+    a more severe observation of a known key emits ESCALATED at once. A
+    less severe one only lowers the stored severity after it has been seen
+    `deescalate_after` times in a row, and silently, so an alert flapping
+    between two levels does not re-escalate every cycle. An alert that is
+    not observed again within its TTL emits CLEARED; a condition missing
+    for a cycle or two therefore does not clear and re-raise it.
+    """
+
+    def __init__(self, ttl_minutes=None, default_ttl_minutes=10, deescalate_after=3):
+        self.ttl = {alert_type: pd.Timedelta(minutes=minutes)
+                    for alert_type, minutes in (ttl_minutes or ALERT_TTL_MINUTES).items()}
+        self.default_ttl = pd.Timedelta(minutes=default_ttl_minutes)
+        self.deescalate_after = deescalate_after
+
+        self.alerts = {}  # (train_id, track_id, alert_type) -> state
+        self.stats = {'observed': 0, 'new': 0, 'escalated': 0, 'cleared': 0, 'suppressed': 0}
+
+    def observe(self, train_id, track_id, alert_type, severity, now, payload=None):
+        """Record one observation; returns an alert event or None if nothing changed"""
+        key = (train_id, track_id, alert_type)
+        now = pd.Timestamp(now)
+        rank = SEVERITY_RANK.get(severity, 3)
+        self.stats['observed'] += 1
+
+        state = self.alerts.get(key)
+        if state is None:
+            self.alerts[key] = {'severity': severity, 'first_seen': now, 'last_seen': now,
+                                'lower_count': 0, 'payload': payload}
+            self.stats['new'] += 1
+            return self._event('NEW', key, self.alerts[key])
+
+        state['last_seen'] = now
+        state['payload'] = payload
+        current_rank = SEVERITY_RANK.get(state['severity'], 3)
+        if rank < current_rank:
+            state['severity'] = severity
+            state['lower_count'] = 0
+            self.stats['escalated'] += 1
+            return self._event('ESCALATED', key, state)
+
+        if rank > current_rank:
+            state['lower_count'] += 1
+            if state['lower_count'] >= self.deescalate_after:
+                state['severity'] = severity
+                state['lower_count'] = 0
+        else:
+            state['lower_count'] = 0
+        self.stats['suppressed'] += 1
+        return None
+
+    def sweep(self, now):
+        """Clear alerts not observed within their TTL; returns the CLEARED events"""
+        now = pd.Timestamp(now)
+        expired = [key for key, state in self.alerts.items()
+                   if now - state['last_seen'] > self.ttl.get(key[2], self.default_ttl)]
+        events = [self._event('CLEARED', key, self.alerts.pop(key)) for key in expired]
+        self.stats['cleared'] += len(events)
+        return events
+
+    def update(self, observations, now):
+        """Observe (train_id, track_id, alert_type, severity, payload) tuples, then sweep"""
+        events = []
+        for train_id, track_id, alert_type, severity, payload in observations:
+            event = self.observe(train_id, track_id, alert_type, severity, now, payload)
+            if event is not None:
+                events.append(event)
+        return events + self.sweep(now)
+
+    @staticmethod
+    def _event(event_type, key, state):
+        train_id, track_id, alert_type = key
+        return {
+            'event': event_type,
+            'train_id': train_id,
+            'track_id': track_id,
+            'alert_type': alert_type,
+            'severity': state['severity'],
+            'first_seen': state['first_seen'],
+            'last_seen': state['last_seen'],
+            'details': state['payload']
+        }
+
+    def active(self):
+        """Current alerts, most severe first"""
+        return sorted(
+            (self._event('ACTIVE', key, state) for key, state in self.alerts.items()),
+            key=lambda alert: SEVERITY_RANK.get(alert['severity'], 3)
+        )
+
+    def __len__(self):
+        return len(self.alerts)
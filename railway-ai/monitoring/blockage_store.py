@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - BLOCKAGE STORE
+==================================
+Blocked tracks with clearance-time expiry and a change version
+"""
+
+import heapq
+import itertools
+from collections.abc import Set
+import pandas as pd
+
+
+class BlockedTracksView(Set):
+    """Read-only live set of the currently blocked track ids"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __contains__(self, track_id):
+        return track_id in self._store.blocks
+
+    def __iter__(self):
+        return iter(list(self._store.blocks))
+
+    def __len__(self):
+        return len(self._store.blocks)
+
+    def __repr__(self):
+        return f"BlockedTracksView({set(self._store.blocks)})"
+
+
+class BlockageStore:
+    """Track blockages keyed by track, each held by one or more causes.
+
+    A cause (an incident, a technical failure, a stationary train) blocks a
+    track until its expiry time. Expiry times sit in a min-heap, so expiring
+    due blocks costs O(log n) each; superseded heap entries are skipped
+    lazily. `version` increases whenever a track enters or leaves the
+    blocked set, so route caches can invalidate exactly on change.
+    """
+
+    def __init__(self):
+        self.blocks = {}  # track_id -> {cause: expires_at or None}
+        self.version = 0
+        self.blocked_tracks = BlockedTracksView(self)
+
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def block(self, track_id, cause, expires_at=None):
+        """Block a track for a cause until `expires_at` (None: until cleared)"""
+        expires_at = pd.Timestamp(expires_at) if expires_at is not None else None
+        causes = self.blocks.get(track_id)
+        if causes is None:
+            causes = self.blocks[track_id] = {}
+            self.version += 1
+        elif cause in causes and causes[cause] == expires_at:
+            return False
+
+        causes[cause] = expires_at
+        if expires_at is not None:
+            heapq.heappush(self._heap, (expires_at, next(self._sequence), track_id, cause))
+        return True
+
+    def clear(self, track_id, cause=None):
+        """Remove one cause (or all) from a track; True if the track is no longer blocked"""
+        causes = self.blocks.get(track_id)
+        if causes is None:
+            return False
+        if cause is None:
+            causes.clear()
+        else:
+            causes.pop(cause, None)
+
+        if causes:
+            return False
+        del self.blocks[track_id]
+        self.version += 1
+        return True
+
+    def expire(self, now):
+        """Drop every cause whose expiry has passed; returns the tracks that became clear"""
+        now = pd.Timestamp(now)
+        cleared = []
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, _, track_id, cause = heapq.heappop(self._heap)
+            causes = self.blocks.get(track_id)
+            # Skip entries superseded by a later block() of the same cause
+            if causes is None or causes.get(cause, 0) != expires_at:
+                continue
+            if self.clear(track_id, cause):
+                cleared.append(track_id)
+        return cleared
+
+    def next_expiry(self):
+        """Earliest pending expiry (may be a superseded entry), or None"""
+        return self._heap[0][0] if self._heap else None
+
+    def causes(self, track_id):
+        """Active causes of a track's blockage with their expiry times"""
+        return dict(self.blocks.get(track_id, {}))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - COLLISION PREDICTION KERNEL
+===============================================
+Lookahead closest-approach prediction for same-track and converging trains
+"""
+
+import numpy as np
+
+
+def _pairs_within_groups(sorted_groups):
+    """All (i, j) index pairs, i < j, of equal values in a group-sorted array"""
+    first, second = [], []
+    n = len(sorted_groups)
+    offset = 1
+    while offset < n:
+        same = np.flatnonzero(sorted_groups[offset:] == sorted_groups[:-offset])
+        if same.size == 0:
+            break
+        first.append(same)
+        second.append(same + offset)
+        offset += 1
+    if not first:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(first), np.concatenate(second)
+
+
+def closest_approach(start_gap_km, closing_kmph, horizon_minutes, safety_distance_km):
+    """Closest approach of pairs whose separation is |gap - closing * t| (vectorized).
+
+    Returns time to closest approach and minimum separation within the
+    horizon, plus the time the separation first drops below the safety
+    distance (inf if it never does).
+    """
+    horizon_hours = horizon_minutes / 60
+    closing = np.asarray(closing_kmph, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_meet = np.where(closing != 0, start_gap_km / closing, np.inf)
+    t_closest = np.where(np.isfinite(t_meet), np.clip(t_meet, 0, horizon_hours), 0.0)
+    min_separation = np.abs(start_gap_km - closing * t_closest)
+
+    # First time below the safety distance
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_unsafe = (np.abs(start_gap_km) - safety_distance_km) / np.abs(closing)
+    t_unsafe = np.where(np.abs(start_gap_km) < safety_distance_km, 0.0, t_unsafe)
+    approaching = np.sign(start_gap_km) == np.sign(closing)
+    reaches = (np.abs(start_gap_km) < safety_distance_km) | (approaching & (t_unsafe <= horizon_hours))
+    t_unsafe = np.where(reaches, t_unsafe, np.inf)
+
+    return t_closest * 60, min_separation, t_unsafe * 60
+
+
+def predict_conflicts(topology, position_index, horizon_minutes=30, safety_distance_km=5.0):
+    """Predict unsafe approaches over the lookahead horizon in one array pass.
+
+    Trains run towards their track's to_station at their current speed.
+    Same-track pairs are measured along the track; trains heading into the
+    same station on different tracks (converging at the junction) are
+    measured by their remaining distance to it, assuming both continue onto
+    the line beyond, and are only flagged if both reach it within the
+    horizon. Only the leading train of each incoming track is paired
+    at a junction; the ones behind it are covered by the same-track pairs.
+    A train is never paired with itself, should the index hold more than
+    one report of it.
+    """
+    track_rows = topology.track_index.get_indexer(position_index.track_ids)
+    known = np.flatnonzero(track_rows >= 0)
+    rows = track_rows[known]
+    position_km = position_index.position_km[known]
+    speed_kmph = position_index.speed_kmph[known]
+    to_go_km = np.clip(topology.length_km[rows] - position_km, 0, None)
+
+    # Same-track pairs (index arrays are already sorted by track, position)
+    rear, front = _pairs_within_groups(rows)
+    same_gap = position_km[front] - position_km[rear]
+
+    # Junction pairs between leading trains of tracks into the same station
+    is_leader = np.r_[rows[1:] != rows[:-1], True]
+    leaders = np.flatnonzero(is_leader)
+    stations = topology.to_code[rows[leaders]]
+    order = np.argsort(stations, kind='stable')
+    first, second = _pairs_within_groups(stations[order])
+    junction_a, junction_b = leaders[order][first], leaders[order][second]
+    junction_gap = to_go_km[junction_b] - to_go_km[junction_a]
+
+    # One closest-approach pass over both pair kinds: gap(t) = gap0 - closing * t
+    pair_a = np.concatenate([rear, junction_a])
+    pair_b = np.concatenate([front, junction_b])
+    start_gap = np.concatenate([same_gap, junction_gap])
+    closing = speed_kmph[pair_a] - speed_kmph[pair_b]
+    closing[len(rear):] = -closing[len(rear):]  # Junction gap is measured in distance-to-go
+    t_closest, min_separation, t_unsafe = closest_approach(start_gap, closing, horizon_minutes, safety_distance_km)
+
+    # Junction pairs only conflict if both trains reach the junction within the horizon
+    reach_hours = to_go_km / np.maximum(speed_kmph, 1e-9)
+    both_arrive = np.maximum(reach_hours[junction_a], reach_hours[junction_b]) <= horizon_minutes / 60
+    t_unsafe[len(rear):] = np.where(both_arrive, t_unsafe[len(rear):], np.inf)
+
+    train_ids = position_index.train_ids[known]
+    distinct = train_ids[pair_a] != train_ids[pair_b]
+    flagged = np.flatnonzero(np.isfinite(t_unsafe) & distinct)
+    flagged = flagged[np.argsort(t_unsafe[flagged], kind='stable')]
+    return {
+        'train_a': known[pair_a[flagged]],
+        'train_b': known[pair_b[flagged]],
+        'kind': np.where(flagged < len(rear), 'SAME_TRACK', 'JUNCTION'),
+        'start_separation_km': np.abs(start_gap[flagged]),
+        'min_separation_km': min_separation[flagged],
+        'time_to_closest_approach_minutes': t_closest[flagged],
+        'time_to_conflict_minutes': t_unsafe[flagged]
+    }
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - TRACK CONFLICT KERNEL
+=========================================
+Array kernels for per-track train ordering and separation checks
+"""
+
+import numpy as np
+
+
+def sort_by_track_position(track_ids, positions_km):
+    """Order that sorts trains by (track_id, position_km)"""
+    return np.lexsort((positions_km, track_ids))
+
+
+def track_boundaries(sorted_track_ids):
+    """Start offset of each track's run in a track-sorted array, plus the track ids"""
+    if len(sorted_track_ids) == 0:
+        return np.zeros(0, dtype=np.int64), sorted_track_ids[:0]
+    starts = np.flatnonzero(np.r_[True, sorted_track_ids[1:] != sorted_track_ids[:-1]])
+    return starts, sorted_track_ids[starts]
+
+
+def detect_adjacent_conflicts(sorted_track_ids, sorted_positions_km, sorted_speeds_kmph, safety_distance_km):
+    """Find adjacent train pairs on the same track closer than the safety distance.
+
+    Inputs must already be sorted by (track_id, position_km). Returns the
+    index of the rear and front train of every flagged pair (into the sorted
+    arrays) with the gap, absolute speed difference and the time until the
+    gap closes at the current closing speed (minutes, at least 1).
+    """
+    same_track = sorted_track_ids[1:] == sorted_track_ids[:-1]
+    gaps = np.diff(sorted_positions_km)
+    flagged = np.flatnonzero(same_track & (gaps < safety_distance_km))
+
+    rear = flagged
+    front = flagged + 1
+    gap_km = gaps[flagged]
+    speed_difference = np.abs(sorted_speeds_kmph[front] - sorted_speeds_kmph[rear])
+
+    # Rear train catching up with the one ahead closes the gap
+    closing_speed = np.clip(sorted_speeds_kmph[rear] - sorted_speeds_kmph[front], 0, None)
+    time_to_conflict = np.maximum(1, gap_km / np.maximum(closing_speed, 1) * 60)
+
+    return {
+        'rear': rear,
+        'front': front,
+        'distance_km': gap_km,
+        'speed_difference': speed_difference,
+        'time_to_conflict_minutes': time_to_conflict
+    }
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - CONTINGENCY DETOUR TABLE
+============================================
+Offline N-1 detours: best reroute for every single-track failure
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+from monitoring.topology import TrackTopology
+from monitoring.routing import RoutingEngine
+
+SIGNATURE_COLUMNS = ['id', 'from_station', 'to_station', 'distance_km', 'allowed_speed']
+
+_worker_router = None
+
+
+def _init_worker(tracks_data):
+    """Build the router once per worker process"""
+    global _worker_router
+    _worker_router = RoutingEngine(TrackTopology(tracks_data))
+
+
+def _subtree(topology, tree_track, root):
+    """Stations whose shortest-path tree path passes through `root`"""
+    reached = np.flatnonzero(tree_track >= 0)
+    parents = topology.from_code[tree_track[reached]]
+    order = np.argsort(parents, kind='stable')
+    children, parents = reached[order], parents[order]
+
+    stations, stack = [], [root]
+    while stack:
+        station = stack.pop()
+        stations.append(station)
+        first, last = np.searchsorted(parents, [station, station + 1])
+        stack.extend(children[first:last].tolist())
+    return stations
+
+
+def _detours_for_track(task):
+    """Detours for one failed track from each origin whose normal routes use it"""
+    track_row, origins, base_trees, base_minutes = task
+    router = _worker_router
+    topology = router.topology
+    failed_id = topology.track_ids[track_row].item()
+    entry_station = topology.to_code[track_row]
+
+    entries = []
+    for origin, tree_track, minutes in zip(origins.tolist(), base_trees, base_minutes):
+        detour_minutes, detour_tree = router.shortest_path_tree(origin, {track_row})
+        origin_id = topology.stations[origin]
+        for destination in _subtree(topology, tree_track, entry_station):
+            key = (failed_id, origin_id, topology.stations[destination])
+            if np.isinf(detour_minutes[destination]):
+                entries.append((key, None))  # Cut off: no detour exists
+                continue
+            path = router.tree_path(detour_tree, destination)
+            entries.append((key, (
+                round(float(detour_minutes[destination]), 2),
+                round(float(detour_minutes[destination] - minutes[destination]), 2),
+                tuple(topology.track_ids[path].tolist())
+            )))
+    return entries
+
+
+class ContingencyTable:
+    """Precomputed N-1 detours keyed by (failed track, origin station, destination station).
+
+    For every track, every origin-destination pair whose normal shortest
+    route uses that track gets its best route with the track removed, as
+    (detour minutes, extra minutes, track id tuple), or None when the
+    failure disconnects the pair. Only affected pairs are stored, and
+    lookups are a single dict access.
+    """
+
+    def __init__(self):
+        self.detours = {}
+        self.signature = pd.DataFrame(columns=SIGNATURE_COLUMNS)
+        self.station_ids = np.zeros(0, dtype=np.int64)
+        self.base_trees = np.zeros((0, 0), dtype=np.int64)  # Incoming tree track id per (origin, station), -1 if none
+        self.built_at = None
+
+    def lookup(self, failed_track, origin_station, destination_station):
+        """Stored detour for a failure, or None if not stored / disconnected"""
+        return self.detours.get((failed_track, origin_station, destination_station))
+
+    def covers(self, tracks_data):
+        """True if the table was built from exactly these tracks"""
+        return self._signature(tracks_data).equals(self.signature)
+
+    @staticmethod
+    def _signature(tracks_data):
+        """Routing-relevant track attributes, sorted by id"""
+        signature = tracks_data.drop_duplicates('id').reindex(columns=SIGNATURE_COLUMNS)
+        return signature.sort_values('id').reset_index(drop=True)
+
+    @staticmethod
+    def _base_trees(router):
+        """Shortest-path trees from every station (minutes, incoming track rows)"""
+        n_stations = len(router.topology.stations)
+        minutes = np.empty((n_stations, n_stations))
+        trees = np.empty((n_stations, n_stations), dtype=np.int64)
+        for origin in range(n_stations):
+            minutes[origin], trees[origin] = router.shortest_path_tree(origin)
+        return minutes, trees
+
+    def build(self, tracks_data, workers=None):
+        """Compute every N-1 detour from scratch"""
+        topology = TrackTopology(tracks_data)
+        router = RoutingEngine(topology)
+        base_minutes, base_trees = self._base_trees(router)
+
+        pairs = {row: np.flatnonzero(base_trees[:, topology.to_code[row]] == row)
+                 for row in range(len(topology.track_ids))}
+        self.detours = {}
+        self._run(tracks_data, pairs, base_trees, base_minutes, workers)
+        self._finish(tracks_data, topology, base_trees)
+        return self
+
+    def update(self, tracks_data, workers=None):
+        """Recompute only the detours a topology change can affect.
+
+        A (failed track, origin) group is recomputed when the failed track
+        was added or changed, when the origin's normal shortest-path tree
+        changed, when a stored detour uses a removed or changed track, or
+        when an added/changed track is reachable from the origin cheaply
+        enough to beat one of the group's detours.
+        """
+        if not self.detours:
+            return self.build(tracks_data, workers)
+
+        new_signature = self._signature(tracks_data)
+        merged = self.signature.merge(new_signature, on='id', how='outer', suffixes=('_old', '_new'), indicator=True)
+        attributes = [column for column in SIGNATURE_COLUMNS if column != 'id']
+        same = np.logical_and.reduce([
+            (merged[f'{column}_old'] == merged[f'{column}_new']).to_numpy() for column in attributes
+        ])
+        both = (merged['_merge'] == 'both').to_numpy()
+        removed_or_changed = set(merged['id'][(merged['_merge'] == 'left_only').to_numpy() | (both & ~same)])
+        added_or_changed = set(merged['id'][(merged['_merge'] == 'right_only').to_numpy() | (both & ~same)])
+        if not removed_or_changed and not added_or_changed:
+            return self
+
+        topology = TrackTopology(tracks_data)
+        router = RoutingEngine(topology)
+        base_minutes, base_trees = self._base_trees(router)
+
+        # Origins whose normal routing changed, compared in track ids
+        old_rows = pd.Index(self.station_ids).get_indexer(topology.stations)
+        new_tree_ids = np.where(base_trees >= 0, topology.track_ids[np.maximum(base_trees, 0)], -1)
+        tree_changed = np.ones(len(topology.stations), dtype=bool)
+        known = old_rows >= 0
+        tree_changed[known] = ~np.all(
+            self.base_trees[np.ix_(old_rows[known], old_rows[known])] == new_tree_ids[np.ix_(known, known)], axis=1
+        ) | (new_tree_ids[known][:, ~known] != -1).any(axis=1)
+
+        # Cheapest possible arrival over each added/changed track, per origin
+        new_rows = [row for row in topology.track_index.get_indexer(list(added_or_changed)).tolist() if row >= 0]
+        improving_minutes = np.full(len(topology.stations), np.inf)
+        if new_rows:
+            improving_minutes = np.min(
+                base_minutes[:, topology.from_code[new_rows]] + router.edge_minutes[new_rows], axis=1
+            )
+
+        groups = {}
+        for key, detour in self.detours.items():
+            groups.setdefault(key[:2], []).append((key, detour))
+
+        station_codes = dict(zip(topology.stations.tolist(), range(len(topology.stations))))
+        stale_groups = set()
+        for (failed_id, origin_id), entries in groups.items():
+            origin = station_codes.get(origin_id)
+            if failed_id in removed_or_changed or origin is None or tree_changed[origin]:
+                stale_groups.add((failed_id, origin_id))
+                continue
+            worst = max(np.inf if detour is None else detour[0] for _, detour in entries)
+            if improving_minutes[origin] < worst or any(
+                detour is not None and not removed_or_changed.isdisjoint(detour[2]) for _, detour in entries
+            ):
+                stale_groups.add((failed_id, origin_id))
+
+        for group in stale_groups:
+            for key, _ in groups[group]:
+                del self.detours[key]
+
+        # Recompute stale groups, new failed tracks and origins with changed trees
+        all_pairs = {row: np.flatnonzero(base_trees[:, topology.to_code[row]] == row)
+                     for row in range(len(topology.track_ids))}
+        pairs = {}
+        for row, origins in all_pairs.items():
+            failed_id = topology.track_ids[row].item()
+            keep = [origin for origin in origins.tolist()
+                    if failed_id in added_or_changed or tree_changed[origin]
+                    or (failed_id, topology.stations[origin]) in stale_groups
+                    or (failed_id, topology.stations[origin]) not in groups]
+            if keep:
+                pairs[row] = np.asarray(keep, dtype=np.int64)
+
+        self._run(tracks_data, pairs, base_trees, base_minutes, workers)
+        self._finish(tracks_data, topology, base_trees)
+        return self
+
+    def _run(self, tracks_data, pairs, base_trees, base_minutes, workers):
+        """Fan the (failed track, origins) tasks out over a process pool"""
+        tasks = [(row, origins, base_trees[origins], base_minutes[origins])
+                 for row, origins in pairs.items() if origins.size]
+        if not tasks:
+            return
+
+        print(f"🔧 Computing detours for {len(tasks)} track failures...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(tracks_data,)) as executor:
+            chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))
+            for entries in executor.map(_detours_for_track, tasks, chunksize=chunksize):
+                self.detours.update(entries)
+
+    def _finish(self, tracks_data, topology, base_trees):
+        """Record what the table was built from"""
+        self.signature = self._signature(tracks_data)
+        self.station_ids = topology.stations.to_numpy()
+        self.base_trees = np.where(base_trees >= 0, topology.track_ids[np.maximum(base_trees, 0)], -1)
+        self.built_at = datetime.now()
+
+    def save(self, filepath):
+        """Persist the table"""
+        with open(filepath, 'wb') as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"💾 Contingency table saved: {filepath} ({len(self.detours):,} detours)")
+
+    @classmethod
+    def load(cls, filepath):
+        """Load a persisted table"""
+        table = cls()
+        with open(filepath, 'rb') as f:
+            table.__dict__.update(pickle.load(f))
+        return table
+
+
+def main():
+    """Build or incrementally refresh the contingency table from the database"""
+    from data.loader import RailwayDataLoader
+
+    models_dir = 'models'
+    filepath = os.path.join(models_dir, 'contingency_table.pkl')
+    os.makedirs(models_dir, exist_ok=True)
+
+    tracks = RailwayDataLoader().load_all_railway_data()['tracks']
+    if tracks.empty:
+        print("❌ No tracks available - contingency table not built")
+        return
+
+    table = ContingencyTable.load(filepath) if os.path.exists(filepath) else ContingencyTable()
+    table.update(tracks)
+    table.save(filepath)
+
+
+if __name__ == "__main__":
+    main()
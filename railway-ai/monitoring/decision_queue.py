@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - DECISION QUEUE
+==================================
+Earliest-deadline-first queue of rerouting decisions with per-train dedup
+"""
+
+import heapq
+import itertools
+import time
+import pandas as pd
+
+SEVERITY_RANK = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
+
+
+def decision_signature(decision):
+    """What makes two decisions for a train the same instruction"""
+    route = decision.get('alternate_route') or {}
+    return (decision['decision_type'], decision.get('blocked_track'), tuple(route.get('track_sequence', ())))
+
+
+class DecisionQueue:
+    """Pending rerouting decisions ordered by (deadline, severity).
+
+    The deadline is decision_time + time_to_conflict, so the action with
+    the least time left is handed out first and a CRITICAL one wins ties.
+    Each train has at most one pending decision: a newer decision replaces
+    it (the old heap entry is skipped lazily, and the heap is rebuilt once
+    such stale entries outnumber live ones about two to one). An
+    instruction already dispatched to a train is not queued again until
+    its deadline passes or the instruction changes.
+
+    Decisions whose deadline has passed are dropped, pending or not, on
+    every push and drain; the dispatched record of a train is forgotten
+    at its deadline as well.
+    """
+
+    def __init__(self, compact_ratio=2, min_compact_size=64):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._stale = 0  # superseded entries still in the heap
+        self._dispatched_deadlines = []  # (deadline, seq, train_id) heap for expiring `dispatched`
+        self.compact_ratio = compact_ratio
+        self.min_compact_size = min_compact_size
+        self.pending = {}  # train_id -> heap entry
+        self.dispatched = {}  # train_id -> (signature, deadline)
+        self.stats = {'pushed': 0, 'replaced': 0, 'suppressed': 0, 'dispatched': 0,
+                      'expired': 0, 'compactions': 0}
+
+    def __len__(self):
+        return len(self.pending)
+
+    @staticmethod
+    def deadline(decision):
+        """Absolute time by which the decision must be acted on"""
+        minutes = decision.get('time_to_conflict', 0)
+        return pd.Timestamp(decision['decision_time']) + pd.Timedelta(minutes=max(minutes, 0))
+
+    def expire(self, now):
+        """Drop pending decisions and dispatched records whose deadline is before `now`"""
+        now = pd.Timestamp(now)
+        expired = 0
+        # The heap is ordered by deadline, so everything overdue sits at the top
+        while self._heap and self._heap[0][0] < now:
+            entry = heapq.heappop(self._heap)
+            if entry[5]:
+                del self.pending[entry[3]['train_id']]
+                expired += 1
+            else:
+                self._stale -= 1
+        self.stats['expired'] += expired
+
+        while self._dispatched_deadlines and self._dispatched_deadlines[0][0] < now:
+            deadline, _, train_id = heapq.heappop(self._dispatched_deadlines)
+            sent = self.dispatched.get(train_id)
+            if sent is not None and sent[1] == deadline:
+                del self.dispatched[train_id]
+        return expired
+
+    def _compact(self):
+        """Rebuild the heap without superseded entries once they dominate it"""
+        if self._stale < self.min_compact_size or self._stale <= self.compact_ratio * len(self.pending):
+            return
+        self._heap = [entry for entry in self._heap if entry[5]]
+        heapq.heapify(self._heap)
+        self._stale = 0
+        self.stats['compactions'] += 1
+
+    def push(self, decision, now=None):
+        """Queue a decision; returns False if it duplicates one already pending or dispatched.
+
+        `now` defaults to the decision's own decision_time; a decision
+        already past its deadline is not queued.
+        """
+        train_id = decision['train_id']
+        signature = decision_signature(decision)
+        deadline = self.deadline(decision)
+        now = pd.Timestamp(decision['decision_time'] if now is None else now)
+        self.expire(now)
+        if deadline < now:
+            self.stats['expired'] += 1
+            return False
+
+        sent = self.dispatched.get(train_id)
+        if sent is not None:
+            if sent[0] == signature and pd.Timestamp(decision['decision_time']) < sent[1]:
+                self.stats['suppressed'] += 1
+                return False
+            del self.dispatched[train_id]
+
+        current = self.pending.get(train_id)
+        if current is not None:
+            if current[4] == signature and current[0] <= deadline:
+                self.stats['suppressed'] += 1
+                return False
+            current[5] = False  # Superseded; skipped when popped
+            self._stale += 1
+            self.stats['replaced'] += 1
+
+        entry = [deadline, SEVERITY_RANK.get(decision.get('priority'), 3), next(self._sequence),
+                 decision, signature, True]
+        heapq.heappush(self._heap, entry)
+        self.pending[train_id] = entry
+        self.stats['pushed'] += 1
+        self._compact()
+        return True
+
+    def pop(self):
+        """Most urgent pending decision, or None"""
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            if entry[5]:
+                return self._take(entry)
+            self._stale -= 1
+        return None
+
+    def _take(self, entry):
+        """Mark a popped entry as dispatched"""
+        decision = entry[3]
+        del self.pending[decision['train_id']]
+        self.dispatched[decision['train_id']] = (entry[4], entry[0])
+        heapq.heappush(self._dispatched_deadlines, (entry[0], entry[2], decision['train_id']))
+        self.stats['dispatched'] += 1
+        return decision
+
+    def drain(self, handler, predicate=None, max_actions=None, budget_seconds=None, now=None):
+        """Hand decisions to `handler` in deadline order.
+
+        Stops after `max_actions` or once `budget_seconds` is spent, leaving
+        the rest queued. Decisions not matching `predicate` stay queued
+        until they are taken by another drain or their deadline passes
+        (overdue decisions are dropped first when `now` is given).
+        """
+        if now is not None:
+            self.expire(now)
+        started = time.perf_counter()
+        results, deferred = [], []
+        while self._heap:
+            if max_actions is not None and len(results) >= max_actions:
+                break
+            if budget_seconds is not None and time.perf_counter() - started >= budget_seconds:
+                break
+
+            entry = heapq.heappop(self._heap)
+            if not entry[5]:
+                self._stale -= 1
+                continue
+            if predicate is not None and not predicate(entry[3]):
+                deferred.append(entry)
+                continue
+            results.append(handler(self._take(entry)))
+
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return results
+
+    def snapshot(self):
+        """Pending decisions in dispatch order (does not modify the queue)"""
+        return [entry[3] for entry in sorted(entry for entry in self._heap if entry[5])]
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - ACTION DISPATCH PIPELINE
+============================================
+Asynchronous delivery of train-control actions with ack, retry and timeouts
+"""
+
+import abc
+import asyncio
+import concurrent.futures
+import itertools
+import random
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+NO_DEADLINE = np.iinfo(np.int64).max
+
+
+class ActionTransport(abc.ABC):
+    """Delivers one action to train control; returns an acknowledgement dict"""
+
+    @abc.abstractmethod
+    async def send(self, action):
+        """Deliver `action`; raise on failure, return the acknowledgement on success"""
+
+
+class LocalStubTransport(ActionTransport):
+    """In-process transport for tests and simulation.
+
+    Calls `handler(action)` (if given), waits `latency_seconds` and
+    acknowledges; `failure_rate` makes a share of sends fail so the retry
+    path can be exercised.
+    """
+
+    def __init__(self, handler=None, latency_seconds=0.0, failure_rate=0.0, seed=None):
+        self.handler = handler
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.delivered = []
+
+    async def send(self, action):
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            raise ConnectionError(f"Stub transport dropped action {action['action_id']}")
+        if self.handler is not None:
+            self.handler(action)
+        self.delivered.append(action)
+        return {'action_id': action['action_id'], 'status': 'ACK'}
+
+
+class ActionDispatcher:
+    """Bounded asyncio queue drained by concurrent workers on a background event loop.
+
+    `submit` is called from the (synchronous) monitoring cycle and returns a
+    concurrent.futures.Future immediately, so a slow endpoint never stalls
+    the cycle. Queued actions are sent earliest deadline first, and one
+    whose deadline (on `clock`, the monitor's clock) has passed before an
+    attempt is dropped as EXPIRED instead of being sent late. Each action
+    is retried with backoff until acknowledged, timed out `max_retries`
+    times, or failed; when the queue is full the action is rejected at
+    once rather than blocking the caller. Counters and latencies are
+    written on the loop thread, so `stats` hands out a locked copy.
+    """
+
+    def __init__(self, transport, max_pending=256, concurrency=8, timeout_seconds=2.0,
+                 max_retries=2, retry_backoff_seconds=0.1, clock=datetime.now):
+        self.transport = transport
+        self.max_pending = max_pending
+        self.concurrency = concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._stats = {'submitted': 0, 'acknowledged': 0, 'failed': 0, 'rejected': 0, 'retries': 0, 'expired': 0}
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._stopping = None
+
+    @property
+    def stats(self):
+        """Snapshot of the delivery counters"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key, latency=None):
+        with self._lock:
+            self._stats[key] += 1
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def start(self):
+        """Start the event loop thread and its workers"""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name='action-dispatch', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._main())
+        self._loop.close()
+
+    async def _main(self):
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_pending)
+        self._stopping = asyncio.Event()
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+        self._ready.set()
+
+        await self._stopping.wait()
+        await self._queue.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def submit(self, command, train_id, payload=None, deadline=None):
+        """Queue an action for delivery; returns a Future resolving to its dispatch record.
+
+        Actions with a `deadline` are sent earliest deadline first and
+        expire unsent once it has passed.
+        """
+        deadline = pd.Timestamp(deadline) if deadline is not None else None
+        action = {
+            'action_id': next(self._ids),
+            'command': command,
+            'train_id': train_id,
+            'payload': payload or {},
+            'deadline': deadline
+        }
+        future = concurrent.futures.Future()
+        self._count('submitted')
+        priority = deadline.value if deadline is not None else NO_DEADLINE
+
+        def enqueue():
+            try:
+                self._queue.put_nowait((priority, action['action_id'], action, future, time.perf_counter()))
+            except asyncio.QueueFull:
+                self._count('rejected')
+                future.set_result(self._record(action, 'REJECTED', 0, None, 'Dispatch queue full'))
+
+        self._loop.call_soon_threadsafe(enqueue)
+        return future
+
+    async def _worker(self):
+        while True:
+            _, _, action, future, queued_at = await self._queue.get()
+            try:
+                future.set_result(await self._deliver(action, queued_at))
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, action, queued_at):
+        """Send with per-attempt timeout and retry with exponential backoff"""
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            if action['deadline'] is not None and pd.Timestamp(self.clock()) > action['deadline']:
+                self._count('expired')
+                return self._record(action, 'EXPIRED', attempt - 1, time.perf_counter() - queued_at,
+                                    error or 'Deadline passed before delivery')
+            try:
+                ack = await asyncio.wait_for(self.transport.send(action), timeout=self.timeout_seconds)
+                latency = time.perf_counter() - queued_at
+                self._count('acknowledged', latency)
+                return self._record(action, 'ACKNOWLEDGED', attempt, latency, None, ack)
+            except asyncio.TimeoutError:
+                error = f"No acknowledgement within {self.timeout_seconds}s"
+            except Exception as e:
+                error = str(e)
+
+            if attempt <= self.max_retries:
+                self._count('retries')
+                await asyncio.sleep(self.retry_backoff_seconds * 2 ** (attempt - 1))
+
+        self._count('failed')
+        return self._record(action, 'FAILED', self.max_retries + 1, time.perf_counter() - queued_at, error)
+
+    @staticmethod
+    def _record(action, status, attempts, latency, error, ack=None):
+        return {
+            'action_id': action['action_id'],
+            'train_id': action['train_id'],
+            'command': action['command'],
+            'status': status,
+            'success': status == 'ACKNOWLEDGED',
+            'attempts': attempts,
+            'latency_ms': round(latency * 1000, 2) if latency is not None else None,
+            'completed_at': datetime.now(),
+            'error': error,
+            'ack': ack
+        }
+
+    def pending(self):
+        """Actions queued or in flight"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def latency_summary(self):
+        """Submit-to-acknowledge latency percentiles (ms)"""
+        with self._lock:
+            latencies = np.asarray(self._latencies) * 1000
+        if not latencies.size:
+            return {}
+        return {
+            'count': int(latencies.size),
+            'mean_ms': round(float(latencies.mean()), 2),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+            'max_ms': round(float(latencies.max()), 2)
+        }
+
+    def stop(self):
+        """Deliver what is queued, then stop the loop thread"""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join()
+        self._thread = None
+        self._ready.clear()
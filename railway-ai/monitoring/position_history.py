@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - POSITION HISTORY STORE
+==========================================
+Per-train ring buffers of recent position reports
+"""
+
+import numpy as np
+import pandas as pd
+
+NAT = np.iinfo(np.int64).min
+
+
+class PositionHistoryStore:
+    """Fixed-size ring buffers of (timestamp, track, position, speed) per train.
+
+    All buffers live in preallocated 2-D numpy arrays (one row per train).
+    Each report is an O(1) write, and the time a train has been below the
+    stationary speed is tracked incrementally, so stationary durations come
+    from real reports instead of being simulated.
+    """
+
+    def __init__(self, history_size=64, initial_trains=1024, stationary_speed_kmph=5.0):
+        self.history_size = history_size
+        self.stationary_speed_kmph = stationary_speed_kmph
+
+        self.slots = {}
+        self.capacity = 0
+        self._allocate(initial_trains)
+
+    def _allocate(self, capacity):
+        """Grow the per-train arrays to `capacity` rows, keeping stored reports"""
+        size = self.history_size
+        specs = {
+            'timestamps': ((capacity, size), np.int64, NAT),
+            'track_ids': ((capacity, size), np.int64, -1),
+            'positions_km': ((capacity, size), np.float64, np.nan),
+            'speeds_kmph': ((capacity, size), np.float64, np.nan),
+            'heads': ((capacity,), np.int64, -1),
+            'counts': ((capacity,), np.int64, 0),
+            'last_timestamp': ((capacity,), np.int64, NAT),
+            'stationary_since': ((capacity,), np.int64, NAT)
+        }
+        for name, (shape, dtype, fill) in specs.items():
+            grown = np.full(shape, fill, dtype=dtype)
+            if self.capacity:
+                grown[:self.capacity] = getattr(self, name)
+            setattr(self, name, grown)
+        self.capacity = capacity
+
+    def _slots_for(self, train_ids):
+        """Row index of each train, registering unseen trains"""
+        slots = np.empty(len(train_ids), dtype=np.int64)
+        for i, train_id in enumerate(train_ids.tolist()):
+            slot = self.slots.get(train_id)
+            if slot is None:
+                slot = len(self.slots)
+                self.slots[train_id] = slot
+            slots[i] = slot
+
+        if len(self.slots) > self.capacity:
+            self._allocate(max(2 * self.capacity, len(self.slots)))
+        return slots
+
+    def update(self, positions):
+        """Record a batch of position reports (DataFrame of real_time_positions rows)"""
+        if positions.empty:
+            return 0
+
+        timestamps = pd.to_datetime(positions['timestamp']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        return self.update_arrays(
+            positions['train_id'].to_numpy(),
+            timestamps,
+            positions['track_id'].to_numpy(),
+            pd.to_numeric(positions['position_km'], errors='coerce').to_numpy(dtype=float),
+            pd.to_numeric(positions['speed_kmph'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        )
+
+    def update_arrays(self, train_ids, timestamps_ns, track_ids, positions_km, speeds_kmph):
+        """Record reports given as parallel arrays; returns the number of new reports stored"""
+        slots = self._slots_for(np.asarray(train_ids))
+
+        # Apply reports oldest first; several reports for one train go in successive rounds
+        order = np.lexsort((timestamps_ns, slots))
+        slots = slots[order]
+        round_no = np.arange(len(slots)) - np.searchsorted(slots, slots, side='left')
+        order_by_round = np.argsort(round_no, kind='stable')
+
+        stored = 0
+        for current_round in range(int(round_no.max()) + 1 if len(round_no) else 0):
+            batch = order_by_round[round_no[order_by_round] == current_round]
+            rows = order[batch]
+            stored += self._write(slots[batch], timestamps_ns[rows], np.asarray(track_ids)[rows],
+                                  positions_km[rows], speeds_kmph[rows])
+        return stored
+
+    def _write(self, slots, timestamps_ns, track_ids, positions_km, speeds_kmph):
+        """Write at most one report per train (vectorized across trains)"""
+        # Ignore reports already seen (reloaded rows) or older than the latest one
+        fresh = timestamps_ns > self.last_timestamp[slots]
+        slots = slots[fresh]
+        if slots.size == 0:
+            return 0
+        timestamps_ns = timestamps_ns[fresh]
+        speeds_kmph = speeds_kmph[fresh]
+
+        heads = (self.heads[slots] + 1) % self.history_size
+        self.heads[slots] = heads
+        self.counts[slots] = np.minimum(self.counts[slots] + 1, self.history_size)
+        self.timestamps[slots, heads] = timestamps_ns
+        self.track_ids[slots, heads] = track_ids[fresh]
+        self.positions_km[slots, heads] = positions_km[fresh]
+        self.speeds_kmph[slots, heads] = speeds_kmph
+        self.last_timestamp[slots] = timestamps_ns
+
+        # Stationary since the first slow report after the last moving one
+        moving = speeds_kmph >= self.stationary_speed_kmph
+        since = self.stationary_since[slots]
+        self.stationary_since[slots] = np.where(moving, NAT, np.where(since == NAT, timestamps_ns, since))
+        return int(slots.size)
+
+    def stationary_minutes(self, train_ids, as_of=None):
+        """Minutes each train has been below the stationary speed (0 if moving or unknown)"""
+        train_ids = np.asarray(train_ids)
+        slots = np.fromiter((self.slots.get(t, -1) for t in train_ids.tolist()), dtype=np.int64,
+                            count=len(train_ids))
+        known = slots >= 0
+        since = np.full(len(train_ids), NAT, dtype=np.int64)
+        since[known] = self.stationary_since[slots[known]]
+
+        if as_of is None:
+            reference = np.full(len(train_ids), NAT, dtype=np.int64)
+            reference[known] = self.last_timestamp[slots[known]]
+        else:
+            reference = np.atleast_1d(np.asarray(as_of, dtype='datetime64[ns]')).astype(np.int64)
+            reference = np.broadcast_to(reference, len(train_ids))
+
+        stationary = since != NAT
+        minutes = np.zeros(len(train_ids))
+        minutes[stationary] = (reference[stationary] - since[stationary]) / 60e9
+        return np.maximum(minutes, 0)
+
+    def get_history(self, train_id):
+        """Stored reports of one train, oldest first"""
+        slot = self.slots.get(train_id)
+        if slot is None or self.counts[slot] == 0:
+            return pd.DataFrame(columns=['timestamp', 'track_id', 'position_km', 'speed_kmph'])
+
+        count = self.counts[slot]
+        ring = (self.heads[slot] - np.arange(count)[::-1]) % self.history_size
+        return pd.DataFrame({
+            'timestamp': self.timestamps[slot, ring].astype('datetime64[ns]'),
+            'track_id': self.track_ids[slot, ring],
+            'position_km': self.positions_km[slot, ring],
+            'speed_kmph': self.speeds_kmph[slot, ring]
+        })
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - MONITORING REPLAY HARNESS
+=============================================
+Deterministic replay of position/incident streams for benchmarking track monitoring
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from monitoring.topology import TrackTopology
+from monitoring.report_writer import dumps
+
+STREAM_TABLES = ['real_time_positions', 'incidents', 'safety_scenarios']
+STREAM_TIME_COLUMNS = {
+    'real_time_positions': 'timestamp',
+    'incidents': 'incident_time',
+    'safety_scenarios': 'scenario_time'
+}
+
+INCIDENT_DESCRIPTIONS = [
+    'Signal failure at home signal',
+    'Minor track damage reported',
+    'Brake failure on goods rake',
+    'Derailment of wagon - emergency',
+    'Slow running due to infrastructure work',
+    'Communication failure with control'
+]
+
+
+def load_recorded_streams(directory):
+    """Recorded streams from <table>.pkl / .parquet / .csv files in a directory"""
+    streams = {}
+    for table in STREAM_TABLES:
+        for extension, reader in (('.pkl', pd.read_pickle), ('.parquet', pd.read_parquet), ('.csv', pd.read_csv)):
+            path = os.path.join(directory, table + extension)
+            if os.path.exists(path):
+                frame = reader(path)
+                time_column = STREAM_TIME_COLUMNS[table]
+                frame[time_column] = pd.to_datetime(frame[time_column])
+                streams[table] = frame
+                break
+        else:
+            streams[table] = pd.DataFrame()
+    return streams
+
+
+def synthesize_streams(tracks_data, n_trains=1000, duration_minutes=60, report_interval_seconds=30,
+                       incidents_per_hour=2.0, stop_probability=0.002, start=None, seed=0):
+    """Synthetic position and incident streams over the given tracks.
+
+    Trains run along the track graph at a constant speed each and pick a
+    random successor at the end of a track; now and then a train stops
+    for 5-30 minutes (a stationary blockage). Everything is drawn from one
+    seeded generator, so the same arguments give the same streams.
+    """
+    rng = np.random.default_rng(seed)
+    topology = TrackTopology(tracks_data)
+    start = pd.Timestamp(start or datetime(2025, 1, 1, 6))
+    steps = int(duration_minutes * 60 // report_interval_seconds)
+    dt_hours = report_interval_seconds / 3600
+
+    track = rng.integers(0, len(topology.track_ids), n_trains)
+    position = rng.random(n_trains) * topology.length_km[track]
+    cruise = rng.uniform(0.5, 1.0, n_trains) * topology.allowed_speed[track]
+    stopped_until = np.full(n_trains, -1)
+
+    frames = []
+    for step in range(steps):
+        stop = (stopped_until < step) & (rng.random(n_trains) < stop_probability)
+        stopped_until[stop] = step + rng.integers(5, 31, stop.sum()) * 60 // report_interval_seconds
+        speed = np.where(stopped_until >= step, 0.0, cruise)
+        position = position + speed * dt_hours
+
+        # Trains past the end of their track continue on a random successor
+        over = np.flatnonzero(position >= topology.length_km[track])
+        if over.size:
+            stations = topology.to_code[track[over]]
+            first = topology.out_offsets[stations]
+            counts = topology.out_offsets[stations + 1] - first
+            has_next = counts > 0
+            choice = first + (rng.random(over.size) * np.maximum(counts, 1)).astype(np.int64)
+            leaving = over[has_next]
+            position[leaving] -= topology.length_km[track[leaving]]
+            track[leaving] = topology.out_tracks[choice[has_next]]
+            position[leaving] = np.minimum(position[leaving], topology.length_km[track[leaving]])
+            # Dead ends: hold at the buffer stop
+            position[over[~has_next]] = topology.length_km[track[over[~has_next]]]
+
+        jitter = rng.integers(0, report_interval_seconds, n_trains)
+        frames.append(pd.DataFrame({
+            'train_id': np.arange(1, n_trains + 1),
+            'track_id': topology.track_ids[track],
+            'timestamp': start + pd.to_timedelta(step * report_interval_seconds + jitter, unit='s'),
+            'position_km': np.round(position, 3),
+            'speed_kmph': np.where(stopped_until >= step, 0.0, np.round(cruise, 1))
+        }))
+
+    positions = pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable')
+    positions.insert(0, 'id', np.arange(1, len(positions) + 1))
+
+    n_incidents = rng.poisson(incidents_per_hour * duration_minutes / 60)
+    incident_tracks = rng.integers(0, len(topology.track_ids), n_incidents)
+    incidents = pd.DataFrame({
+        'id': np.arange(1, n_incidents + 1),
+        'train_id': rng.integers(1, n_trains + 1, n_incidents),
+        'track_id': topology.track_ids[incident_tracks],
+        'incident_time': start + pd.to_timedelta(rng.integers(0, duration_minutes * 60, n_incidents), unit='s'),
+        'position_km': np.round(rng.random(n_incidents) * topology.length_km[incident_tracks], 3),
+        'description': rng.choice(INCIDENT_DESCRIPTIONS, n_incidents),
+        'status': 'active'
+    }).sort_values('incident_time', kind='stable')
+
+    return {
+        'real_time_positions': positions.reset_index(drop=True),
+        'incidents': incidents.reset_index(drop=True),
+        'safety_scenarios': pd.DataFrame(columns=['id', 'track_id', 'scenario_type', 'scenario_time', 'position_km'])
+    }
+
+
+class ReplayHarness:
+    """Feeds recorded or synthetic streams to a TrackMonitoringSystem on a simulated clock.
+
+    Each cycle advances the simulated time by `cycle_seconds`, folds the
+    position reports of that window into the latest position per train
+    and runs the monitoring stages the integrator runs, timing each one.
+    The monitor's clock is the simulated time, so a replay is
+    deterministic. With `speed` set, cycles are paced to N x real time;
+    without it they run back to back (maximum throughput).
+    """
+
+    STAGES = ['monitor_live_tracks', 'predict_collision_risks', 'detect_incidents',
+              'detect_approaching_trains', 'generate_rerouting_decisions', 'update_alerts']
+
+    def __init__(self, track_monitor, tracks_data, streams, cycle_seconds=30, speed=None,
+                 live_monitor=None, quiet=True):
+        self.track_monitor = track_monitor
+        self.live_monitor = live_monitor or track_monitor  # e.g. a ShardedTrackMonitor
+        self.tracks_data = tracks_data
+        self.streams = {table: streams.get(table, pd.DataFrame()) for table in STREAM_TABLES}
+        self.cycle_seconds = cycle_seconds
+        self.speed = speed
+        self.quiet = quiet
+
+        self.stage_seconds = {stage: [] for stage in self.STAGES}
+        self.cycle_durations = []
+
+    def _times(self, table):
+        """Sorted event times of a stream as datetime64 (for window slicing)"""
+        frame = self.streams[table]
+        if frame.empty:
+            return np.array([], dtype='datetime64[ns]')
+        return pd.to_datetime(frame[STREAM_TIME_COLUMNS[table]]).to_numpy(dtype='datetime64[ns]')
+
+    def _timed(self, stage, function, *args, **kwargs):
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        self.stage_seconds[stage].append(time.perf_counter() - started)
+        return result
+
+    def run(self, max_cycles=None, trace_memory=False):
+        """Replay the streams; returns the benchmark summary.
+
+        `trace_memory` reports the peak of Python/numpy allocations via
+        tracemalloc, which slows every stage down; leave it off when the
+        latencies matter (max RSS is always reported).
+        """
+        for table, frame in self.streams.items():
+            if not frame.empty:
+                self.streams[table] = frame.sort_values(STREAM_TIME_COLUMNS[table], kind='stable')
+        positions = self.streams['real_time_positions']
+        times = {table: self._times(table) for table in STREAM_TABLES}
+        if len(times['real_time_positions']) == 0:
+            raise ValueError("Replay needs a non-empty real_time_positions stream")
+
+        start = pd.Timestamp(times['real_time_positions'][0])
+        end = pd.Timestamp(times['real_time_positions'][-1])
+        cycles = int(np.ceil((end - start).total_seconds() / self.cycle_seconds)) + 1
+        if max_cycles is not None:
+            cycles = min(cycles, max_cycles)
+
+        monitor = self.track_monitor
+        latest = positions.iloc[:0]
+        consumed = 0
+
+        if trace_memory:
+            tracemalloc.start()
+        replay_started = time.perf_counter()
+
+        for cycle in range(cycles):
+            now = start + pd.Timedelta(seconds=(cycle + 1) * self.cycle_seconds)
+            monitor.clock = lambda now=now: now.to_pydatetime()
+            cycle_started = time.perf_counter()
+
+            with contextlib.redirect_stdout(io.StringIO()) if self.quiet else contextlib.nullcontext():
+                # Fold this window's reports into the latest position per train
+                upto = int(np.searchsorted(times['real_time_positions'], now.to_datetime64(), side='right'))
+                if upto > consumed:
+                    window = positions.iloc[consumed:upto]
+                    latest = (pd.concat([latest, window]) if len(latest) else window).drop_duplicates('train_id', keep='last')
+                    consumed = upto
+                incidents = self._until('incidents', times, now)
+                scenarios = self._until('safety_scenarios', times, now)
+
+                track_status = self._timed('monitor_live_tracks', self.live_monitor.monitor_live_tracks,
+                                           latest, self.tracks_data)
+                predicted = self._timed('predict_collision_risks', monitor.predict_collision_risks,
+                                        latest, self.tracks_data)
+                active_incidents = self._timed('detect_incidents', monitor.detect_incidents_and_failures,
+                                               incidents, scenarios)
+                approaching = self._timed('detect_approaching_trains', monitor.detect_approaching_trains,
+                                          track_status, active_incidents, latest)
+                decisions = self._timed('generate_rerouting_decisions', monitor.generate_rerouting_decisions,
+                                        approaching, self.tracks_data)
+                self._timed('update_alerts', monitor.update_alerts, track_status, decisions, predicted)
+
+            elapsed = time.perf_counter() - cycle_started
+            self.cycle_durations.append(elapsed)
+            if self.speed:
+                time.sleep(max(0.0, self.cycle_seconds / self.speed - elapsed))
+
+        wall_seconds = time.perf_counter() - replay_started
+        peak_traced = None
+        if trace_memory:
+            peak_traced = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        return self.summary(cycles, wall_seconds, peak_traced)
+
+    def _until(self, table, times, now):
+        """Stream rows with event time up to `now`"""
+        frame = self.streams[table]
+        if frame.empty:
+            return frame
+        return frame.iloc[:int(np.searchsorted(times[table], now.to_datetime64(), side='right'))]
+
+    @staticmethod
+    def _percentiles(seconds):
+        values = np.asarray(seconds) * 1000
+        if values.size == 0:
+            return {}
+        return {
+            'p50_ms': round(float(np.percentile(values, 50)), 3),
+            'p95_ms': round(float(np.percentile(values, 95)), 3),
+            'p99_ms': round(float(np.percentile(values, 99)), 3),
+            'max_ms': round(float(values.max()), 3)
+        }
+
+    def summary(self, cycles, wall_seconds, peak_traced=None):
+        """Throughput, per-stage latency percentiles and peak memory"""
+        busy_seconds = float(np.sum(self.cycle_durations))
+        max_rss_mb = None
+        if resource is not None:
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+            max_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+        return {
+            'cycles': cycles,
+            'cycle_seconds': self.cycle_seconds,
+            'speed': self.speed,
+            'trains': int(self.streams['real_time_positions']['train_id'].nunique()),
+            'position_reports': len(self.streams['real_time_positions']),
+            'wall_seconds': round(wall_seconds, 3),
+            'cycles_per_second': round(cycles / wall_seconds, 2) if wall_seconds else None,
+            'sustainable_cycles_per_second': round(cycles / busy_seconds, 2) if busy_seconds else None,
+            'realtime_factor': round(cycles * self.cycle_seconds / busy_seconds, 1) if busy_seconds else None,
+            'cycle_latency': self._percentiles(self.cycle_durations),
+            'stage_latency': {stage: self._percentiles(seconds) for stage, seconds in self.stage_seconds.items()},
+            'peak_traced_memory_mb': round(peak_traced / 1024 / 1024, 1) if peak_traced is not None else None,
+            'max_rss_mb': max_rss_mb
+        }
+
+
+def display_summary(summary):
+    """Print a benchmark summary"""
+    print("\n📊 REPLAY BENCHMARK")
+    print(f"   Cycles: {summary['cycles']} x {summary['cycle_seconds']}s simulated "
+          f"({summary['trains']} trains, {summary['position_reports']} reports)")
+    print(f"   Throughput: {summary['cycles_per_second']} cycles/s "
+          f"(sustainable {summary['sustainable_cycles_per_second']}, {summary['realtime_factor']}x real time)")
+    print(f"   Cycle latency: {summary['cycle_latency']}")
+    for stage, latency in summary['stage_latency'].items():
+        print(f"   {stage:30s} p50 {latency.get('p50_ms')} ms  p95 {latency.get('p95_ms')} ms  "
+              f"p99 {latency.get('p99_ms')} ms")
+    print(f"   Peak traced memory: {summary['peak_traced_memory_mb']} MB  Max RSS: {summary['max_rss_mb']} MB")
+
+
+def main():
+    """Replay recorded streams (or synthetic ones) through the track monitor"""
+    from phase3_track_monitoring import TrackMonitoringSystem
+    from monitoring.sharding import ShardedTrackMonitor
+
+    parser = argparse.ArgumentParser(description='Replay position/incident streams through track monitoring')
+    parser.add_argument('--recorded', help='directory with real_time_positions/incidents/safety_scenarios files')
+    parser.add_argument('--tracks', help='tracks file (.pkl/.csv); default: load from the database')
+    parser.add_argument('--trains', type=int, default=1000)
+    parser.add_argument('--minutes', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cycle-seconds', type=float, default=30)
+    parser.add_argument('--speed', type=float, default=None, help='N x real time (default: as fast as possible)')
+    parser.add_argument('--shards', type=int, default=None)
+    parser.add_argument('--trace-memory', action='store_true', help='track peak allocations (slows the replay)')
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    if args.tracks:
+        tracks = pd.read_pickle(args.tracks) if args.tracks.endswith('.pkl') else pd.read_csv(args.tracks)
+    else:
+        from data.loader import RailwayDataLoader
+        tracks = RailwayDataLoader().load_all_railway_data()['tracks']
+    if tracks.empty:
+        print("❌ No tracks available - nothing to replay")
+        return
+
+    if args.recorded:
+        streams = load_recorded_streams(args.recorded)
+    else:
+        streams = synthesize_streams(tracks, n_trains=args.trains, duration_minutes=args.minutes, seed=args.seed)
+
+    monitor = TrackMonitoringSystem()
+    live_monitor = ShardedTrackMonitor(monitor, args.shards) if args.shards else None
+    try:
+        summary = ReplayHarness(monitor, tracks, streams, cycle_seconds=args.cycle_seconds,
+                                speed=args.speed, live_monitor=live_monitor).run(trace_memory=args.trace_memory)
+    finally:
+        if live_monitor:
+            live_monitor.stop()
+
+    display_summary(summary)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(dumps(summary, indent=2))
+        print(f"💾 Benchmark summary saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
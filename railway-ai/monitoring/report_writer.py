@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - MONITORING REPORT WRITER
+============================================
+Compact JSON encoding, rotating NDJSON report log and delta-only track reports
+"""
+
+import hashlib
+import json
+import os
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+
+
+def json_default(obj):
+    """Encode the numpy/pandas/datetime values json cannot handle itself.
+
+    Passed as `default=` so the C encoder walks the report and only calls
+    back for these leaves; nothing is copied up front.
+    """
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.datetime64):
+        text = str(obj)  # ISO 8601 already, and much cheaper than a Timestamp round trip
+        return None if text == 'NaT' else text
+    if isinstance(obj, (timedelta, np.timedelta64)):
+        return pd.Timedelta(obj).total_seconds()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict('records')
+    if isinstance(obj, pd.Series):
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, indent=None):
+    """JSON text of a report (compact unless `indent` is given)"""
+    separators = (',', ':') if indent is None else None
+    return json.dumps(obj, default=json_default, separators=separators, indent=indent)
+
+
+class RotatingReportLog:
+    """Append-only newline-delimited JSON log, one report per line.
+
+    When the file would grow past `max_bytes` it is renamed to `<path>.1`
+    (older files shift up to `<path>.<backup_count>`, the oldest is
+    dropped) and a fresh file is started.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, backup_count=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def _rotate(self):
+        self.close()
+        for number in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{number}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{number + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def append(self, record):
+        """Write one record as a line; returns the bytes written"""
+        line = (dumps(record) + '\n').encode('utf-8')
+        f = self._open()
+        if f.tell() and f.tell() + len(line) > self.max_bytes:
+            self._rotate()
+            f = self._open()
+        f.write(line)
+        f.flush()
+        return len(line)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def read(path):
+        """Records of a report log file, oldest first"""
+        with open(path, 'rb') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+class TrackStatusDelta:
+    """Reduce successive track_status dicts to the tracks that changed.
+
+    Each track's status is fingerprinted by the digest of its compact JSON;
+    a delta holds only tracks whose fingerprint changed, plus the ids of
+    tracks that dropped out. Every `full_every`-th report is a full one so
+    a reader can resynchronise from any point in the log.
+    """
+
+    def __init__(self, full_every=60):
+        self.full_every = full_every
+        self.fingerprints = {}
+        self.reports = 0
+
+    @staticmethod
+    def _fingerprint(status):
+        return hashlib.blake2b(dumps(status).encode('utf-8'), digest_size=16).digest()
+
+    def encode(self, track_status):
+        """{'report_type', 'track_status', 'removed_tracks', 'unchanged_tracks'} for this cycle"""
+        fingerprints = {track_id: self._fingerprint(status) for track_id, status in track_status.items()}
+        full = self.full_every and self.reports % self.full_every == 0
+        self.reports += 1
+
+        if full:
+            changed = track_status
+        else:
+            changed = {track_id: status for track_id, status in track_status.items()
+                       if self.fingerprints.get(track_id) != fingerprints[track_id]}
+        removed = [track_id for track_id in self.fingerprints if track_id not in fingerprints]
+        self.fingerprints = fingerprints
+
+        return {
+            'report_type': 'full' if full else 'delta',
+            'track_status': changed,
+            'removed_tracks': [] if full else removed,
+            'unchanged_tracks': len(track_status) - len(changed)
+        }
+
+    @staticmethod
+    def apply(current, record):
+        """Fold one encoded record into a reader's track_status dict (keys as in the JSON)"""
+        if record['report_type'] == 'full':
+            current = {}
+        else:
+            current = dict(current)
+            for track_id in record['removed_tracks']:
+                current.pop(str(track_id), None)
+        current.update(record['track_status'])
+        return current
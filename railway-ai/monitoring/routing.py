@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - ROUTING ENGINE
+==================================
+Shortest-path and k-alternate routes over the track graph
+"""
+
+import heapq
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class RoutingEngine:
+    """A* / Yen k-shortest routing between stations on a TrackTopology.
+
+    Edge weight is the running time of a track (distance_km at
+    allowed_speed, in minutes). The A* heuristic is the great-circle
+    distance to the destination priced at the lowest minutes-per-km of any
+    track's straight line, so it never overestimates and stays consistent
+    even when track distances disagree with station coordinates. Routes that
+    avoid the blocked tracks are cached per (origin, destination, k,
+    blocked-set version); the cache is dropped only when the version moves.
+    """
+
+    def __init__(self, topology, stations_data=None):
+        self.topology = topology
+        self.edge_minutes = topology.length_km / np.maximum(topology.allowed_speed, 1) * 60
+
+        self.coordinates = None
+        self.heuristic_minutes_per_km = 0.0
+        if stations_data is not None and not stations_data.empty:
+            self._set_coordinates(stations_data)
+
+        self._cache = {}
+        self._cache_version = None
+        self._unblocked_cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _set_coordinates(self, stations_data):
+        """Station lat/lon (radians) aligned to the topology's station codes"""
+        rows = pd.Index(stations_data['id']).get_indexer(self.topology.stations)
+        if (rows < 0).any():
+            return
+
+        lat = np.radians(pd.to_numeric(stations_data['lat'], errors='coerce').to_numpy(dtype=float)[rows])
+        lon = np.radians(pd.to_numeric(stations_data['lon'], errors='coerce').to_numpy(dtype=float)[rows])
+        if np.isnan(lat).any() or np.isnan(lon).any():
+            return
+        self.coordinates = (lat, lon)
+
+        # Largest km-per-minute factor that keeps h(u) <= w(u, v) + h(v) on every edge
+        straight_km = self._great_circle_km(self.topology.from_code, self.topology.to_code)
+        usable = straight_km > 0
+        self.heuristic_minutes_per_km = (
+            float(np.min(self.edge_minutes[usable] / straight_km[usable])) if usable.any() else 0.0
+        )
+
+    def _great_circle_km(self, a, b):
+        """Haversine distance between station codes (arrays or scalars)"""
+        lat, lon = self.coordinates
+        dlat = lat[b] - lat[a]
+        dlon = lon[b] - lon[a]
+        h = np.sin(dlat / 2) ** 2 + np.cos(lat[a]) * np.cos(lat[b]) * np.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+    def _heuristic(self, goal):
+        """Admissible remaining-time estimate for every station towards `goal`"""
+        if self.coordinates is None:
+            return np.zeros(len(self.topology.stations))
+        stations = np.arange(len(self.topology.stations))
+        return self._great_circle_km(stations, goal) * self.heuristic_minutes_per_km
+
+    def shortest_path(self, origin, goal, excluded_tracks=(), excluded_stations=(), heuristic=None):
+        """A* between station codes; returns (minutes, [track rows]) or None"""
+        topology = self.topology
+        if heuristic is None:
+            heuristic = self._heuristic(goal)
+
+        best = {origin: 0.0}
+        previous = {}
+        heap = [(heuristic[origin], 0.0, origin)]
+        while heap:
+            _, cost, station = heapq.heappop(heap)
+            if station == goal:
+                path = []
+                while station != origin:
+                    track_row = previous[station]
+                    path.append(track_row)
+                    station = topology.from_code[track_row]
+                return float(cost), path[::-1]
+            if cost > best.get(station, np.inf):
+                continue
+
+            for track_row in topology.out_tracks[topology.out_offsets[station]:topology.out_offsets[station + 1]].tolist():
+                if track_row in excluded_tracks:
+                    continue
+                nxt = topology.to_code[track_row]
+                if nxt in excluded_stations:
+                    continue
+                new_cost = cost + self.edge_minutes[track_row]
+                if new_cost < best.get(nxt, np.inf):
+                    best[nxt] = new_cost
+                    previous[nxt] = track_row
+                    heapq.heappush(heap, (new_cost + heuristic[nxt], new_cost, nxt))
+        return None
+
+    def shortest_path_tree(self, origin, excluded_tracks=()):
+        """Dijkstra from one station to all: (minutes per station, incoming tree track per station, -1 if none)"""
+        topology = self.topology
+        n_stations = len(topology.stations)
+        minutes = np.full(n_stations, np.inf)
+        tree_track = np.full(n_stations, -1, dtype=np.int64)
+        minutes[origin] = 0.0
+
+        heap = [(0.0, origin)]
+        while heap:
+            cost, station = heapq.heappop(heap)
+            if cost > minutes[station]:
+                continue
+            for track_row in topology.out_tracks[topology.out_offsets[station]:topology.out_offsets[station + 1]].tolist():
+                if track_row in excluded_tracks:
+                    continue
+                nxt = topology.to_code[track_row]
+                new_cost = cost + self.edge_minutes[track_row]
+                if new_cost < minutes[nxt]:
+                    minutes[nxt] = new_cost
+                    tree_track[nxt] = track_row
+                    heapq.heappush(heap, (new_cost, nxt))
+        return minutes, tree_track
+
+    def tree_path(self, tree_track, destination):
+        """Track rows from the tree's root to `destination`"""
+        path = []
+        while tree_track[destination] >= 0:
+            track_row = int(tree_track[destination])
+            path.append(track_row)
+            destination = self.topology.from_code[track_row]
+        return path[::-1]
+
+    def k_shortest_paths(self, origin, goal, k=3, excluded_tracks=()):
+        """Yen's algorithm: up to k loopless paths in increasing running time"""
+        heuristic = self._heuristic(goal)
+        excluded_tracks = set(excluded_tracks)
+        first = self.shortest_path(origin, goal, excluded_tracks, heuristic=heuristic)
+        if first is None:
+            return []
+
+        accepted = [first]
+        candidates = []
+        seen = {tuple(first[1])}
+        while len(accepted) < k:
+            last_path = accepted[-1][1]
+            stations = [origin] + [self.topology.to_code[row] for row in last_path]
+
+            for spur_index in range(len(last_path)):
+                root = last_path[:spur_index]
+                root_minutes = float(self.edge_minutes[root].sum()) if root else 0.0
+
+                # Block the next track of every accepted path sharing this root
+                removed = set(excluded_tracks)
+                for _, path in accepted:
+                    if path[:spur_index] == root and len(path) > spur_index:
+                        removed.add(path[spur_index])
+
+                spur = self.shortest_path(
+                    stations[spur_index], goal, removed, set(stations[:spur_index]), heuristic
+                )
+                if spur is None:
+                    continue
+                path = root + spur[1]
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (root_minutes + spur[0], path))
+
+            if not candidates:
+                break
+            accepted.append(heapq.heappop(candidates))
+        return accepted
+
+    def _route_record(self, minutes, path):
+        """Route dict in track ids"""
+        topology = self.topology
+        return {
+            'track_sequence': topology.track_ids[path].tolist(),
+            'station_sequence': topology.from_station[path[:1]].tolist() + topology.to_station[path].tolist(),
+            'total_distance_km': round(float(topology.length_km[path].sum()), 2),
+            'travel_time_minutes': round(float(minutes), 1)
+        }
+
+    def alternate_routes(self, origin_station, destination_station, blocked_tracks, blocked_version, k=3):
+        """Up to k routes between two stations that avoid the blocked tracks"""
+        if blocked_version != self._cache_version:
+            self._cache.clear()
+            self._cache_version = blocked_version
+
+        key = (origin_station, destination_station, k)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+
+        routes = []
+        origin, goal = self.topology.stations.get_indexer([origin_station, destination_station])
+        if origin >= 0 and goal >= 0 and origin != goal:
+            excluded = {row for row in self.topology.track_index.get_indexer(list(blocked_tracks)).tolist() if row >= 0}
+            routes = [self._route_record(minutes, path)
+                      for minutes, path in self.k_shortest_paths(origin, goal, k, excluded)]
+
+        self._cache[key] = routes
+        return routes
+
+    def unblocked_minutes(self, origin_station, destination_station):
+        """Running time of the normal (nothing blocked) route, cached for the topology's lifetime"""
+        key = (origin_station, destination_station)
+        if key not in self._unblocked_cache:
+            minutes = None
+            origin, goal = self.topology.stations.get_indexer([origin_station, destination_station])
+            if origin >= 0 and goal >= 0:
+                found = self.shortest_path(origin, goal)
+                minutes = found[0] if found is not None else None
+            self._unblocked_cache[key] = minutes
+        return self._unblocked_cache[key]
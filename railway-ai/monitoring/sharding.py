@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - SHARDED TRACK MONITOR
+=========================================
+Per-track monitoring split across worker processes by track shard
+"""
+
+import contextlib
+import heapq
+import io
+import multiprocessing
+import os
+import time
+import traceback
+import numpy as np
+import pandas as pd
+
+# Safety parameters copied from the coordinating monitor into every shard
+SHARD_PARAMETERS = ['SAFETY_DISTANCE_KM', 'APPROACH_WARNING_KM', 'CRITICAL_SPEED_KMPH', 'STATIONARY_BLOCK_MINUTES']
+
+
+def partition_tracks(topology, n_shards, train_counts=None):
+    """Shard number of every track row.
+
+    Tracks leaving the same station stay together, so only junction
+    crossings can straddle shards. Station groups are assigned largest
+    first to the lightest shard, weighted by trains on their tracks (plus
+    one per track so empty tracks still spread out).
+    """
+    weights = np.ones(len(topology.track_ids))
+    if train_counts is not None:
+        weights += train_counts
+    station_weights = np.bincount(topology.from_code, weights=weights, minlength=len(topology.stations))
+
+    station_shard = np.zeros(len(topology.stations), dtype=np.int64)
+    loads = [(0.0, shard) for shard in range(n_shards)]
+    for station in np.argsort(-station_weights, kind='stable').tolist():
+        load, shard = heapq.heappop(loads)
+        station_shard[station] = shard
+        heapq.heappush(loads, (load + station_weights[station], shard))
+    return station_shard[topology.from_code]
+
+
+def detect_junction_conflicts(topology, track_rows, position_km, speed_kmph, safety_distance_km):
+    """Train pairs closer than the safety distance across a junction.
+
+    The per-track check only compares trains on the same track. This one
+    pairs trains near the end of a track with trains near the start of a
+    track leaving the same station; the separation is the distance left
+    on the first track plus the distance already run on the second. The
+    reverse of the first track (back to the station it came from) is not
+    a continuation: trains on it run the other way. Returns indices of the rear and front train of every flagged pair,
+    like detect_adjacent_conflicts.
+    """
+    to_go_km = np.clip(topology.length_km[track_rows] - position_km, 0, None)
+    ending = np.flatnonzero(to_go_km < safety_distance_km)
+    starting = np.flatnonzero(position_km < safety_distance_km)
+
+    pairs = pd.DataFrame({'rear': ending, 'station': topology.to_code[track_rows[ending]]}).merge(
+        pd.DataFrame({'front': starting, 'station': topology.from_code[track_rows[starting]]}),
+        on='station'
+    )
+    rear = pairs['rear'].to_numpy(dtype=np.int64)
+    front = pairs['front'].to_numpy(dtype=np.int64)
+    gap_km = to_go_km[rear] + position_km[front]
+
+    reverse = topology.to_code[track_rows[front]] == topology.from_code[track_rows[rear]]
+    flagged = (track_rows[rear] != track_rows[front]) & ~reverse & (gap_km < safety_distance_km)
+    rear, front, gap_km = rear[flagged], front[flagged], gap_km[flagged]
+
+    closing_speed = np.clip(speed_kmph[rear] - speed_kmph[front], 0, None)
+    return {
+        'rear': rear,
+        'front': front,
+        'distance_km': gap_km,
+        'speed_difference': np.abs(speed_kmph[front] - speed_kmph[rear]),
+        'time_to_conflict_minutes': np.maximum(1, gap_km / np.maximum(closing_speed, 1) * 60)
+    }
+
+
+def _shard_worker(connection, monitor_class, parameters):
+    """Worker process: runs monitor_live_tracks on the positions of its shard's tracks"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Workers only run the track checks; the contingency table is not loaded here
+        monitor = monitor_class(models_dir=os.devnull)
+    for name, value in parameters.items():
+        setattr(monitor, name, value)
+    tracks_data = pd.DataFrame()
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        try:
+            if message[0] == 'tracks':
+                tracks_data = message[1]
+                continue
+            if message[0] == 'signals':
+                monitor.set_signals(message[1])
+                continue
+
+            _, now, positions = message
+            started = time.perf_counter()
+            monitor.clock = lambda: now
+            with contextlib.redirect_stdout(io.StringIO()):
+                monitor.expire_blockages(now)
+                track_status = monitor.monitor_live_tracks(positions, tracks_data) if not positions.empty else {}
+            blocks = [(track_id, cause, expires_at)
+                      for track_id, causes in monitor.blockages.blocks.items()
+                      for cause, expires_at in causes.items()]
+            connection.send(('ok', track_status, blocks, time.perf_counter() - started))
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+    connection.close()
+
+
+class ShardedTrackMonitor:
+    """Runs the per-track checks of a TrackMonitoringSystem on several processes.
+
+    Tracks are partitioned once per track set (see partition_tracks) and
+    each shard lives in its own long-running process, so a stationary
+    train's position history stays with the shard that owns its track.
+    Every cycle each worker receives only the positions on its tracks;
+    the per-shard track statuses are merged, stationary blockages raised
+    by the workers are applied to the coordinating monitor, and conflicts
+    across junctions (which the per-track check cannot see and which may
+    straddle shards) are checked on the merged positions.
+    """
+
+    def __init__(self, track_monitor, n_shards=None, start_method=None):
+        self.track_monitor = track_monitor
+        self.n_shards = n_shards or os.cpu_count() or 1
+        self.context = multiprocessing.get_context(start_method)
+
+        self.workers = []
+        self.connections = []
+        self.track_shard = None
+        self._partitioned_topology = None
+        self._sent_signals = None
+
+        self.stats = {'cycles': 0, 'last_cycle_seconds': 0.0, 'shard_seconds': [], 'shard_trains': []}
+
+    def start(self):
+        """Start one worker process per shard"""
+        if self.workers:
+            return self
+        parameters = {name: getattr(self.track_monitor, name) for name in SHARD_PARAMETERS}
+        for shard in range(self.n_shards):
+            parent, child = self.context.Pipe()
+            worker = self.context.Process(
+                target=_shard_worker, args=(child, type(self.track_monitor), parameters),
+                name=f'track-shard-{shard}', daemon=True
+            )
+            worker.start()
+            child.close()
+            self.workers.append(worker)
+            self.connections.append(parent)
+        print(f"🧩 Sharded track monitor started with {self.n_shards} workers")
+        return self
+
+    def _ensure_partition(self, topology, tracks_data, track_rows):
+        """Partition the tracks and hand each worker its share (only when the track set changes)"""
+        if self._partitioned_topology is topology:
+            return
+        train_counts = np.bincount(track_rows, minlength=len(topology.track_ids))
+        self.track_shard = partition_tracks(topology, self.n_shards, train_counts)
+
+        shard_of_row = pd.Series(self.track_shard, index=topology.track_index)
+        tracks_shard = shard_of_row.reindex(tracks_data['id']).to_numpy()
+        for shard, connection in enumerate(self.connections):
+            connection.send(('tracks', tracks_data[tracks_shard == shard]))
+        self._partitioned_topology = topology
+
+    def _sync_signals(self):
+        """Send the signal table to the workers when it or a signal aspect changed"""
+        signals = self.track_monitor.signals
+        if signals is None or self._sent_signals == (id(signals), signals.version):
+            return
+        frame = signals.to_frame()
+        for connection in self.connections:
+            connection.send(('signals', frame))
+        self._sent_signals = (id(signals), signals.version)
+
+    def monitor_live_tracks(self, real_time_positions, tracks_data):
+        """Same contract as TrackMonitoringSystem.monitor_live_tracks, computed per shard"""
+        print("\\n🔍 Monitoring Live Track Status (sharded)...")
+
+        if real_time_positions.empty or tracks_data.empty:
+            print("❌ No real-time data available for monitoring")
+            return {}
+
+        started = time.perf_counter()
+        monitor = self.track_monitor
+        self.start()
+        now = monitor.clock()
+        monitor.expire_blockages(now)
+
+        topology = monitor.ensure_topology(tracks_data)
+        track_rows = topology.track_index.get_indexer(real_time_positions['track_id'])
+        known = track_rows >= 0
+        positions = real_time_positions[known]
+        track_rows = track_rows[known]
+        self._ensure_partition(topology, tracks_data, track_rows)
+        self._sync_signals()
+
+        # The workers keep their own histories; the coordinator's must stay current too
+        monitor.position_history.update(positions)
+
+        # Scatter: every shard gets a cycle (an empty one still expires its blockages)
+        shards = self.track_shard[track_rows]
+        order = np.argsort(shards, kind='stable')
+        splits = np.searchsorted(shards[order], np.arange(1, self.n_shards))
+        for connection, rows in zip(self.connections, np.split(order, splits)):
+            connection.send(('cycle', now, positions.iloc[rows]))
+        self.stats['shard_trains'] = np.bincount(shards, minlength=self.n_shards).tolist()
+
+        # Gather: track sets are disjoint, so statuses merge by plain update
+        track_status, shard_seconds = {}, []
+        for shard, connection in enumerate(self.connections):
+            reply = connection.recv()
+            if reply[0] == 'error':
+                raise RuntimeError(f"Track shard {shard} failed:\n{reply[1]}")
+            _, status, blocks, seconds = reply
+            track_status.update(status)
+            shard_seconds.append(seconds)
+            for track_id, cause, expires_at in blocks:
+                if expires_at is None or expires_at > pd.Timestamp(now):
+                    monitor.block_track(track_id, cause, expires_at)
+
+        self._add_junction_conflicts(track_status, topology, positions, track_rows)
+
+        print(f"✅ Monitored {len(track_status)} tracks with {len(positions)} trains on {self.n_shards} shards")
+
+        monitor.last_track_status = track_status
+        self.stats['cycles'] += 1
+        self.stats['shard_seconds'] = shard_seconds
+        self.stats['last_cycle_seconds'] = time.perf_counter() - started
+        return track_status
+
+    def _add_junction_conflicts(self, track_status, topology, positions, track_rows):
+        """Attach conflicts across junctions to the rear train's track"""
+        position_km = pd.to_numeric(positions['position_km'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        speed_kmph = pd.to_numeric(positions['speed_kmph'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        conflicts = detect_junction_conflicts(
+            topology, track_rows, position_km, speed_kmph, self.track_monitor.SAFETY_DISTANCE_KM
+        )
+
+        track_ids = positions['track_id'].to_numpy()
+        train_ids = positions['train_id'].to_numpy()
+        for rear, front, distance, speed_diff, conflict_time in zip(
+            conflicts['rear'].tolist(), conflicts['front'].tolist(), conflicts['distance_km'].tolist(),
+            conflicts['speed_difference'].tolist(), conflicts['time_to_conflict_minutes'].tolist()
+        ):
+            status = track_status[track_ids[rear]]
+            status['potential_conflicts'].append({
+                'train1_id': train_ids[rear],
+                'train2_id': train_ids[front],
+                'next_track_id': track_ids[front],
+                'conflict_type': 'JUNCTION',
+                'distance_km': round(distance, 2),
+                'speed_difference': round(speed_diff, 2),
+                'risk_level': 'HIGH' if distance < 2 else 'MEDIUM',
+                'estimated_conflict_time': conflict_time  # minutes
+            })
+            if status['status'] == 'CLEAR':
+                status['status'] = 'CONFLICT_RISK'
+
+    def stop(self):
+        """Shut the worker processes down"""
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        for connection in self.connections:
+            connection.close()
+        self.workers, self.connections = [], []
+        self._partitioned_topology = None
+        self._sent_signals = None
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - SIGNAL POSITION INDEX
+=========================================
+Signals sorted by (track, position) for vectorized next-signal-ahead lookups
+"""
+
+import numpy as np
+import pandas as pd
+
+# Aspect codes, most restrictive highest (signals.status CHECK constraint)
+ASPECT_CODES = {'GREEN': 0, 'YELLOW': 1, 'RED': 2}
+ASPECT_NAMES = np.array(['GREEN', 'YELLOW', 'RED', 'UNKNOWN'], dtype=object)
+UNKNOWN_ASPECT = 3
+
+
+def aspect_codes(statuses):
+    """Aspect codes for a status column (unknown statuses map to UNKNOWN)"""
+    return (pd.Series(statuses, dtype=object).str.upper().map(ASPECT_CODES)
+            .fillna(UNKNOWN_ASPECT).to_numpy(dtype=np.int8))
+
+
+class SignalIndex:
+    """Signal positions per track in one sorted array with status codes.
+
+    Signals are ordered by (track row, position_km) and keyed as
+    `track_row * stride + position_km`, with the stride longer than any
+    track, so the next signal ahead of every train is one searchsorted
+    call over the train keys. Status changes update the aspect array in
+    place; only a change to the set of signals needs a rebuild.
+    """
+
+    def __init__(self, signals_data, topology):
+        self.topology = topology
+        n_tracks = len(topology.track_ids)
+
+        rows = topology.track_index.get_indexer(signals_data['track_id'])
+        known = rows >= 0
+        signals = signals_data[known]
+        rows = rows[known]
+        position_km = pd.to_numeric(signals['position_km'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+        order = np.lexsort((position_km, rows))
+        self.track_rows = rows[order]
+        self.position_km = position_km[order]
+        self.signal_ids = signals['id'].to_numpy()[order]
+        self.aspects = aspect_codes(signals['status'].to_numpy()[order])
+        self.signal_index = pd.Index(self.signal_ids)
+
+        longest = max(topology.length_km.max(initial=0), self.position_km.max(initial=0))
+        self.stride = float(longest) + 1.0
+        self.keys = self.track_rows * self.stride + self.position_km
+        self.track_ends = np.searchsorted(self.track_rows, np.arange(n_tracks), side='right')
+
+        self.signal_set = frozenset(signals_data['id'].tolist())
+        self.version = 0
+
+    def matches(self, signals_data):
+        """True if built from the same set of signals (statuses may differ)"""
+        return frozenset(signals_data['id'].tolist()) == self.signal_set
+
+    def next_signal_ahead(self, track_rows, position_km):
+        """Next signal ahead of each train on its own track (vectorized).
+
+        Returns the signal's position in the index (-1 if none ahead), its
+        id, the distance to it and its aspect code. A train standing at a
+        signal has passed it.
+        """
+        track_rows = np.asarray(track_rows)
+        position_km = np.asarray(position_km, dtype=float)
+        if len(self.keys) == 0:
+            return {
+                'signal': np.full(len(track_rows), -1),
+                'signal_id': np.full(len(track_rows), -1),
+                'distance_km': np.full(len(track_rows), np.inf),
+                'aspect': np.full(len(track_rows), UNKNOWN_ASPECT, dtype=np.int8)
+            }
+
+        valid = track_rows >= 0
+        rows = np.where(valid, track_rows, 0)
+        found = np.searchsorted(self.keys, rows * self.stride + np.clip(position_km, 0, None), side='right')
+        ahead = valid & (found < self.track_ends[rows])
+        safe = np.where(ahead, found, 0)
+
+        return {
+            'signal': np.where(ahead, found, -1),
+            'signal_id': np.where(ahead, self.signal_ids[safe], -1),
+            'distance_km': np.where(ahead, self.position_km[safe] - position_km, np.inf),
+            'aspect': np.where(ahead, self.aspects[safe], UNKNOWN_ASPECT).astype(np.int8)
+        }
+
+    def set_status(self, signal_ids, statuses):
+        """Update signal aspects in place; returns how many signals changed"""
+        signal_ids = np.atleast_1d(np.asarray(signal_ids))
+        statuses = np.atleast_1d(np.asarray(statuses, dtype=object))
+        positions = self.signal_index.get_indexer(signal_ids)
+        known = positions >= 0
+        codes = aspect_codes(statuses[known])
+        positions = positions[known]
+
+        changed = int(np.count_nonzero(self.aspects[positions] != codes))
+        if changed:
+            self.aspects[positions] = codes
+            self.version += 1
+        return changed
+
+    def signals_on_track(self, track_id):
+        """(signal ids, positions, aspect names) of one track in running order"""
+        row = self.topology.row(track_id)
+        if row < 0:
+            return self.signal_ids[:0], self.position_km[:0], ASPECT_NAMES[:0]
+        start = self.track_ends[row - 1] if row > 0 else 0
+        end = self.track_ends[row]
+        return self.signal_ids[start:end], self.position_km[start:end], ASPECT_NAMES[self.aspects[start:end]]
+
+    def to_frame(self):
+        """Current signals as a signals-table frame (id, track_id, position_km, status)"""
+        return pd.DataFrame({
+            'id': self.signal_ids,
+            'track_id': self.topology.track_ids[self.track_rows],
+            'position_km': self.position_km,
+            'status': ASPECT_NAMES[self.aspects]
+        })
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - STREAMING TRACK MONITOR
+===========================================
+Long-running monitoring loop fed by watermark polling or an event queue
+"""
+
+import contextlib
+import io
+import queue
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+
+# Event sources: table -> (time column, lookback kept for incident detection)
+EVENT_SOURCES = {
+    'real_time_positions': ('timestamp', None),
+    'incidents': ('incident_time', timedelta(hours=6)),
+    'safety_scenarios': ('scenario_time', timedelta(hours=2))
+}
+
+
+class StreamingTrackMonitor:
+    """Keeps TrackMonitoringSystem state across cycles and re-evaluates only touched tracks.
+
+    Each cycle drains new rows (polled from the database above a
+    (time, id) watermark per table, and/or pushed onto the event queue),
+    folds them into the latest position per train and the recent incident
+    windows, and re-runs track checks only for tracks that gained or lost
+    trains. A train whose last report is older than `stale_after` is
+    dropped, so a train that stopped reporting does not hold its track's
+    status (or blockage) forever. The watermark only sees new rows, so
+    the incident and scenario windows are also re-read whole every
+    `window_refresh`; that picks up status changes of rows already seen
+    (an incident marked resolved). Pushed rows replace earlier rows with
+    the same id. Approach detection and rerouting run when the blocked set
+    changes or a touched track lies upstream of a blocked one.
+
+    The first cycle does not replay history: bootstrap() reads the latest
+    report per train heard from within `stale_after` and the current
+    incident and scenario windows, and seeds each watermark at the start
+    of that window (or the newest row read), so polling only fetches rows
+    that arrive after start-up.
+    """
+
+    def __init__(self, track_monitor, tracks_data, conn=None, cycle_budget_seconds=0.5,
+                 max_batch_rows=5000, stale_after=timedelta(minutes=30),
+                 window_refresh=timedelta(minutes=1), quiet=True):
+        self.track_monitor = track_monitor
+        self.tracks_data = tracks_data
+        self.conn = conn
+        self.cycle_budget_seconds = cycle_budget_seconds
+        self.max_batch_rows = max_batch_rows
+        self.stale_after = stale_after
+        self.window_refresh = window_refresh
+        self._windows_refreshed_at = None
+        self._bootstrapped = False
+        self.quiet = quiet
+
+        self.events = queue.Queue()
+        self.watermarks = {table: (datetime.min, 0) for table in EVENT_SOURCES}
+
+        # State carried across cycles
+        self.positions = pd.DataFrame(columns=['id', 'train_id', 'track_id', 'timestamp', 'position_km', 'speed_kmph'])
+        self.event_windows = {table: pd.DataFrame() for table in EVENT_SOURCES if table != 'real_time_positions'}
+        self.track_status = {}
+        self.active_incidents = {}
+        self.approaching_trains = []
+        self.rerouting_decisions = []
+        self._evaluated_blocked_version = -1
+
+        self.stats = {'cycles': 0, 'budget_overruns': 0, 'last_cycle_seconds': 0.0,
+                      'events_processed': 0, 'tracks_reevaluated': 0, 'trains_evicted': 0}
+
+    def push_events(self, table, rows):
+        """Queue new rows of an event table (for feeds that do not come from the database)"""
+        if table not in EVENT_SOURCES:
+            raise ValueError(f"Unknown event table: {table}")
+        self.events.put((table, rows))
+
+    def bootstrap(self, now):
+        """Load the current state and seed the watermarks; returns the touched tracks"""
+        self._bootstrapped = True
+        for table, (_, lookback) in EVENT_SOURCES.items():
+            if lookback is not None:
+                self.watermarks[table] = (pd.Timestamp(now - lookback).to_pydatetime(), 0)
+        self.refresh_windows(now)
+
+        # Latest report per train still within stale_after (every train if there is no limit)
+        since = pd.Timestamp(now - self.stale_after).to_pydatetime() if self.stale_after is not None else datetime.min
+        self.watermarks['real_time_positions'] = (since, 0)
+        query = (
+            "SELECT DISTINCT ON (train_id) * FROM real_time_positions WHERE timestamp >= %(since)s "
+            "ORDER BY train_id, timestamp DESC, id DESC"
+        )
+        try:
+            latest = pd.read_sql_query(query, self.conn, params={'since': since})
+        except Exception as e:
+            print(f"❌ Loading latest positions failed: {e}")
+            self.conn.rollback()
+            return set()
+        if latest.empty:
+            return set()
+        self._advance_watermark('real_time_positions', latest)
+        self.stats['events_processed'] += len(latest)
+        return self._apply_positions(latest)
+
+    def poll_events(self):
+        """Rows above each table's (time, id) watermark, at most max_batch_rows per table"""
+        batches = {}
+        if self.conn is None:
+            return batches
+
+        for table, (time_column, _) in EVENT_SOURCES.items():
+            watermark_time, watermark_id = self.watermarks[table]
+            query = (
+                f"SELECT * FROM {table} "
+                f"WHERE ({time_column}, id) > (%(time)s, %(id)s) "
+                f"ORDER BY {time_column}, id LIMIT {int(self.max_batch_rows)}"
+            )
+            try:
+                rows = pd.read_sql_query(query, self.conn, params={'time': watermark_time, 'id': watermark_id})
+            except Exception as e:
+                print(f"❌ Polling {table} failed: {e}")
+                self.conn.rollback()
+                continue
+            if not rows.empty:
+                self._advance_watermark(table, rows)
+                batches[table] = rows
+        return batches
+
+    def refresh_windows(self, now):
+        """Re-read the incident and scenario windows whole; True if any table was read"""
+        refreshed = False
+        for table, window in self.event_windows.items():
+            time_column, lookback = EVENT_SOURCES[table]
+            query = f"SELECT * FROM {table} WHERE {time_column} >= %(since)s ORDER BY {time_column}, id"
+            try:
+                rows = pd.read_sql_query(query, self.conn, params={'since': pd.Timestamp(now - lookback).to_pydatetime()})
+            except Exception as e:
+                print(f"❌ Refreshing {table} failed: {e}")
+                self.conn.rollback()
+                continue
+            self.event_windows[table] = rows
+            if not rows.empty:
+                self._advance_watermark(table, rows)
+            refreshed = True
+        self._windows_refreshed_at = now
+        return refreshed
+
+    def _drain_queue(self, batches):
+        """Merge queued rows into the polled batches"""
+        while True:
+            try:
+                table, rows = self.events.get_nowait()
+            except queue.Empty:
+                return batches
+            batches[table] = pd.concat([batches[table], rows], ignore_index=True) if table in batches else rows
+
+    def _advance_watermark(self, table, rows):
+        """Move a table's watermark to its newest (time, id) row"""
+        time_column = EVENT_SOURCES[table][0]
+        times = pd.to_datetime(rows[time_column])
+        newest = max(zip(times, rows['id']))
+        if newest > self.watermarks[table]:
+            self.watermarks[table] = (newest[0].to_pydatetime(), int(newest[1]))
+
+    def _apply_positions(self, rows):
+        """Fold new reports into the latest position per train; returns touched tracks"""
+        moved = rows['train_id'].unique()
+        previous_tracks = self.positions.loc[self.positions['train_id'].isin(moved), 'track_id']
+
+        rows = rows.assign(timestamp=pd.to_datetime(rows['timestamp']))
+        combined = pd.concat([self.positions, rows], ignore_index=True) if not self.positions.empty else rows
+        self.positions = (combined.sort_values('timestamp', kind='stable')
+                                  .drop_duplicates('train_id', keep='last')
+                                  .reset_index(drop=True))
+        return set(previous_tracks.tolist()) | set(rows['track_id'].tolist())
+
+    def _evict_stale_positions(self, now):
+        """Forget trains not heard from within `stale_after`; returns their tracks"""
+        if self.positions.empty or self.stale_after is None:
+            return set()
+        stale = self.positions['timestamp'] < pd.Timestamp(now) - self.stale_after
+        if not stale.any():
+            return set()
+        evicted_tracks = set(self.positions.loc[stale, 'track_id'].tolist())
+        self.stats['trains_evicted'] += int(stale.sum())
+        self.positions = self.positions[~stale].reset_index(drop=True)
+        return evicted_tracks
+
+    def _apply_window_events(self, table, rows, now):
+        """Append incident/scenario rows and drop those past the detection lookback"""
+        time_column, lookback = EVENT_SOURCES[table]
+        window = self.event_windows[table]
+        window = pd.concat([window, rows], ignore_index=True) if not window.empty else rows
+        if 'id' in window.columns:
+            # A re-sent row (e.g. status changed to resolved) replaces the earlier copy
+            window = window.drop_duplicates('id', keep='last')
+        self.event_windows[table] = window[pd.to_datetime(window[time_column]) >= now - lookback]
+
+    def _release_resolved_incidents(self):
+        """Lift the blockages of incidents whose status is no longer active"""
+        window = self.event_windows['incidents']
+        if window.empty or 'status' not in window.columns:
+            return
+        resolved = window[window['status'] != 'active']
+        for track_id, incident_id in zip(resolved['track_id'].tolist(), resolved['id'].tolist()):
+            self.track_monitor.blockages.clear(track_id, ('incident', incident_id))
+
+    def _expire_windows(self, now):
+        """Drop expired incident/scenario rows; True if anything expired"""
+        expired = False
+        for table, window in self.event_windows.items():
+            if window.empty:
+                continue
+            time_column, lookback = EVENT_SOURCES[table]
+            keep = pd.to_datetime(window[time_column]) >= now - lookback
+            if not keep.all():
+                self.event_windows[table] = window[keep]
+                expired = True
+        return expired
+
+    def _reevaluate_tracks(self, touched_tracks):
+        """Re-run the track checks for the touched tracks only"""
+        positions = self.positions[self.positions['track_id'].isin(touched_tracks)]
+        status = self.track_monitor.monitor_live_tracks(positions, self.tracks_data) if not positions.empty else {}
+
+        for track_id in touched_tracks:
+            if track_id in status:
+                self.track_status[track_id] = status[track_id]
+            else:
+                self.track_status.pop(track_id, None)
+        self.track_monitor.last_track_status = self.track_status
+        self.stats['tracks_reevaluated'] += len(touched_tracks)
+
+    def _upstream_of_blocked(self):
+        """Tracks from which a train can reach a blocked track"""
+        topology = self.track_monitor.ensure_topology(self.tracks_data)
+        upstream = set()
+        for track_id in self.track_monitor.blocked_tracks:
+            upstream.update(topology.upstream_tracks(track_id, self.track_monitor.APPROACH_HOPS))
+        return upstream
+
+    @contextlib.contextmanager
+    def _cycle_clock(self, now):
+        """Point the monitor's clock at the cycle time, so every check in the cycle uses `now`"""
+        monitor = self.track_monitor
+        clock = monitor.clock
+        monitor.clock = lambda: now
+        try:
+            yield
+        finally:
+            monitor.clock = clock
+
+    def run_cycle(self, now=None):
+        """Process everything that arrived since the last cycle"""
+        started = time.perf_counter()
+        monitor = self.track_monitor
+        now = now or monitor.clock()
+
+        touched_tracks = set()
+        incidents_changed = False
+        if self.conn is not None and not self._bootstrapped:
+            touched_tracks |= self.bootstrap(now)
+            incidents_changed = True
+
+        batches = self._drain_queue(self.poll_events())
+        incidents_changed |= self._expire_windows(now)
+        for table, rows in batches.items():
+            self.stats['events_processed'] += len(rows)
+            if table == 'real_time_positions':
+                touched_tracks |= self._apply_positions(rows)
+            else:
+                self._apply_window_events(table, rows, now)
+                incidents_changed = True
+        touched_tracks |= self._evict_stale_positions(now)
+        if self.conn is not None and (self._windows_refreshed_at is None
+                                      or now - self._windows_refreshed_at >= self.window_refresh):
+            incidents_changed |= self.refresh_windows(now)
+
+        decisions_updated = False
+        output = io.StringIO() if self.quiet else None
+        with contextlib.redirect_stdout(output) if self.quiet else contextlib.nullcontext(), self._cycle_clock(now):
+            monitor.expire_blockages(now)
+            if touched_tracks:
+                self._reevaluate_tracks(touched_tracks)
+
+            if incidents_changed:
+                self._release_resolved_incidents()
+                self.active_incidents = monitor.detect_incidents_and_failures(
+                    self.event_windows['incidents'], self.event_windows['safety_scenarios']
+                )
+
+            # Approach checks only when blockages changed or trains moved near one
+            blocked_changed = monitor.blocked_version != self._evaluated_blocked_version
+            if monitor.blocked_tracks and (blocked_changed or touched_tracks & self._upstream_of_blocked()):
+                self.approaching_trains = monitor.detect_approaching_trains(
+                    self.track_status, self.active_incidents, self.positions
+                )
+                self.rerouting_decisions = monitor.generate_rerouting_decisions(
+                    self.approaching_trains, self.tracks_data
+                )
+                self._evaluated_blocked_version = monitor.blocked_version
+                decisions_updated = True
+            elif not monitor.blocked_tracks and self.rerouting_decisions:
+                self.approaching_trains, self.rerouting_decisions = [], []
+                self._evaluated_blocked_version = monitor.blocked_version
+
+            # Every cycle, so alerts whose condition went away clear after their TTL
+            alert_events = monitor.update_alerts(self.track_status, self.rerouting_decisions, now=now)
+
+        elapsed = time.perf_counter() - started
+        self.stats['cycles'] += 1
+        self.stats['last_cycle_seconds'] = elapsed
+        if elapsed > self.cycle_budget_seconds:
+            self.stats['budget_overruns'] += 1
+            print(f"⚠️ Monitoring cycle took {elapsed:.3f}s (budget {self.cycle_budget_seconds:.3f}s)")
+
+        return {
+            'touched_tracks': len(touched_tracks),
+            'events': sum(len(rows) for rows in batches.values()),
+            'decisions_updated': decisions_updated,
+            'alert_events': alert_events,
+            'cycle_seconds': elapsed
+        }
+
+    def run_forever(self, max_cycles=None, on_cycle=None):
+        """Run cycles back to back, one per cycle budget, until stopped"""
+        print(f"🔄 Streaming track monitoring started (cycle budget {self.cycle_budget_seconds}s)")
+        cycles = 0
+        try:
+            while max_cycles is None or cycles < max_cycles:
+                result = self.run_cycle()
+                if on_cycle is not None:
+                    on_cycle(self, result)
+                cycles += 1
+                time.sleep(max(0.0, self.cycle_budget_seconds - result['cycle_seconds']))
+        except KeyboardInterrupt:
+            print("\n🛑 Streaming track monitoring stopped")
+        return self.stats
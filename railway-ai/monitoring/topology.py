@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - TRACK TOPOLOGY
+==================================
+Directed track graph with adjacency indexes for approach detection
+"""
+
+import numpy as np
+import pandas as pd
+
+from monitoring.conflicts import sort_by_track_position, track_boundaries
+
+
+class TrackTopology:
+    """Directed graph of tracks built from tracks.from_station / to_station.
+
+    A track runs from `from_station` to `to_station` and train positions are
+    measured from `from_station`. Track u feeds track v when u ends where v
+    starts, unless u is v's reverse (the same station pair the other way
+    round): a train on the reverse track runs away from v. Adjacency
+    (station -> outgoing tracks), reverse adjacency (station -> incoming
+    tracks) and the per-track predecessors are stored CSR-style, so
+    neighbour lookups are array slices.
+    """
+
+    def __init__(self, tracks_data):
+        tracks = tracks_data.drop_duplicates('id')
+        self.track_ids = tracks['id'].to_numpy()
+        self.track_index = pd.Index(self.track_ids)
+        self.from_station = tracks['from_station'].to_numpy()
+        self.to_station = tracks['to_station'].to_numpy()
+
+        if 'distance_km' in tracks.columns:
+            self.length_km = pd.to_numeric(tracks['distance_km'], errors='coerce').fillna(10).to_numpy(dtype=float)
+        else:
+            self.length_km = np.full(len(tracks), 10.0)
+        if 'allowed_speed' in tracks.columns:
+            self.allowed_speed = pd.to_numeric(tracks['allowed_speed'], errors='coerce').fillna(60).to_numpy(dtype=float)
+        else:
+            self.allowed_speed = np.full(len(tracks), 60.0)
+
+        self.stations = pd.Index(pd.unique(np.concatenate([self.from_station, self.to_station])))
+        self.from_code = self.stations.get_indexer(self.from_station)
+        self.to_code = self.stations.get_indexer(self.to_station)
+
+        self.out_offsets, self.out_tracks = self._csr(self.from_code)
+        self.in_offsets, self.in_tracks = self._csr(self.to_code)
+        self.pred_offsets, self.pred_tracks = self._predecessor_index()
+
+        self._upstream_cache = {}
+
+    def _csr(self, station_codes):
+        """Offsets and track rows grouped by station code"""
+        order = np.argsort(station_codes, kind='stable')
+        counts = np.bincount(station_codes, minlength=len(self.stations))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return offsets, order
+
+    def _predecessor_index(self):
+        """Per track (CSR), the tracks feeding it, without its reverse track"""
+        n_tracks = len(self.track_ids)
+        pairs = pd.DataFrame({'pred': np.arange(n_tracks), 'station': self.to_code}).merge(
+            pd.DataFrame({'track': np.arange(n_tracks), 'station': self.from_code}), on='station'
+        )
+        pred = pairs['pred'].to_numpy(dtype=np.int64)
+        track = pairs['track'].to_numpy(dtype=np.int64)
+        keep = (pred != track) & (self.from_code[pred] != self.to_code[track])
+        pred, track = pred[keep], track[keep]
+
+        order = np.argsort(track, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(track, minlength=n_tracks))))
+        return offsets, pred[order]
+
+    def matches(self, tracks_data):
+        """True if the topology was built from the same set of tracks"""
+        ids = tracks_data['id'].drop_duplicates().to_numpy()
+        return len(ids) == len(self.track_ids) and np.array_equal(ids, self.track_ids)
+
+    def row(self, track_id):
+        """Internal row of a track id (-1 if unknown)"""
+        return int(self.track_index.get_indexer([track_id])[0])
+
+    def successors(self, track_row):
+        """Rows of tracks that start where this track ends"""
+        station = self.to_code[track_row]
+        return self.out_tracks[self.out_offsets[station]:self.out_offsets[station + 1]]
+
+    def predecessors(self, track_row):
+        """Rows of tracks that end where this track starts (its reverse track excluded)"""
+        return self.pred_tracks[self.pred_offsets[track_row]:self.pred_offsets[track_row + 1]]
+
+    def upstream_tracks(self, track_id, max_hops=2):
+        """Tracks within `max_hops` upstream of a track.
+
+        Returns {upstream track id: km from the end of that track to the start
+        of `track_id`} using the shortest path through intermediate tracks.
+        """
+        cache_key = (track_id, max_hops)
+        if cache_key in self._upstream_cache:
+            return self._upstream_cache[cache_key]
+
+        target = self.row(track_id)
+        upstream = {}
+        if target >= 0:
+            # Hop-bounded relaxation over reverse adjacency
+            best = {target: 0.0}
+            frontier = {target: 0.0}
+            for _ in range(max_hops):
+                next_frontier = {}
+                for track_row, distance in frontier.items():
+                    via = distance if track_row == target else distance + self.length_km[track_row]
+                    for pred in self.predecessors(track_row).tolist():
+                        if pred == target:
+                            continue
+                        if via < best.get(pred, np.inf):
+                            best[pred] = via
+                            next_frontier[pred] = via
+                frontier = next_frontier
+            best.pop(target)
+            upstream = {self.track_ids[row].item(): float(distance) for row, distance in best.items()}
+
+        self._upstream_cache[cache_key] = upstream
+        return upstream
+
+    def trains_approaching(self, track_id, position_index, max_hops=2, min_speed_kmph=10):
+        """Moving trains on tracks within `max_hops` upstream of `track_id`.
+
+        The distance reported is the remaining km on the train's own track
+        plus the intermediate tracks up to the start of `track_id`.
+        """
+        approaching = []
+        for upstream_id, distance_after in self.upstream_tracks(track_id, max_hops).items():
+            rows = position_index.rows(upstream_id)
+            if rows.size == 0:
+                continue
+
+            rows = rows[position_index.speed_kmph[rows] > min_speed_kmph]
+            remaining = np.clip(self.length_km[self.row(upstream_id)] - position_index.position_km[rows], 0, None)
+            distance_km = remaining + distance_after
+
+            for row, distance in zip(rows.tolist(), distance_km.tolist()):
+                approaching.append({
+                    'train_id': position_index.train_ids[row],
+                    'current_track': upstream_id,
+                    'position_km': float(position_index.position_km[row]),
+                    'speed_kmph': float(position_index.speed_kmph[row]),
+                    'timestamp': position_index.timestamps[row],
+                    'distance_to_track_km': round(distance, 3)
+                })
+        return approaching
+
+
+class TrackPositionIndex:
+    """Train positions sorted by (track, position) with per-track row ranges"""
+
+    def __init__(self, positions):
+        track_ids = positions['track_id'].to_numpy()
+        position_km = pd.to_numeric(positions['position_km'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        order = sort_by_track_position(track_ids, position_km)
+
+        self.track_ids = track_ids[order]
+        self.position_km = position_km[order]
+        self.speed_kmph = pd.to_numeric(positions['speed_kmph'], errors='coerce').fillna(0).to_numpy(dtype=float)[order]
+        self.train_ids = positions['train_id'].to_numpy()[order]
+        self.timestamps = positions['timestamp'].to_numpy()[order]
+
+        starts, ids = track_boundaries(self.track_ids)
+        ends = np.r_[starts[1:], len(self.track_ids)]
+        self.ranges = dict(zip(ids.tolist(), zip(starts.tolist(), ends.tolist())))
+
+    def rows(self, track_id):
+        """Sorted-row indices of the trains on a track"""
+        start, end = self.ranges.get(track_id, (0, 0))
+        return np.arange(start, end)
@@ -6,13 +6,26 @@ AI system that monitors live tracks, detects blockages/incidents,
 and automatically reroutes approaching trains to prevent collisions
 """
 
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import json
 import warnings
 warnings.filterwarnings('ignore')
 
+from monitoring.conflicts import sort_by_track_position, track_boundaries, detect_adjacent_conflicts
+from monitoring.position_history import PositionHistoryStore
+from monitoring.topology import TrackTopology, TrackPositionIndex
+from monitoring.routing import RoutingEngine
+from monitoring.contingency import ContingencyTable
+from monitoring.collision_prediction import predict_conflicts
+from monitoring.incident_classifier import IncidentClassifier, CLEARANCE_HOURS
+from monitoring.blockage_store import BlockageStore
+from monitoring.decision_queue import DecisionQueue, SEVERITY_RANK
+from monitoring.report_writer import RotatingReportLog, TrackStatusDelta
+from monitoring.alert_cache import AlertStateCache
+from monitoring.signal_index import SignalIndex, ASPECT_CODES, ASPECT_NAMES
+
 class TrackMonitoringSystem:
     """Real-time track monitoring and collision avoidance AI"""
     
@@ -23,16 +36,55 @@ class TrackMonitoringSystem:
         self.SAFETY_DISTANCE_KM = 5.0  # Minimum safe distance between trains
         self.APPROACH_WARNING_KM = 10.0  # Distance to start monitoring approaching trains
         self.CRITICAL_SPEED_KMPH = 80  # Speed above which collision risk is critical
+        self.APPROACH_HOPS = 2  # Upstream tracks searched for trains approaching a blockage
+        self.LOOKAHEAD_MINUTES = 30  # Horizon for projected train-to-train conflicts
+        self.STATIONARY_BLOCK_MINUTES = 15  # A stationary-train blockage lapses unless re-confirmed
         
         # Track monitoring status
-        self.blocked_tracks = set()
+        self.blockages = BlockageStore()
+        self.blocked_tracks = self.blockages.blocked_tracks  # Live read-only view
+        self.clock = datetime.now
         self.monitored_trains = {}
         self.active_alerts = []
+        self.alert_cache = AlertStateCache()  # Only new, escalated and cleared alerts go downstream
+        self.decision_queue = DecisionQueue()  # Pending actions, earliest deadline first
+        
+        # Keyword matcher for incident descriptions (memoized per description)
+        self.incident_classifier = IncidentClassifier()
+        
+        # Recent position reports per train (drives stationary detection)
+        self.position_history = PositionHistoryStore(stationary_speed_kmph=5.0)
+        
+        # Track graph (rebuilt only when the track set changes) and router over it
+        self.topology = None
+        self.router = None
+        self.stations_data = None
+        self.last_track_status = {}
+        
+        # Signal positions per track (next signal ahead of each train)
+        self.signals = None
+        self.signals_data = None
+        
+        # Precomputed N-1 detours (built offline by monitoring/contingency.py)
+        self.contingency = None
+        self.contingency_current = False
+        contingency_path = os.path.join(models_dir, 'contingency_table.pkl')
+        if os.path.exists(contingency_path):
+            self.contingency = ContingencyTable.load(contingency_path)
+        
+        # Reports go to one rotating NDJSON log instead of a file per cycle
+        self.report_log = RotatingReportLog(os.path.join(models_dir, 'track_monitoring_reports.ndjson'))
+        self.report_delta = TrackStatusDelta()
         
         print("🚨 Real-time Track Monitoring System Initialized")
         print(f"   Safety Distance: {self.SAFETY_DISTANCE_KM} km")
         print(f"   Approach Warning: {self.APPROACH_WARNING_KM} km")
     
+    @property
+    def blocked_version(self):
+        """Changes whenever a track enters or leaves the blocked set"""
+        return self.blockages.version
+    
     def monitor_live_tracks(self, real_time_positions, tracks_data):
         """Monitor all tracks for train positions and potential conflicts"""
         print("\\n🔍 Monitoring Live Track Status...")
@@ -42,86 +94,264 @@ class TrackMonitoringSystem:
             return {}
         
         track_status = {}
-        current_time = datetime.now()
+        self.expire_blockages()
+        
+        # Keep only positions on known tracks and attach each track's length
+        topology = self.ensure_topology(tracks_data)
+        track_rows = topology.track_index.get_indexer(real_time_positions['track_id'])
+        known = track_rows >= 0
+        positions = real_time_positions[known]
+        if positions.empty:
+            print("✅ Monitored 0 tracks with 0 trains")
+            return {}
         
-        # Group trains by track
-        trains_by_track = real_time_positions.groupby('track_id')
+        # Record the reports so stationary time comes from real history
+        self.position_history.update(positions)
         
-        for track_id, track_trains in trains_by_track:
-            track_info = tracks_data[tracks_data['id'] == track_id]
-            
-            if track_info.empty:
-                continue
-                
-            track_length = float(track_info.iloc[0].get('distance_km', 10))
-            track_name = f"Track {track_id}"
-            
-            # Sort trains by position on track
-            track_trains_sorted = track_trains.sort_values('position_km')
-            
+        # Single sort of the whole positions table by (track, position)
+        track_ids = positions['track_id'].to_numpy()
+        position_km = pd.to_numeric(positions['position_km'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        speed_kmph = pd.to_numeric(positions['speed_kmph'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        
+        order = sort_by_track_position(track_ids, position_km)
+        track_ids = track_ids[order]
+        position_km = position_km[order]
+        speed_kmph = speed_kmph[order]
+        sorted_rows = track_rows[known][order]
+        lengths = topology.length_km[sorted_rows]
+        train_ids = positions['train_id'].to_numpy()[order]
+        timestamps = positions['timestamp'].to_numpy()[order]
+        
+        starts, unique_tracks = track_boundaries(track_ids)
+        train_counts = np.diff(np.r_[starts, len(track_ids)])
+        
+        for track_id, first, count in zip(unique_tracks.tolist(), starts.tolist(), train_counts.tolist()):
             track_status[track_id] = {
-                'track_name': track_name,
-                'track_length_km': track_length,
-                'total_trains': len(track_trains_sorted),
+                'track_name': f"Track {track_id}",
+                'track_length_km': float(lengths[first]),
+                'total_trains': count,
                 'trains_on_track': [],
                 'potential_conflicts': [],
                 'status': 'CLEAR'
             }
+        
+        # Vectorized separation check between adjacent trains on each track
+        conflicts = detect_adjacent_conflicts(track_ids, position_km, speed_kmph, self.SAFETY_DISTANCE_KM)
+        
+        # Only stationary trains and conflict participants get per-train records
+        stationary = speed_kmph < 5
+        flagged = stationary.copy()
+        flagged[conflicts['rear']] = True
+        flagged[conflicts['front']] = True
+        
+        # Next signal ahead of every train in one lookup
+        signal_ahead = self.signals.next_signal_ahead(sorted_rows, position_km) if self.signals else None
+        
+        stationary_minutes = np.zeros(len(track_ids))
+        stationary_minutes[stationary] = self.position_history.stationary_minutes(
+            train_ids[stationary], as_of=timestamps[stationary]
+        )
+        
+        for idx in np.flatnonzero(flagged).tolist():
+            track_id = track_ids[idx]
+            train_info = {
+                'train_id': train_ids[idx],
+                'position_km': float(position_km[idx]),
+                'speed_kmph': float(speed_kmph[idx]),
+                'timestamp': timestamps[idx],
+                'status': 'MOVING' if speed_kmph[idx] > 5 else 'STATIONARY'
+            }
+            if signal_ahead is not None:
+                train_info.update(self._signal_fields(signal_ahead, idx))
             
-            # Analyze each train on this track
-            for idx, (_, train) in enumerate(track_trains_sorted.iterrows()):
-                train_info = {
-                    'train_id': train['train_id'],
-                    'position_km': float(train.get('position_km', 0)),
-                    'speed_kmph': float(train.get('speed_kmph', 0)),
-                    'timestamp': train['timestamp'],
-                    'status': 'MOVING' if train.get('speed_kmph', 0) > 5 else 'STATIONARY'
-                }
+            # Check if train is stationary (potential blockage)
+            if speed_kmph[idx] < 5:
+                train_info['stationary_duration'] = round(float(stationary_minutes[idx]), 1)
                 
-                # Check if train is stationary (potential blockage)
-                if train_info['speed_kmph'] < 5:
-                    train_info['stationary_duration'] = self.calculate_stationary_duration(
-                        train['train_id'], train['timestamp']
+                # If stationary for more than 10 minutes, consider it a blockage
+                if train_info['stationary_duration'] > 10:
+                    train_info['blockage_risk'] = 'HIGH'
+                    track_status[track_id]['status'] = 'BLOCKED'
+                    # Re-confirmed every cycle the train stays put (expiry rounded to the minute)
+                    self.block_track(
+                        track_id, ('stationary', train_ids[idx]),
+                        (pd.Timestamp(self.clock()) + timedelta(minutes=self.STATIONARY_BLOCK_MINUTES)).ceil('min')
                     )
-                    
-                    # If stationary for more than 10 minutes, consider it a blockage
-                    if train_info['stationary_duration'] > 10:
-                        train_info['blockage_risk'] = 'HIGH'
-                        track_status[track_id]['status'] = 'BLOCKED'
-                        self.blocked_tracks.add(track_id)
-                    else:
-                        train_info['blockage_risk'] = 'MEDIUM'
                 else:
-                    train_info['blockage_risk'] = 'LOW'
-                
-                track_status[track_id]['trains_on_track'].append(train_info)
-            
-            # Check for potential train-to-train conflicts
-            track_status[track_id]['potential_conflicts'] = self.detect_train_conflicts(
-                track_status[track_id]['trains_on_track']
-            )
+                    train_info['blockage_risk'] = 'MEDIUM'
+            else:
+                train_info['blockage_risk'] = 'LOW'
             
-            if track_status[track_id]['potential_conflicts']:
-                track_status[track_id]['status'] = 'CONFLICT_RISK'
+            track_status[track_id]['trains_on_track'].append(train_info)
+        
+        # Attach train-to-train conflicts to their tracks
+        for conflict in self._conflict_records(conflicts, track_ids, train_ids, signal_ahead):
+            track_id = conflict.pop('track_id')
+            track_status[track_id]['potential_conflicts'].append(conflict)
+            track_status[track_id]['status'] = 'CONFLICT_RISK'
         
-        print(f"✅ Monitored {len(track_status)} tracks with {sum(ts['total_trains'] for ts in track_status.values())} trains")
+        print(f"✅ Monitored {len(track_status)} tracks with {len(track_ids)} trains")
         
+        self.last_track_status = track_status
         return track_status
     
+    def ensure_topology(self, tracks_data):
+        """Build the track graph, reusing it while the track set is unchanged"""
+        if self.topology is None or not self.topology.matches(tracks_data):
+            self.topology = TrackTopology(tracks_data)
+            self.router = RoutingEngine(self.topology, self.stations_data)
+            if self.signals_data is not None:
+                previous = self.signals
+                self.signals = SignalIndex(self.signals_data, self.topology)
+                if previous is not None:
+                    # Keep aspects changed in place since the signals were loaded
+                    self.signals.set_status(previous.signal_ids, ASPECT_NAMES[previous.aspects])
+            
+            # Detours are only trusted if built from the same tracks
+            self.contingency_current = self.contingency is not None and self.contingency.covers(tracks_data)
+            if self.contingency is not None and not self.contingency_current:
+                print("⚠️ Contingency table is out of date - rebuild with monitoring/contingency.py")
+        return self.topology
+    
+    def set_station_coordinates(self, stations_data):
+        """Station lat/lon used by the router's A* heuristic"""
+        self.stations_data = stations_data
+        if self.topology is not None:
+            self.router = RoutingEngine(self.topology, stations_data)
+    
+    def set_signals(self, signals_data):
+        """Signals (track_id, position_km, status); the index is rebuilt only if the signal set changes"""
+        if self.signals is not None and self.signals.matches(signals_data):
+            self.signals.set_status(signals_data['id'].to_numpy(), signals_data['status'].to_numpy())
+        elif self.topology is not None:
+            self.signals = SignalIndex(signals_data, self.topology)
+        self.signals_data = signals_data
+    
+    def update_signal_status(self, signal_ids, statuses):
+        """Apply signal aspect changes in place; returns how many changed"""
+        if self.signals is None:
+            return 0
+        return self.signals.set_status(signal_ids, statuses)
+    
+    def _signal_fields(self, signal_ahead, idx):
+        """Next-signal fields of one train from a next_signal_ahead result"""
+        if signal_ahead['signal'][idx] < 0:
+            return {'next_signal_id': None, 'distance_to_signal_km': None, 'next_signal_aspect': None}
+        return {
+            'next_signal_id': signal_ahead['signal_id'][idx].item(),
+            'distance_to_signal_km': round(float(signal_ahead['distance_km'][idx]), 3),
+            'next_signal_aspect': ASPECT_NAMES[signal_ahead['aspect'][idx]]
+        }
+    
+    def block_track(self, track_id, cause='manual', expires_at=None):
+        """Mark a track blocked; cached routes are invalidated only on a real change"""
+        return self.blockages.block(track_id, cause, expires_at)
+    
+    def expire_blockages(self, now=None):
+        """Lift blockages whose estimated clearance time has passed"""
+        cleared = self.blockages.expire(now or self.clock())
+        if cleared:
+            print(f"✅ Cleared {len(cleared)} blocked tracks past their clearance time")
+        return cleared
+    
+    def predict_collision_risks(self, real_time_positions, tracks_data, horizon_minutes=None):
+        """Project all trains forward and rank predicted unsafe approaches by time to conflict"""
+        print("\n🔮 Predicting Train-to-Train Conflicts...")
+        
+        horizon_minutes = horizon_minutes or self.LOOKAHEAD_MINUTES
+        if real_time_positions.empty or tracks_data.empty:
+            return []
+        
+        topology = self.ensure_topology(tracks_data)
+        # The positions table keeps every report; only a train's latest one is where it is now
+        latest = real_time_positions.sort_values('timestamp', kind='stable').drop_duplicates('train_id', keep='last')
+        position_index = TrackPositionIndex(latest)
+        predicted = predict_conflicts(topology, position_index, horizon_minutes, self.SAFETY_DISTANCE_KM)
+        
+        predicted_conflicts = []
+        for a, b, kind, start_sep, min_sep, t_closest, t_conflict in zip(
+            predicted['train_a'].tolist(), predicted['train_b'].tolist(), predicted['kind'].tolist(),
+            predicted['start_separation_km'].tolist(), predicted['min_separation_km'].tolist(),
+            predicted['time_to_closest_approach_minutes'].tolist(), predicted['time_to_conflict_minutes'].tolist()
+        ):
+            if min_sep < 1 and t_conflict < 10:
+                risk_level = 'CRITICAL'
+            elif t_conflict < 20:
+                risk_level = 'HIGH'
+            else:
+                risk_level = 'MEDIUM'
+            
+            predicted_conflicts.append({
+                'conflict_type': kind,
+                'train1_id': position_index.train_ids[a],
+                'train2_id': position_index.train_ids[b],
+                'train1_track': position_index.track_ids[a],
+                'train2_track': position_index.track_ids[b],
+                'current_separation_km': round(start_sep, 2),
+                'min_separation_km': round(min_sep, 2),
+                'time_to_closest_approach': round(t_closest, 1),  # minutes
+                'time_to_conflict': round(t_conflict, 1),  # minutes
+                'risk_level': risk_level
+            })
+        
+        print(f"⚠️ Predicted {len(predicted_conflicts)} conflicts within {horizon_minutes} minutes")
+        
+        return predicted_conflicts
+    
+    def _conflict_records(self, conflicts, track_ids, train_ids, signal_ahead=None):
+        """Build conflict dicts for the flagged pairs of the conflict kernel"""
+        # A signal between the two trains protects the gap; at RED it holds the rear train
+        rear_rows = conflicts['rear']
+        if signal_ahead is not None:
+            between = (signal_ahead['signal'][rear_rows] >= 0) & (signal_ahead['distance_km'][rear_rows] < conflicts['distance_km'])
+            aspects = np.where(between, signal_ahead['aspect'][rear_rows], -1)
+        else:
+            aspects = np.full(len(rear_rows), -1)
+        
+        records = []
+        for rear, front, distance, speed_diff, conflict_time, aspect in zip(
+            rear_rows.tolist(), conflicts['front'].tolist(), conflicts['distance_km'].tolist(),
+            conflicts['speed_difference'].tolist(), conflicts['time_to_conflict_minutes'].tolist(), aspects.tolist()
+        ):
+            record = {
+                'track_id': track_ids[rear],
+                'train1_id': train_ids[rear],
+                'train2_id': train_ids[front],
+                'distance_km': round(distance, 2),
+                'speed_difference': round(speed_diff, 2),
+                'risk_level': 'HIGH' if distance < 2 else 'MEDIUM',
+                'estimated_conflict_time': conflict_time  # minutes
+            }
+            if aspect >= 0:
+                record['protecting_signal_id'] = signal_ahead['signal_id'][rear].item()
+                record['protecting_signal_aspect'] = ASPECT_NAMES[aspect]
+                if aspect == ASPECT_CODES['RED']:
+                    record['risk_level'] = 'LOW'
+            records.append(record)
+        return records
+    
     def detect_incidents_and_failures(self, incidents_data, safety_scenarios):
         """Detect active incidents and technical failures on tracks"""
         print("\\n⚠️ Detecting Track Incidents and Technical Failures...")
         
         active_incidents = {}
+        self.expire_blockages()
         
         # Process active incidents
         if not incidents_data.empty:
             recent_incidents = incidents_data[
                 (incidents_data['status'] == 'active') &
-                (pd.to_datetime(incidents_data['incident_time']) >= datetime.now() - timedelta(hours=6))
+                (pd.to_datetime(incidents_data['incident_time']) >= self.clock() - timedelta(hours=6))
             ]
             
-            for _, incident in recent_incidents.iterrows():
+            # Classify the whole description column in one pass
+            descriptions = recent_incidents.get('description', pd.Series('', index=recent_incidents.index))
+            incident_types, severities = self.incident_classifier.classify_many(descriptions)
+            clearance_times = self.incident_classifier.clearance_times(recent_incidents['incident_time'], severities)
+            
+            for incident, incident_type, severity, clearance_time in zip(
+                recent_incidents.to_dict('records'), incident_types, severities, clearance_times
+            ):
                 track_id = incident['track_id']
                 
                 if track_id not in active_incidents:
@@ -129,24 +359,27 @@ class TrackMonitoringSystem:
                 
                 incident_info = {
                     'incident_id': incident['id'],
-                    'incident_type': self.classify_incident_type(incident.get('description', '')),
-                    'severity': self.calculate_incident_severity(incident),
+                    'incident_type': incident_type,
+                    'severity': severity,
                     'position_km': float(incident.get('position_km', 0)),
                     'description': incident.get('description', 'Unknown incident'),
                     'incident_time': incident['incident_time'],
-                    'estimated_clearance_time': self.estimate_clearance_time(incident)
+                    'estimated_clearance_time': pd.Timestamp(clearance_time)
                 }
                 
                 active_incidents[track_id].append(incident_info)
                 
-                # Mark track as blocked if severe incident
-                if incident_info['severity'] in ['HIGH', 'CRITICAL']:
-                    self.blocked_tracks.add(track_id)
+                # Mark track as blocked if severe incident (until its estimated clearance)
+                if incident_info['severity'] in ['HIGH', 'CRITICAL'] and incident_info['estimated_clearance_time'] > self.clock():
+                    self.block_track(
+                        track_id, ('incident', incident_info['incident_id']),
+                        incident_info['estimated_clearance_time']
+                    )
         
         # Process safety scenarios (technical failures)
         if not safety_scenarios.empty:
             recent_scenarios = safety_scenarios[
-                pd.to_datetime(safety_scenarios['scenario_time']) >= datetime.now() - timedelta(hours=2)
+                pd.to_datetime(safety_scenarios['scenario_time']) >= self.clock() - timedelta(hours=2)
             ]
             
             for _, scenario in recent_scenarios.iterrows():
@@ -164,11 +397,14 @@ class TrackMonitoringSystem:
                             'position_km': float(scenario.get('position_km', 0)),
                             'description': f"Technical failure: {scenario.get('scenario_type', 'Unknown')}",
                             'incident_time': scenario['scenario_time'],
-                            'estimated_clearance_time': datetime.now() + timedelta(hours=2)
+                            'estimated_clearance_time': pd.to_datetime(scenario['scenario_time']) + timedelta(hours=2)
                         }
                         
                         active_incidents[track_id].append(failure_info)
-                        self.blocked_tracks.add(track_id)
+                        if failure_info['estimated_clearance_time'] > self.clock():
+                            self.block_track(
+                                track_id, ('scenario', scenario['id']), failure_info['estimated_clearance_time']
+                            )
         
         print(f"✅ Detected incidents on {len(active_incidents)} tracks")
         for track_id, incidents in active_incidents.items():
@@ -181,33 +417,50 @@ class TrackMonitoringSystem:
         print("\\n🚂 Detecting Trains Approaching Blocked Areas...")
         
         approaching_trains = []
+        if self.topology is None or real_time_positions.empty:
+            print("❌ Track topology not loaded - run monitor_live_tracks() first")
+            return approaching_trains
         
+        # Index positions by track once for all blocked tracks
+        position_index = TrackPositionIndex(real_time_positions)
+        
+        candidates = []
         for track_id in self.blocked_tracks:
-            if track_id not in track_status:
-                continue
-            
-            # Find all trains on adjacent tracks that might approach this blocked track
+            # Find moving trains on upstream tracks that lead into this blocked track
             adjacent_trains = self.find_trains_approaching_track(
-                track_id, real_time_positions, track_status
+                track_id, position_index, track_status
+            )
+            candidates.extend((track_id, train_info) for train_info in adjacent_trains)
+        
+        # Next signal ahead of all candidate trains in one lookup
+        if self.signals and candidates:
+            signal_ahead = self.signals.next_signal_ahead(
+                self.topology.track_index.get_indexer([info['current_track'] for _, info in candidates]),
+                [info['position_km'] for _, info in candidates]
+            )
+            for idx, (_, train_info) in enumerate(candidates):
+                train_info.update(self._signal_fields(signal_ahead, idx))
+        
+        for track_id, train_info in candidates:
+            # Calculate collision risk
+            collision_risk = self.calculate_collision_risk(
+                train_info, track_id, incidents.get(track_id, [])
             )
             
-            for train_info in adjacent_trains:
-                # Calculate collision risk
-                collision_risk = self.calculate_collision_risk(
-                    train_info, track_id, incidents.get(track_id, [])
-                )
-                
-                if collision_risk['risk_level'] in ['HIGH', 'CRITICAL']:
-                    approaching_trains.append({
-                        'train_id': train_info['train_id'],
-                        'current_track': train_info['current_track'],
-                        'target_track': track_id,
-                        'distance_to_conflict': collision_risk['distance_km'],
-                        'time_to_conflict': collision_risk['time_minutes'],
-                        'current_speed': train_info['speed_kmph'],
-                        'risk_level': collision_risk['risk_level'],
-                        'recommended_action': collision_risk['recommended_action']
-                    })
+            if collision_risk['risk_level'] in ['HIGH', 'CRITICAL']:
+                approaching_trains.append({
+                    'train_id': train_info['train_id'],
+                    'current_track': train_info['current_track'],
+                    'target_track': track_id,
+                    'distance_to_conflict': collision_risk['distance_km'],
+                    'time_to_conflict': collision_risk['time_minutes'],
+                    'current_speed': train_info['speed_kmph'],
+                    'risk_level': collision_risk['risk_level'],
+                    'recommended_action': collision_risk['recommended_action'],
+                    'next_signal_id': train_info.get('next_signal_id'),
+                    'distance_to_signal_km': train_info.get('distance_to_signal_km'),
+                    'next_signal_aspect': train_info.get('next_signal_aspect')
+                })
         
         print(f"⚠️ Found {len(approaching_trains)} trains requiring immediate attention")
         
@@ -218,20 +471,36 @@ class TrackMonitoringSystem:
         print("\\n🗺️ Generating Automatic Rerouting Decisions...")
         
         rerouting_decisions = []
-        
-        for train in approaching_trains:
+        if not approaching_trains:
+            print(f"✅ Generated 0 rerouting decisions ({len(self.decision_queue)} pending)")
+            return rerouting_decisions
+        
+        # Trains leaving their track at the same station towards the same blocked
+        # track share a detour, so each (exit station, blocked track) is routed once
+        topology = self.ensure_topology(tracks_data)
+        current_rows = topology.track_index.get_indexer([train['current_track'] for train in approaching_trains])
+        blocked_rows = topology.track_index.get_indexer([train['target_track'] for train in approaching_trains])
+        group_routes = {}
+        
+        for train, current_row, blocked_row in zip(approaching_trains, current_rows.tolist(), blocked_rows.tolist()):
             train_id = train['train_id']
             current_track = train['current_track']
             blocked_track = train['target_track']
             
-            # Find alternate routes
-            alternate_routes = self.find_alternate_routes(
-                current_track, blocked_track, tracks_data
-            )
+            best_route = None
+            if current_row >= 0 and blocked_row >= 0:
+                origin = topology.to_station[current_row].item()
+                destination = topology.to_station[blocked_row].item()
+                group = (origin, blocked_track)
+                if group not in group_routes:
+                    # Precomputed detour first, live route search only if none applies
+                    alternate_routes = (self._contingency_routes(blocked_track, origin, destination)
+                                        or self._alternate_routes(origin, destination))
+                    group_routes[group] = self.select_best_route(alternate_routes, train)
+                best_route = group_routes[group]
             
-            if alternate_routes:
-                # Select best alternate route
-                best_route = self.select_best_route(alternate_routes, train)
+            if best_route:
+                best_route = dict(best_route)
                 
                 decision = {
                     'train_id': train_id,
@@ -241,141 +510,128 @@ class TrackMonitoringSystem:
                     'alternate_route': best_route,
                     'priority': train['risk_level'],
                     'time_sensitive': train['time_to_conflict'] < 15,  # Less than 15 minutes
-                    'decision_time': datetime.now(),
+                    'time_to_conflict': train['time_to_conflict'],
+                    'decision_time': self.clock(),
                     'estimated_delay': best_route.get('additional_time_minutes', 0)
                 }
             else:
-                # No alternate route - emergency stop required
+                # No alternate route - emergency stop required, at the next signal if it comes first
+                stop_position = max(0, train['distance_to_conflict'] - self.SAFETY_DISTANCE_KM)
+                signal_distance = train.get('distance_to_signal_km')
+                stop_signal = None
+                if signal_distance is not None and signal_distance <= stop_position:
+                    stop_position, stop_signal = signal_distance, train['next_signal_id']
+                
                 decision = {
                     'train_id': train_id,
                     'decision_type': 'EMERGENCY_STOP',
                     'current_track': current_track,
                     'blocked_track': blocked_track,
-                    'stop_position': max(0, train['distance_to_conflict'] - self.SAFETY_DISTANCE_KM),
+                    'stop_position': stop_position,
+                    'stop_signal_id': stop_signal,
                     'priority': 'CRITICAL',
                     'time_sensitive': True,
-                    'decision_time': datetime.now(),
+                    'time_to_conflict': train['time_to_conflict'],
+                    'decision_time': self.clock(),
                     'reason': 'No alternate route available'
                 }
             
             rerouting_decisions.append(decision)
+            
+            # Queue for the executor (repeats of a pending/dispatched instruction are dropped)
+            self.decision_queue.push(decision)
         
-        # Sort by priority and time sensitivity
+        # Earliest deadline first, most severe on ties
         rerouting_decisions.sort(key=lambda x: (
-            x['priority'] == 'CRITICAL',
-            x['time_sensitive'],
-            x['decision_time']
-        ), reverse=True)
+            DecisionQueue.deadline(x),
+            SEVERITY_RANK.get(x['priority'], 3)
+        ))
         
-        print(f"✅ Generated {len(rerouting_decisions)} rerouting decisions")
+        print(f"✅ Generated {len(rerouting_decisions)} rerouting decisions ({len(self.decision_queue)} pending)")
         
         return rerouting_decisions
     
+    def update_alerts(self, track_status, rerouting_decisions, predicted_conflicts=None, now=None):
+        """Fold this cycle's conditions into the alert cache; returns only the changes"""
+        now = now or self.clock()
+        observations = []
+        
+        for track_id, status in track_status.items():
+            for train in status['trains_on_track']:
+                if train.get('blockage_risk') == 'HIGH':
+                    observations.append((train['train_id'], track_id, 'STATIONARY_BLOCKAGE', 'HIGH', train))
+            for conflict in status['potential_conflicts']:
+                observations.append((conflict['train1_id'], track_id, 'TRACK_CONFLICT', conflict['risk_level'], conflict))
+        
+        for decision in rerouting_decisions:
+            observations.append((decision['train_id'], decision['blocked_track'], decision['decision_type'],
+                                 decision['priority'], decision))
+        
+        for conflict in predicted_conflicts or []:
+            observations.append((conflict['train1_id'], conflict['train1_track'], 'PREDICTED_CONFLICT',
+                                 conflict['risk_level'], conflict))
+        
+        alert_events = self.alert_cache.update(observations, now)
+        self.active_alerts = self.alert_cache.active()
+        
+        counts = pd.Series([event['event'] for event in alert_events], dtype=object).value_counts()
+        print(f"🔔 Alerts: {counts.get('NEW', 0)} new, {counts.get('ESCALATED', 0)} escalated, "
+              f"{counts.get('CLEARED', 0)} cleared ({len(self.alert_cache)} active)")
+        
+        return alert_events
+    
     def calculate_stationary_duration(self, train_id, current_timestamp):
-        """Calculate how long a train has been stationary"""
-        # This would typically check historical positions
-        # For now, return a simulated duration
-        return np.random.randint(5, 30)  # 5-30 minutes
+        """Calculate how long a train has been stationary (minutes, from position history)"""
+        return float(self.position_history.stationary_minutes([train_id], as_of=current_timestamp)[0])
     
     def detect_train_conflicts(self, trains_on_track):
         """Detect potential conflicts between trains on same track"""
-        conflicts = []
-        
-        for i in range(len(trains_on_track) - 1):
-            train1 = trains_on_track[i]
-            train2 = trains_on_track[i + 1]
-            
-            distance = abs(train2['position_km'] - train1['position_km'])
-            
-            if distance < self.SAFETY_DISTANCE_KM:
-                # Check relative speeds and directions
-                speed_diff = abs(train2['speed_kmph'] - train1['speed_kmph'])
-                
-                conflict = {
-                    'train1_id': train1['train_id'],
-                    'train2_id': train2['train_id'],
-                    'distance_km': round(distance, 2),
-                    'speed_difference': round(speed_diff, 2),
-                    'risk_level': 'HIGH' if distance < 2 else 'MEDIUM',
-                    'estimated_conflict_time': max(1, distance / max(speed_diff, 1) * 60)  # minutes
-                }
-                
-                conflicts.append(conflict)
-        
-        return conflicts
+        if len(trains_on_track) < 2:
+            return []
+        
+        trains = pd.DataFrame(trains_on_track).sort_values('position_km')
+        track_ids = np.zeros(len(trains), dtype=np.int64)
+        conflicts = detect_adjacent_conflicts(
+            track_ids,
+            trains['position_km'].to_numpy(dtype=float),
+            trains['speed_kmph'].to_numpy(dtype=float),
+            self.SAFETY_DISTANCE_KM
+        )
+        
+        records = self._conflict_records(conflicts, track_ids, trains['train_id'].to_numpy())
+        for record in records:
+            record.pop('track_id')
+        return records
     
     def classify_incident_type(self, description):
         """Classify incident type from description"""
-        desc_lower = str(description).lower()
-        
-        if any(word in desc_lower for word in ['signal', 'red', 'communication']):
-            return 'SIGNAL_FAILURE'
-        elif any(word in desc_lower for word in ['derail', 'accident', 'collision']):
-            return 'DERAILMENT'
-        elif any(word in desc_lower for word in ['engine', 'brake', 'technical']):
-            return 'TECHNICAL_FAILURE'
-        elif any(word in desc_lower for word in ['track', 'rail', 'infrastructure']):
-            return 'TRACK_DAMAGE'
-        else:
-            return 'OTHER'
+        return self.incident_classifier.classify(description)[0]
     
     def calculate_incident_severity(self, incident):
         """Calculate severity of incident"""
-        desc = str(incident.get('description', '')).lower()
-        
-        if any(word in desc for word in ['critical', 'emergency', 'derail', 'collision']):
-            return 'CRITICAL'
-        elif any(word in desc for word in ['major', 'signal', 'failure']):
-            return 'HIGH'
-        elif any(word in desc for word in ['minor', 'delay', 'slow']):
-            return 'MEDIUM'
-        else:
-            return 'LOW'
+        return self.incident_classifier.classify(incident.get('description', ''))[1]
     
-    def estimate_clearance_time(self, incident):
+    def estimate_clearance_time(self, incident, severity=None):
         """Estimate when incident will be cleared"""
-        severity = self.calculate_incident_severity(incident)
+        severity = severity or self.calculate_incident_severity(incident)
         incident_time = pd.to_datetime(incident['incident_time'])
         
-        clearance_hours = {
-            'CRITICAL': 6,
-            'HIGH': 3,
-            'MEDIUM': 1.5,
-            'LOW': 0.5
-        }
-        
-        return incident_time + timedelta(hours=clearance_hours.get(severity, 2))
+        return incident_time + timedelta(hours=CLEARANCE_HOURS.get(severity, 2))
     
-    def find_trains_approaching_track(self, blocked_track_id, real_time_positions, track_status):
+    def find_trains_approaching_track(self, blocked_track_id, position_index, track_status):
         """Find trains that are approaching a blocked track"""
-        approaching = []
-        
-        # This is a simplified version - you'd need track topology data
-        for _, train in real_time_positions.iterrows():
-            current_track = train['track_id']
-            
-            # Skip if already on blocked track
-            if current_track == blocked_track_id:
-                continue
-            
-            # Check if train might be heading toward blocked track
-            # This would need proper route/topology analysis
-            if train['speed_kmph'] > 10:  # Moving train
-                approaching.append({
-                    'train_id': train['train_id'],
-                    'current_track': current_track,
-                    'position_km': float(train.get('position_km', 0)),
-                    'speed_kmph': float(train.get('speed_kmph', 0)),
-                    'timestamp': train['timestamp']
-                })
-        
-        return approaching
+        # Only trains within APPROACH_HOPS upstream tracks can reach the blockage
+        return self.topology.trains_approaching(
+            blocked_track_id, position_index, max_hops=self.APPROACH_HOPS, min_speed_kmph=10
+        )
     
     def calculate_collision_risk(self, train_info, blocked_track_id, incidents):
         """Calculate collision risk for approaching train"""
-        # Simplified risk calculation
         speed = train_info['speed_kmph']
-        distance = np.random.uniform(5, 20)  # Simulated distance
+        
+        # Path distance to the track entry plus the nearest incident on the track
+        incident_offset = min((incident.get('position_km', 0) for incident in incidents), default=0)
+        distance = train_info['distance_to_track_km'] + incident_offset
         
         time_to_conflict = (distance / max(speed, 1)) * 60  # minutes
         
@@ -389,6 +645,13 @@ class TrackMonitoringSystem:
             risk_level = 'MEDIUM'
             action = 'PLAN_REROUTE'
         
+        # A red signal short of the conflict already holds the train: reroute, no emergency stop
+        signal_distance = train_info.get('distance_to_signal_km')
+        if (risk_level == 'CRITICAL' and train_info.get('next_signal_aspect') == 'RED'
+                and signal_distance is not None and signal_distance < distance):
+            risk_level = 'HIGH'
+            action = 'IMMEDIATE_REROUTE'
+        
         return {
             'risk_level': risk_level,
             'distance_km': distance,
@@ -398,24 +661,78 @@ class TrackMonitoringSystem:
     
     def find_alternate_routes(self, current_track, blocked_track, tracks_data):
         """Find alternate routes avoiding blocked track"""
-        # This would use your existing graph pathfinding logic
-        # For now, return simulated alternate routes
+        topology = self.ensure_topology(tracks_data)
+        current_row, blocked_row = topology.row(current_track), topology.row(blocked_track)
+        if current_row < 0 or blocked_row < 0:
+            return []
         
-        alternate_routes = []
+        # From where the train leaves its track to where the blocked track would have taken it
+        return self._alternate_routes(topology.to_station[current_row].item(), topology.to_station[blocked_row].item())
+    
+    def _alternate_routes(self, origin, destination):
+        """Up to three routes between two stations avoiding the blocked tracks"""
+        routes = self.router.alternate_routes(
+            origin, destination, self.blocked_tracks, self.blocked_version, k=3
+        )
+        normal_minutes = self.router.unblocked_minutes(origin, destination) or 0.0
         
-        # Simulate 2-3 possible alternate routes
-        for i in range(2):
-            route = {
+        alternate_routes = []
+        for i, route in enumerate(routes):
+            alternate_routes.append({
                 'route_id': f"ALT_ROUTE_{i+1}",
-                'track_sequence': [current_track + 100 + i, current_track + 200 + i],
-                'total_distance_km': np.random.uniform(15, 30),
-                'additional_time_minutes': np.random.randint(10, 45),
-                'route_safety_score': np.random.uniform(0.7, 0.95)
-            }
-            alternate_routes.append(route)
+                'track_sequence': route['track_sequence'],
+                'station_sequence': route['station_sequence'],
+                'total_distance_km': route['total_distance_km'],
+                'additional_time_minutes': round(max(route['travel_time_minutes'] - normal_minutes, 0), 1),
+                'route_safety_score': self.route_safety_score(route['track_sequence'])
+            })
         
         return alternate_routes
     
+    def contingency_routes(self, current_track, blocked_track):
+        """Precomputed N-1 detour for this blockage (empty if none applies)"""
+        if not self.contingency_current:
+            return []
+        
+        topology = self.topology
+        current_row, blocked_row = topology.row(current_track), topology.row(blocked_track)
+        if current_row < 0 or blocked_row < 0:
+            return []
+        
+        return self._contingency_routes(
+            blocked_track, topology.to_station[current_row].item(), topology.to_station[blocked_row].item()
+        )
+    
+    def _contingency_routes(self, blocked_track, origin, destination):
+        """Precomputed detour from `origin` to `destination` around `blocked_track`"""
+        if not self.contingency_current:
+            return []
+        
+        topology = self.topology
+        detour = self.contingency.lookup(blocked_track, origin, destination)
+        # Stored detours assume a single failure; skip them if they cross another blocked track
+        if detour is None or not self.blocked_tracks.isdisjoint(detour[2]):
+            return []
+        
+        _, additional_minutes, track_sequence = detour
+        rows = topology.track_index.get_indexer(list(track_sequence))
+        return [{
+            'route_id': 'CONTINGENCY_ROUTE',
+            'track_sequence': list(track_sequence),
+            'station_sequence': topology.from_station[rows[:1]].tolist() + topology.to_station[rows].tolist(),
+            'total_distance_km': round(float(topology.length_km[rows].sum()), 2),
+            'additional_time_minutes': max(additional_minutes, 0),
+            'route_safety_score': self.route_safety_score(track_sequence)
+        }]
+    
+    def route_safety_score(self, track_sequence):
+        """Share of a route's tracks without a live conflict risk (scaled to 0.95)"""
+        at_risk = sum(
+            1 for track_id in track_sequence
+            if self.last_track_status.get(track_id, {}).get('status') == 'CONFLICT_RISK'
+        )
+        return round(0.95 * (1 - at_risk / max(len(track_sequence), 1)), 3)
+    
     def select_best_route(self, alternate_routes, train_info):
         """Select the best alternate route based on multiple criteria"""
         if not alternate_routes:
@@ -432,10 +749,14 @@ class TrackMonitoringSystem:
         # Return route with highest score
         return max(alternate_routes, key=lambda r: r['total_score'])
     
-    def save_monitoring_report(self, track_status, incidents, rerouting_decisions):
-        """Save comprehensive track monitoring report"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"models/track_monitoring_report_{timestamp}.json"
+    def save_monitoring_report(self, track_status, incidents, rerouting_decisions, delta=True):
+        """Append the track monitoring report to the rotating report log"""
+        # Unchanged tracks are left out of delta reports (a full one is written periodically)
+        if delta:
+            track_report = self.report_delta.encode(track_status)
+        else:
+            track_report = {'report_type': 'full', 'track_status': track_status,
+                            'removed_tracks': [], 'unchanged_tracks': 0}
         
         report = {
             'report_timestamp': datetime.now().isoformat(),
@@ -446,34 +767,17 @@ class TrackMonitoringSystem:
                 'rerouting_decisions': len(rerouting_decisions),
                 'critical_alerts': len([d for d in rerouting_decisions if d['priority'] == 'CRITICAL'])
             },
-            'track_status': track_status,
+            **track_report,
             'active_incidents': incidents,
             'rerouting_decisions': rerouting_decisions,
             'blocked_tracks': list(self.blocked_tracks)
         }
         
-        # Make report serializable
-        def make_serializable(obj):
-            if isinstance(obj, (datetime, pd.Timestamp)):
-                return obj.isoformat()
-            elif isinstance(obj, np.integer):
-                return int(obj)
-            elif isinstance(obj, np.floating):
-                return float(obj)
-            elif isinstance(obj, dict):
-                return {key: make_serializable(value) for key, value in obj.items()}
-            elif isinstance(obj, list):
-                return [make_serializable(item) for item in obj]
-            else:
-                return obj
-        
-        serializable_report = make_serializable(report)
-        
-        with open(filename, 'w') as f:
-            json.dump(serializable_report, f, indent=2)
+        self.report_log.append(report)
         
-        print(f"✅ Track monitoring report saved: {filename}")
-        return filename
+        print(f"✅ Track monitoring report saved: {self.report_log.path} "
+              f"({track_report['report_type']}, {len(track_report['track_status'])} tracks)")
+        return self.report_log.path
 
 def main():
     """Main function to run track monitoring system"""
@@ -16,8 +16,9 @@ import joblib
 import json
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
 
@@ -28,6 +29,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 # Import your modules
 from config.database import establish_database_connection
 from data.loader import RailwayDataLoader
+from data.position_snapshot import PositionSnapshotCache
+from data.position_stream import PositionStreamHub
+from scheduler.schedule_index import ScheduleIndex
 
 app = FastAPI(title="DARNEX Railway AI API", version="1.0.0")
 
@@ -40,9 +44,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+MODELS_DIR = "C:/Darnex/models"  # Adjust path as needed
+
 # Global variables to store loaded models
 models = {}
 data_cache = {}
+schedule_reload_lock = asyncio.Lock()
+
+# Live positions are refreshed in the background and served from memory
+position_cache = PositionSnapshotCache(RailwayDataLoader, refresh_seconds=2.0)
+position_stream = PositionStreamHub()
+position_cache.add_listener(position_stream.publish)
 
 class TrainPosition(BaseModel):
     train_id: int
@@ -72,6 +84,40 @@ class TrainSchedule(BaseModel):
     delay_minutes: int
     priority: str
 
+class StationDeparture(BaseModel):
+    train_id: int
+    train_no: Optional[str] = None
+    train_name: Optional[str] = None
+    to_station: Optional[str] = None
+    platform_no: Optional[str] = None
+    departure_time: str
+    arrival_time: Optional[str] = None
+    delay_minutes: int
+    priority: Optional[str] = None
+
+class DepartureBoard(BaseModel):
+    station_id: int
+    station_name: Optional[str] = None
+    total: int
+    offset: int
+    limit: int
+    departures: List[StationDeparture]
+
+class ItineraryStop(BaseModel):
+    order_no: int
+    station_id: int
+    station_name: Optional[str] = None
+    platform_no: Optional[str] = None
+    arrival_time: Optional[str] = None
+    departure_time: Optional[str] = None
+
+class TrainItinerary(BaseModel):
+    train_id: int
+    total: int
+    offset: int
+    limit: int
+    stops: List[ItineraryStop]
+
 @app.on_event("startup")
 async def load_ai_models():
     """Load all trained AI models and cache data on startup"""
@@ -81,7 +127,7 @@ async def load_ai_models():
     
     try:
         # Load trained models
-        models_dir = "C:/Darnex/models"  # Adjust path as needed
+        models_dir = MODELS_DIR
         
         # Load AI models
         models['priority_calculator'] = joblib.load(f"{models_dir}/priority_calculator_model.pkl")
@@ -92,6 +138,7 @@ async def load_ai_models():
         data_cache['railway_df'] = pd.read_pickle(f"{models_dir}/unified_railway_dataset.pkl")
         data_cache['trains_data'] = pd.read_pickle(f"{models_dir}/trains_data.pkl")
         data_cache['final_schedule'] = pd.read_pickle(f"{models_dir}/final_schedule.pkl")
+        data_cache['schedule_index'] = ScheduleIndex(data_cache['final_schedule'])
         data_cache['trains_with_delays'] = pd.read_pickle(f"{models_dir}/trains_with_delays.pkl")
         
         # Load metadata
@@ -106,6 +153,13 @@ async def load_ai_models():
         print(f"❌ Error loading models: {e}")
         # Initialize database loader as fallback
         models['data_loader'] = RailwayDataLoader()
+    
+    position_cache.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """Stop the live position refresher"""
+    await position_cache.stop()
 
 @app.get("/")
 async def root():
@@ -118,68 +172,28 @@ async def root():
     }
 
 @app.get("/api/trains/live-positions", response_model=List[TrainPosition])
-async def get_live_train_positions():
+async def get_live_train_positions(request: Request):
     """Get current positions of all trains for map display"""
-    try:
-        # Connect to database
-        data_loader = RailwayDataLoader()
-        
-        # Get real-time positions from database
-        query = """
-        SELECT 
-            rtp.train_id,
-            t.name as train_name,
-            s1.lat as from_lat,
-            s1.lon as from_lng,
-            s2.lat as to_lat,
-            s2.lon as to_lng,
-            rtp.speed_kmph,
-            tm.status,
-            t.priority,
-            t.type,
-            tr.distance_km,
-            rtp.position_km
-        FROM real_time_positions rtp
-        JOIN trains t ON rtp.train_id = t.id
-        JOIN tracks tr ON rtp.track_id = tr.id
-        JOIN stations s1 ON tr.from_station = s1.id
-        JOIN stations s2 ON tr.to_station = s2.id
-        LEFT JOIN train_movements tm ON tm.train_id = rtp.train_id
-        WHERE rtp.timestamp > NOW() - INTERVAL '1 hour'
-        ORDER BY rtp.timestamp DESC
-        LIMIT 100;
-        """
-        
-        df = data_loader.execute_query(query)
-        
-        positions = []
-        for _, row in df.iterrows():
-            # Calculate current position on track using linear interpolation
-            if row['distance_km'] > 0:
-                progress = min(row['position_km'] / row['distance_km'], 1.0)
-                
-                # Interpolate latitude and longitude
-                current_lat = row['from_lat'] + (row['to_lat'] - row['from_lat']) * progress
-                current_lng = row['from_lng'] + (row['to_lng'] - row['from_lng']) * progress
-            else:
-                current_lat = row['from_lat']
-                current_lng = row['from_lng']
-            
-            positions.append(TrainPosition(
-                train_id=int(row['train_id']),
-                train_name=row['train_name'],
-                lat=float(current_lat),
-                lng=float(current_lng),
-                speed=float(row['speed_kmph']) if row['speed_kmph'] else 0.0,
-                status=row['status'] if row['status'] else 'UNKNOWN',
-                priority=int(row['priority']),
-                type=row['type']
-            ))
-        
-        return positions
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching train positions: {str(e)}")
+    snapshot = await position_cache.current()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail=f"Train positions not available yet: {position_cache.last_error}")
+    
+    # Clients polling with the last ETag get a bodyless 304 until positions change
+    headers = {'ETag': snapshot.etag, 'Cache-Control': 'no-cache'}
+    if request.headers.get('if-none-match') == snapshot.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type='application/json', headers=headers)
+
+@app.get("/api/trains/live-positions/stream")
+async def stream_live_train_positions():
+    """Server-sent events: a full position snapshot on connect, then quantised deltas per change"""
+    if await position_cache.current() is None:
+        raise HTTPException(status_code=503, detail=f"Train positions not available yet: {position_cache.last_error}")
+    return StreamingResponse(
+        position_stream.stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.get("/api/incidents/active", response_model=List[TrackIncident])
 async def get_active_incidents():
@@ -224,43 +238,119 @@ async def get_active_incidents():
 async def get_schedule_predictions(hours_ahead: int = Query(default=6, ge=1, le=24)):
     """Get AI-predicted train schedules for next N hours"""
     try:
-        # Use cached schedule data with AI predictions
-        if 'final_schedule' not in data_cache:
+        # Departures come from the schedule index built at startup
+        if 'schedule_index' not in data_cache:
             raise HTTPException(status_code=503, detail="AI models not loaded")
         
-        schedule_df = data_cache['final_schedule'].copy()
+        schedule_index = data_cache['schedule_index']
         
         # Filter for next N hours
         now = datetime.now()
         future_time = now + timedelta(hours=hours_ahead)
-        
-        # Convert scheduled times to datetime (adjust this based on your data structure)
-        schedule_df['departure_datetime'] = pd.to_datetime(schedule_df.get('scheduled_departure', now))
-        
-        # Filter schedules
-        upcoming = schedule_df[
-            (schedule_df['departure_datetime'] >= now) & 
-            (schedule_df['departure_datetime'] <= future_time)
-        ].head(50)
-        
-        schedules = []
-        for _, row in upcoming.iterrows():
-            schedules.append(TrainSchedule(
-                train_id=int(row.get('train_id', 0)),
-                train_name=row.get('train_name', 'Unknown Train'),
-                from_station=row.get('from_station', 'Unknown'),
-                to_station=row.get('to_station', 'Unknown'),
-                departure_time=row.get('departure_datetime', now).isoformat(),
-                arrival_time=row.get('arrival_datetime', now).isoformat(),
-                delay_minutes=int(row.get('delay_minutes', 0)),
-                priority=row.get('priority_level', 'Medium')
-            ))
+        upcoming = schedule_index.window(now, future_time)[:50]
+        
+        schedules = [
+            TrainSchedule(
+                train_id=int(record['train_id']),
+                train_name=str(record['train_name'] or 'Unknown Train'),
+                from_station=str(record['from_station'] or 'Unknown'),
+                to_station=str(record['to_station'] or 'Unknown'),
+                departure_time=record['departure_time'],
+                arrival_time=record['arrival_time'] or record['departure_time'],
+                delay_minutes=record['delay_minutes'],
+                priority=str(record['priority'] or 'Medium')
+            )
+            for record in schedule_index.departure_records(upcoming)
+        ]
         
         return schedules
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching predictions: {str(e)}")
 
+@app.get("/api/stations/{station}/departures", response_model=DepartureBoard)
+async def get_station_departures(station: str,
+                                 hours_ahead: int = Query(default=6, ge=1, le=24),
+                                 limit: int = Query(default=20, ge=1, le=200),
+                                 offset: int = Query(default=0, ge=0)):
+    """Departure board of one station (id or name) for the next N hours, paginated"""
+    if 'schedule_index' not in data_cache:
+        raise HTTPException(status_code=503, detail="AI models not loaded")
+    
+    schedule_index = data_cache['schedule_index']
+    station_id = schedule_index.find_station(station)
+    if station_id is None:
+        raise HTTPException(status_code=404, detail=f"Unknown station: {station}")
+    
+    now = datetime.now()
+    rows = schedule_index.station_departures(station_id, now, now + timedelta(hours=hours_ahead))
+    departures = [
+        StationDeparture(**{**record, 'train_no': _label(record['train_no']), 'platform_no': _label(record['platform_no'])})
+        for record in schedule_index.departure_records(rows[offset:offset + limit])
+    ]
+    
+    return DepartureBoard(
+        station_id=station_id,
+        station_name=_label(schedule_index.station_names.get(station_id)),
+        total=len(rows),
+        offset=offset,
+        limit=limit,
+        departures=departures
+    )
+
+@app.get("/api/trains/{train_id}/itinerary", response_model=TrainItinerary)
+async def get_train_itinerary(train_id: int,
+                              limit: int = Query(default=50, ge=1, le=200),
+                              offset: int = Query(default=0, ge=0)):
+    """All scheduled stops of one train in route order, paginated"""
+    if 'schedule_index' not in data_cache:
+        raise HTTPException(status_code=503, detail="AI models not loaded")
+    
+    schedule_index = data_cache['schedule_index']
+    rows = schedule_index.train_itinerary(train_id)
+    if len(rows) == 0:
+        raise HTTPException(status_code=404, detail=f"Train {train_id} is not in the schedule")
+    
+    stops = [
+        ItineraryStop(**{**record, 'platform_no': _label(record['platform_no'])})
+        for record in schedule_index.stop_records(rows[offset:offset + limit])
+    ]
+    
+    return TrainItinerary(train_id=train_id, total=len(rows), offset=offset, limit=limit, stops=stops)
+
+@app.post("/api/schedule/reload")
+async def reload_schedule():
+    """Reload the (repaired) schedule and update the schedule index incrementally"""
+    try:
+        final_schedule = await asyncio.to_thread(pd.read_pickle, f"{MODELS_DIR}/final_schedule.pkl")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reloading schedule: {str(e)}")
+    
+    # Refresh a copy off the event loop, then swap it in so no request sees a half-updated index
+    loop = asyncio.get_running_loop()
+    async with schedule_reload_lock:
+        if 'schedule_index' in data_cache:
+            schedule_index = data_cache['schedule_index'].copy()
+            changed_trains = await loop.run_in_executor(None, schedule_index.refresh, final_schedule)
+        else:
+            schedule_index = await loop.run_in_executor(None, ScheduleIndex, final_schedule)
+            changed_trains = None
+        data_cache['final_schedule'] = final_schedule
+        data_cache['schedule_index'] = schedule_index
+    
+    return {
+        "schedule_entries": len(final_schedule),
+        "full_rebuild": changed_trains is None,
+        "changed_trains": changed_trains or [],
+        "index_stats": data_cache['schedule_index'].stats
+    }
+
+def _label(value):
+    """Schedule label (train number, platform, ...) as a string, None if missing"""
+    return None if value is None or pd.isna(value) else str(value)
+
 @app.get("/api/analytics/summary")
 async def get_analytics_summary():
     """Get railway system analytics summary"""
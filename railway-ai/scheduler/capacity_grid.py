@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - CAPACITY GRID MODULE
+========================================
+Time-slot occupancy grid for platforms and tracks
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class CapacityGrid:
+    """Occupancy bitmap per resource (platform or track) over the schedule horizon.
+
+    Each resource owns one boolean row with a slot per `resolution_minutes`.
+    Single-window checks touch only the slots of that window, and batched
+    checks use a cached prefix sum of the row, so candidate placements are
+    tested without rescanning the schedule.
+    """
+
+    def __init__(self, horizon_start, horizon_end, resolution_minutes=1):
+        self.resolution_minutes = resolution_minutes
+        self.resolution_ns = int(resolution_minutes * 60 * 1e9)
+        self.origin_ns = self._to_ns(horizon_start)
+
+        self.n_slots = 0
+        self.resources = {}
+        self.occupancy = np.zeros((0, 0), dtype=bool)
+        self._prefix_cache = {}
+
+        self.ensure_horizon(horizon_end)
+
+    @staticmethod
+    def platform_key(station_id, platform_no):
+        """Resource key for a station platform"""
+        return ('platform', station_id, platform_no)
+
+    @staticmethod
+    def track_key(track_id):
+        """Resource key for a track section"""
+        return ('track', track_id)
+
+    @staticmethod
+    def _to_ns(times):
+        """Convert a datetime-like scalar or array to int64 nanoseconds"""
+        return np.asarray(times, dtype='datetime64[ns]').astype(np.int64)
+
+    def slot_index(self, times):
+        """Slot containing each timestamp (floor)"""
+        return (self._to_ns(times) - self.origin_ns) // self.resolution_ns
+
+    def slot_end_index(self, times):
+        """First slot after each timestamp (ceil), used for exclusive window ends"""
+        return -((self.origin_ns - self._to_ns(times)) // self.resolution_ns)
+
+    def slot_time(self, slot):
+        """Start time of a slot"""
+        return pd.Timestamp(self.origin_ns + int(slot) * self.resolution_ns)
+
+    def ensure_horizon(self, horizon_end):
+        """Grow the grid so it covers `horizon_end`"""
+        required = max(int(self.slot_end_index(horizon_end)), 1)
+        if required <= self.n_slots:
+            return
+
+        # Grow geometrically so repeated extensions stay amortised O(1)
+        new_slots = max(required, self.n_slots * 2)
+        grown = np.zeros((self.occupancy.shape[0], new_slots), dtype=bool)
+        grown[:, :self.n_slots] = self.occupancy
+        self.occupancy = grown
+        self.n_slots = new_slots
+        self._prefix_cache.clear()
+
+    def advance_origin(self, new_origin):
+        """Drop slots before `new_origin` so memory tracks the active window only"""
+        shift = int(self.slot_index(new_origin))
+        if shift <= 0:
+            return
+
+        shift = min(shift, self.n_slots)
+        self.occupancy = self.occupancy[:, shift:].copy()
+        self.n_slots = self.occupancy.shape[1]
+        self.origin_ns += shift * self.resolution_ns
+        self._prefix_cache.clear()
+
+    def resource_row(self, key):
+        """Row index of a resource, registering it on first use"""
+        row = self.resources.get(key)
+        if row is not None:
+            return row
+
+        row = len(self.resources)
+        if row >= self.occupancy.shape[0]:
+            grown = np.zeros((max(2 * self.occupancy.shape[0], 16), self.n_slots), dtype=bool)
+            grown[:self.occupancy.shape[0]] = self.occupancy
+            self.occupancy = grown
+        self.resources[key] = row
+        return row
+
+    def _window_slots(self, start, end):
+        """Clip a (start, end) time window to slot bounds"""
+        first = max(int(self.slot_index(start)), 0)
+        last = min(int(self.slot_end_index(end)), self.n_slots)
+        return first, max(last, first)
+
+    def _prefix(self, row):
+        """Cached prefix sum of a resource row (invalidated on reservation)"""
+        prefix = self._prefix_cache.get(row)
+        if prefix is None:
+            prefix = np.concatenate(([0], np.cumsum(self.occupancy[row], dtype=np.int32)))
+            self._prefix_cache[row] = prefix
+        return prefix
+
+    def is_free(self, key, start, end):
+        """True if the resource has no reservation in [start, end)"""
+        row = self.resource_row(key)
+        first, last = self._window_slots(start, end)
+        return not self.occupancy[row, first:last].any()
+
+    def are_free(self, key, starts, ends):
+        """Vectorized is_free over many candidate windows of one resource"""
+        prefix = self._prefix(self.resource_row(key))
+        first = np.clip(self.slot_index(starts), 0, self.n_slots)
+        last = np.clip(self.slot_end_index(ends), 0, self.n_slots)
+        last = np.maximum(last, first)
+        return (prefix[last] - prefix[first]) == 0
+
+    def reserve(self, key, start, end):
+        """Mark [start, end) as occupied on a resource"""
+        self.ensure_horizon(end)
+        row = self.resource_row(key)
+        first, last = self._window_slots(start, end)
+        self.occupancy[row, first:last] = True
+        self._prefix_cache.pop(row, None)
+
+    def release(self, key, start, end):
+        """Clear a previous reservation on a resource"""
+        row = self.resource_row(key)
+        first, last = self._window_slots(start, end)
+        self.occupancy[row, first:last] = False
+        self._prefix_cache.pop(row, None)
+
+    def find_earliest_free(self, key, earliest, duration):
+        """Earliest start >= `earliest` with `duration` of free capacity.
+
+        The search scans forward in chunks, so the cost depends on how far
+        the free window is from `earliest` rather than on the horizon length.
+        Slots past the end of the grid are free, so a start is always found.
+        """
+        earliest = pd.Timestamp(earliest)
+        first = max(int(self.slot_index(earliest)), 0)
+        length = max(int(self.slot_end_index(earliest + pd.Timedelta(duration))) - first, 1)
+        row_index = self.resource_row(key)
+        row = self.occupancy[row_index]
+
+        start = first
+        chunk = max(4 * length, 256)
+        while start + length <= self.n_slots:
+            stop = min(start + chunk + length, self.n_slots)
+            busy = np.concatenate(([0], np.cumsum(row[start:stop], dtype=np.int32)))
+            window_busy = busy[length:] - busy[:-length]
+            free = np.flatnonzero(window_busy == 0)
+            if free.size:
+                slot = start + int(free[0])
+                return earliest if slot == first else self.slot_time(slot)
+            start = stop - length + 1
+
+        # No window inside the grid: start right after the last reservation
+        busy_slots = np.flatnonzero(row[first:])
+        slot = first + int(busy_slots[-1]) + 1 if busy_slots.size else first
+        return earliest if slot == first else self.slot_time(slot)
+
+    def utilisation(self, key):
+        """Fraction of the horizon reserved on a resource"""
+        if key not in self.resources or self.n_slots == 0:
+            return 0.0
+        return float(self.occupancy[self.resources[key]].mean())
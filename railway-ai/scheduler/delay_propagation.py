@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - DELAY PROPAGATION MODULE
+============================================
+Train-dependency graph and knock-on delay propagation
+"""
+
+import heapq
+import numpy as np
+import pandas as pd
+
+from scheduler.metrics import to_minutes
+
+
+class DelayPropagationEngine:
+    """Propagate injected delays through the schedule's dependency DAG.
+
+    Every schedule entry is a node. An edge u -> v with slack s means
+    "v is pushed back by whatever delay of u exceeds s":
+
+        delay(v) = max(injected(v), max over u of delay(u) - slack(u, v))
+
+    Edges come from timetable order (consecutive stops of one train),
+    platform sequence (next train on the same station platform) and track
+    headway (next departure on the same track). Nodes are ranked by
+    scheduled time and edges always point to a higher rank, so the rank
+    order is a topological order and relaxation visits each affected node
+    and edge once.
+    """
+
+    EDGE_TYPES = ('timetable', 'platform', 'headway')
+
+    def __init__(self, platform_buffer_minutes=5, track_headway_minutes=5):
+        self.platform_buffer_minutes = platform_buffer_minutes
+        self.track_headway_minutes = track_headway_minutes
+
+        self.train_ids = np.zeros(0, dtype=np.int64)
+        self.rank = np.zeros(0, dtype=np.int64)
+        self.in_edges = []
+        self.out_edges = []
+        self.injected = np.zeros(0)
+        self.delays = np.zeros(0)
+        self.edge_counts = {edge_type: 0 for edge_type in self.EDGE_TYPES}
+
+    def build_graph(self, schedule_df):
+        """Build the dependency DAG from a schedule DataFrame"""
+        n_nodes = len(schedule_df)
+        self.in_edges = [{} for _ in range(n_nodes)]
+        self.out_edges = [{} for _ in range(n_nodes)]
+        self.injected = np.zeros(n_nodes)
+        self.delays = np.zeros(n_nodes)
+        self.edge_counts = {edge_type: 0 for edge_type in self.EDGE_TYPES}
+        if n_nodes == 0:
+            return self
+
+        self.train_ids = schedule_df['train_id'].to_numpy()
+        arrivals = np.nan_to_num(to_minutes(schedule_df['scheduled_arrival']))
+        departures = np.nan_to_num(to_minutes(schedule_df['scheduled_departure']))
+
+        # Topological rank: scheduled time, ties broken by row position
+        nodes = np.arange(n_nodes)
+        self.rank = np.empty(n_nodes, dtype=np.int64)
+        self.rank[np.lexsort((nodes, departures, arrivals))] = nodes
+
+        # Timetable order: a train's delay carries to its next stop in full
+        if 'order_no' in schedule_df.columns:
+            stop_order = schedule_df['order_no'].to_numpy(dtype=float)
+        else:
+            stop_order = arrivals
+        src, dst = self._consecutive_pairs(pd.factorize(self.train_ids)[0], stop_order)
+        self._add_edges('timetable', src, dst, np.zeros(len(src)))
+
+        # Platform sequence: next arrival must wait for departure + buffer
+        platform_groups = pd.factorize(
+            pd.MultiIndex.from_arrays([schedule_df['station_id'], schedule_df['platform_no']])
+        )[0]
+        src, dst = self._consecutive_pairs(platform_groups, arrivals)
+        self._add_edges(
+            'platform', src, dst, arrivals[dst] - departures[src] - self.platform_buffer_minutes
+        )
+
+        # Track headway: consecutive departures on the same track
+        if 'track_id' in schedule_df.columns:
+            src, dst = self._consecutive_pairs(pd.factorize(schedule_df['track_id'])[0], departures)
+            self._add_edges(
+                'headway', src, dst, departures[dst] - departures[src] - self.track_headway_minutes
+            )
+
+        return self
+
+    @staticmethod
+    def _consecutive_pairs(group_codes, sort_values):
+        """(previous, next) node pairs of consecutive entries within each group"""
+        order = np.lexsort((sort_values, group_codes))
+        same_group = group_codes[order][1:] == group_codes[order][:-1]
+        return order[:-1][same_group], order[1:][same_group]
+
+    def _add_edges(self, edge_type, src, dst, slack):
+        """Insert forward edges, keeping the tightest slack per node pair"""
+        forward = self.rank[src] < self.rank[dst]
+        slack = np.clip(slack, 0, None)
+        for u, v, s in zip(src[forward].tolist(), dst[forward].tolist(), slack[forward].tolist()):
+            current = self.out_edges[u].get(v)
+            if current is None or s < current:
+                self.out_edges[u][v] = s
+                self.in_edges[v][u] = s
+        self.edge_counts[edge_type] += int(forward.sum())
+
+    @property
+    def n_edges(self):
+        """Number of distinct dependency edges"""
+        return sum(len(edges) for edges in self.out_edges)
+
+    def _relax(self, dirty_nodes):
+        """Recompute delays of dirty nodes and their descendants in rank order"""
+        heap = [(self.rank[node], node) for node in set(dirty_nodes)]
+        heapq.heapify(heap)
+        queued = {node for _, node in heap}
+
+        while heap:
+            _, node = heapq.heappop(heap)
+            queued.discard(node)
+
+            delay = self.injected[node]
+            for pred, slack in self.in_edges[node].items():
+                delay = max(delay, self.delays[pred] - slack)
+
+            if delay == self.delays[node]:
+                continue
+            self.delays[node] = delay
+
+            for succ in self.out_edges[node]:
+                if succ not in queued:
+                    heapq.heappush(heap, (self.rank[succ], succ))
+                    queued.add(succ)
+
+    def propagate(self, injected_delays):
+        """Propagate delays injected at schedule rows ({row position: minutes})"""
+        self.injected[:] = 0.0
+        self.delays[:] = 0.0
+        for node, minutes in injected_delays.items():
+            self.injected[node] = max(self.injected[node], minutes)
+        self._relax(set(injected_delays))
+        return self.delays
+
+    def inject_train_delay(self, train_id, delay_minutes):
+        """Delay a train from its first stop and return the knock-on delays"""
+        train_nodes = np.flatnonzero(self.train_ids == train_id)
+        if train_nodes.size == 0:
+            return self.delays
+        first_stop = int(train_nodes[np.argmin(self.rank[train_nodes])])
+        return self.propagate({first_stop: delay_minutes})
+
+    def update_edge(self, src, dst, slack=None):
+        """Change (or remove with slack=None) one edge and re-propagate incrementally"""
+        if slack is None:
+            self.out_edges[src].pop(dst, None)
+            self.in_edges[dst].pop(src, None)
+        else:
+            if self.rank[src] >= self.rank[dst]:
+                raise ValueError("Edges must point forward in schedule order")
+            self.out_edges[src][dst] = max(slack, 0.0)
+            self.in_edges[dst][src] = max(slack, 0.0)
+        self._relax({dst})
+        return self.delays
+
+    def get_delay_report(self, schedule_df, min_delay_minutes=0.5):
+        """Schedule entries with a propagated delay, largest first"""
+        affected = np.flatnonzero(self.delays >= min_delay_minutes)
+        columns = [column for column in ('schedule_id', 'train_id', 'station_id', 'scheduled_arrival')
+                   if column in schedule_df.columns]
+        report = schedule_df.iloc[affected][columns].copy()
+        report['propagated_delay_minutes'] = np.round(self.delays[affected], 1)
+        return report.sort_values('propagated_delay_minutes', ascending=False)
+
+    def get_summary(self):
+        """Headline numbers for the current propagation"""
+        affected = self.delays > 0
+        return {
+            'nodes': len(self.delays),
+            'edges': self.n_edges,
+            'edge_types': dict(self.edge_counts),
+            'entries_delayed': int(affected.sum()),
+            'trains_delayed': int(pd.unique(self.train_ids[affected]).size) if affected.any() else 0,
+            'total_delay_minutes': round(float(self.delays.sum()), 1),
+            'max_delay_minutes': round(float(self.delays.max()), 1) if len(self.delays) else 0.0
+        }
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - SCHEDULE METRICS MODULE
+===========================================
+Vectorized schedule quality scoring for optimizers and scenario runs
+"""
+
+import numpy as np
+import pandas as pd
+
+MINUTE_NS = 60 * 10**9
+
+
+def to_minutes(values):
+    """Datetime column as float minutes since epoch (NaT -> NaN)"""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values)
+    ns = values.to_numpy(dtype='datetime64[ns]')
+    minutes = ns.astype(np.int64) / MINUTE_NS
+    minutes[np.isnat(ns)] = np.nan
+    return minutes
+
+
+class ScheduleMetrics:
+    """Score a schedule DataFrame in a single vectorized pass"""
+
+    def __init__(self, platform_buffer_minutes=5, track_headway_minutes=5,
+                 min_dwell_minutes=2, max_dwell_minutes=30):
+        self.platform_buffer_minutes = platform_buffer_minutes
+        self.track_headway_minutes = track_headway_minutes
+        self.min_dwell_minutes = min_dwell_minutes
+        self.max_dwell_minutes = max_dwell_minutes
+
+        # Lateness weight per priority value (Superfast delays hurt the most)
+        self.PRIORITY_WEIGHTS = {1: 4.0, 2: 3.0, 3: 2.0, 4: 1.0}
+
+    @staticmethod
+    def _codes(values):
+        """Integer group codes for a label column"""
+        return pd.factorize(values, use_na_sentinel=False)[0]
+
+    def _sequence_conflicts(self, group_codes, starts, ends, gap_minutes):
+        """Count entries that start before the previous entry in the same group clears"""
+        order = np.lexsort((starts, group_codes))
+        groups = group_codes[order]
+        same_group = groups[1:] == groups[:-1]
+        gaps = starts[order][1:] - ends[order][:-1]
+        return int(np.count_nonzero(same_group & (gaps < gap_minutes)))
+
+    def score(self, schedule_df, planned_arrivals=None):
+        """Compute quality metrics for a schedule.
+
+        `planned_arrivals` (aligned on the schedule index) is the arrival time
+        before optimization; shifts away from it count as lateness on top of
+        each train's historical average delay.
+        """
+        if schedule_df.empty:
+            return {}
+
+        arrivals = to_minutes(schedule_df['scheduled_arrival'])
+        departures = to_minutes(schedule_df['scheduled_departure'])
+        dwell = departures - arrivals
+
+        # Priority-weighted lateness
+        lateness = np.zeros(len(schedule_df))
+        if planned_arrivals is not None:
+            planned = to_minutes(planned_arrivals.reindex(schedule_df.index))
+            lateness += np.nan_to_num(np.clip(arrivals - planned, 0, None))
+        if 'avg_delay_minutes' in schedule_df.columns:
+            lateness += np.nan_to_num(schedule_df['avg_delay_minutes'].to_numpy(dtype=float))
+
+        weights = schedule_df['priority_value'].map(self.PRIORITY_WEIGHTS).fillna(2.0).to_numpy(dtype=float)
+        weighted_lateness = float(np.dot(weights, lateness) / weights.sum())
+
+        # Remaining platform and headway conflicts
+        station_codes = self._codes(schedule_df['station_id'])
+        platform_label_codes = self._codes(schedule_df['platform_no'])
+        platform_labels = int(platform_label_codes.max()) + 1
+        platform_codes = station_codes * platform_labels + platform_label_codes
+        platform_conflicts = self._sequence_conflicts(
+            platform_codes, arrivals, departures, self.platform_buffer_minutes
+        )
+        headway_conflicts = 0
+        if 'track_id' in schedule_df.columns:
+            headway_conflicts = self._sequence_conflicts(
+                self._codes(schedule_df['track_id']), departures, departures, self.track_headway_minutes
+            )
+
+        # Platform utilisation per station-hour (dwell booked to the arrival hour)
+        utilisation = self.station_hour_utilisation(
+            station_codes, platform_codes, platform_labels, arrivals, dwell
+        )
+
+        # Dwell violations
+        dwell_violations = int(np.count_nonzero(
+            (dwell < self.min_dwell_minutes) | (dwell > self.max_dwell_minutes)
+        ))
+
+        makespan = float(np.nanmax(departures) - np.nanmin(arrivals))
+
+        return {
+            'priority_weighted_lateness_minutes': round(weighted_lateness, 2),
+            'platform_conflicts': platform_conflicts,
+            'headway_conflicts': headway_conflicts,
+            'dwell_violations': dwell_violations,
+            'mean_platform_utilisation': round(float(utilisation.mean()), 4) if utilisation.size else 0.0,
+            'peak_platform_utilisation': round(float(utilisation.max()), 4) if utilisation.size else 0.0,
+            'makespan_minutes': round(makespan, 1)
+        }
+
+    def station_hour_utilisation(self, station_codes, platform_codes, platform_labels, arrivals, dwell):
+        """Occupied platform-minutes / available platform-minutes for each busy station-hour"""
+        valid = ~(np.isnan(arrivals) | np.isnan(dwell))
+        if not valid.any():
+            return np.zeros(0)
+
+        station_codes = station_codes[valid]
+        hours = (arrivals[valid] // 60).astype(np.int64)
+        hours -= hours.min()
+        occupied = np.clip(dwell[valid], 0, 60)
+
+        # Platforms seen at each station
+        platforms_per_station = np.bincount(
+            np.unique(platform_codes[valid]) // platform_labels, minlength=int(station_codes.max()) + 1
+        )
+
+        hour_span = int(hours.max()) + 1
+        cells, cell_index = np.unique(station_codes * hour_span + hours, return_inverse=True)
+        occupied_minutes = np.bincount(cell_index, weights=occupied)
+        capacity_minutes = platforms_per_station[cells // hour_span] * 60.0
+        return occupied_minutes / capacity_minutes
@@ -6,16 +6,55 @@ AI-powered train scheduling optimization
 """
 
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 
+from scheduler.schedule_table import ScheduleTable
+from scheduler.capacity_grid import CapacityGrid
+from scheduler.metrics import ScheduleMetrics
+from scheduler.delay_propagation import DelayPropagationEngine
+
 class ScheduleOptimizer:
     """AI optimizer for train scheduling"""
     
-    def __init__(self, priority_calculator):
+    # Slot grid resolution and minimum platform clearance between trains
+    SLOT_RESOLUTION_MINUTES = 1
+    PLATFORM_BUFFER_MINUTES = 5
+    
+    def __init__(self, priority_calculator, rolling_window_hours=None, rolling_commit_hours=2):
         self.priority_calculator = priority_calculator
+        
+        # Rolling-horizon mode: plan `rolling_window_hours` ahead, freeze the
+        # first `rolling_commit_hours` of each plan, then slide forward
+        self.rolling_window_hours = rolling_window_hours
+        self.rolling_commit_hours = rolling_commit_hours
+        
         self.scheduled_trains = pd.DataFrame()
+        self.schedule_table = None
+        self.capacity_grid = None
+        self.planned_arrivals = None
+        self.delay_engine = None
+        self.metrics = ScheduleMetrics(
+            platform_buffer_minutes=self.PLATFORM_BUFFER_MINUTES,
+            track_headway_minutes=self.PLATFORM_BUFFER_MINUTES
+        )
         print("🚀 Initializing AI Schedule Optimizer...")
     
+    def estimate_schedule_size(self, trains, cleaned_data):
+        """Estimate the number of schedule entries so the table is allocated once"""
+        timetable_info = cleaned_data.get('timetable', pd.DataFrame())
+        if timetable_info.empty:
+            return len(trains) * 3
+        return len(timetable_info) + len(trains) * 3
+    
+    def _route_column(self, train_route, column, default, as_list=False):
+        """Per-stop values of a timetable column, or the default when the column is absent"""
+        if column not in train_route.columns:
+            values = [default] * len(train_route)
+            return values if as_list else np.asarray(values)
+        values = train_route[column]
+        return values.tolist() if as_list else values.to_numpy()
+    
     def generate_priority_schedule(self, trains_clean, cleaned_data):
         """Generate optimized train schedule based on priority system"""
         print("\n🚀 Generating AI-optimized train schedule...")
@@ -31,91 +70,82 @@ class ScheduleOptimizer:
         priority_sorted = trains_clean.sort_values(['final_priority', 'capacity'], ascending=[True, False])
         print(f"✓ Trains sorted by priority: {len(priority_sorted)} trains")
         
-        # Generate schedule data
-        schedule_data = []
+        # Generate schedule data into preallocated column arrays
+        schedule_table = ScheduleTable(capacity=self.estimate_schedule_size(priority_sorted, cleaned_data))
         current_time = datetime.now().replace(hour=5, minute=0, second=0, microsecond=0)  # Start at 5 AM
         
         # Get station information for routing
         stations_info = cleaned_data.get('stations', pd.DataFrame())
         timetable_info = cleaned_data.get('timetable', pd.DataFrame())
         
-        for idx, train in priority_sorted.iterrows():
-            train_id = train['id']
-            train_no = train.get('train_no', f'T{train_id}')
-            train_name = train.get('name', f'Train {train_no}')
-            train_type = train['type']
-            priority_value = train['priority_value']
-            priority_name = train['priority_name']
-            final_priority = train['final_priority']
+        # Lookups built once instead of per stop
+        station_names = {}
+        if not stations_info.empty and 'name' in stations_info.columns:
+            station_names = dict(zip(stations_info['id'], stations_info['name']))
+        
+        routes_by_train = {}
+        if not timetable_info.empty:
+            routes_by_train = {
+                train_id: route.sort_values('order_no')
+                for train_id, route in timetable_info.groupby('train_id', sort=False)
+            }
+        
+        if not stations_info.empty:
+            sample_stations = stations_info.head(3)['id'].tolist()
+        else:
+            sample_stations = [1, 2, 3]  # Default station IDs
+        
+        for train in priority_sorted.itertuples(index=False):
+            train_id = train.id
+            train_no = getattr(train, 'train_no', f'T{train_id}')
+            priority_value = train.priority_value
+            
+            train_fields = {
+                'train_id': train_id,
+                'train_no': train_no,
+                'train_name': getattr(train, 'name', f'Train {train_no}'),
+                'train_type': train.type.upper(),
+                'priority_value': priority_value,
+                'priority_name': train.priority_name,
+                'final_priority': round(train.final_priority, 2),
+                'avg_delay_minutes': round(train.avg_delay_minutes, 1)
+            }
             
             # Get train's route from timetable if available
-            if not timetable_info.empty:
-                train_route = timetable_info[timetable_info['train_id'] == train_id].sort_values('order_no')
-            else:
-                train_route = pd.DataFrame()
+            train_route = routes_by_train.get(train_id)
             
-            if train_route.empty:
+            if train_route is None or train_route.empty:
                 # Create a basic route using available stations
-                if not stations_info.empty:
-                    sample_stations = stations_info.head(3)['id'].tolist()
-                else:
-                    sample_stations = [1, 2, 3]  # Default station IDs
+                stop_offsets = np.arange(len(sample_stations)) * 20  # 20 min between stations
+                departures = np.datetime64(current_time, 'ns') + stop_offsets.astype('timedelta64[m]')
+                arrivals = departures - np.timedelta64(2, 'm')  # 2 min stop time
                 
-                for i, station_id in enumerate(sample_stations):
-                    departure_time = current_time + timedelta(minutes=i*20)  # 20 min between stations
-                    arrival_time = departure_time - timedelta(minutes=2)  # 2 min stop time
-                    
-                    station_name = f"Station {station_id}"
-                    if not stations_info.empty:
-                        station_row = stations_info[stations_info['id'] == station_id]
-                        if not station_row.empty:
-                            station_name = station_row.iloc[0].get('name', station_name)
-                    
-                    schedule_data.append({
-                        'schedule_id': len(schedule_data) + 1,
-                        'train_id': train_id,
-                        'train_no': train_no,
-                        'train_name': train_name,
-                        'train_type': train_type.upper(),
-                        'priority_value': priority_value,
-                        'priority_name': priority_name,
-                        'final_priority': round(final_priority, 2),
-                        'station_id': station_id,
-                        'station_name': station_name,
-                        'scheduled_arrival': arrival_time,
-                        'scheduled_departure': departure_time,
-                        'platform_no': 1,
-                        'track_id': 1,
-                        'order_no': i + 1,
-                        'avg_delay_minutes': round(train['avg_delay_minutes'], 1)
-                    })
+                schedule_table.append_stops(
+                    train_fields,
+                    station_ids=sample_stations,
+                    station_names=[station_names.get(sid, f"Station {sid}") for sid in sample_stations],
+                    arrivals=arrivals,
+                    departures=departures,
+                    platform_nos=[1] * len(sample_stations),
+                    track_ids=1,
+                    order_nos=np.arange(1, len(sample_stations) + 1)
+                )
             else:
                 # Use existing timetable data
-                for route_idx, event in train_route.iterrows():
-                    station_name = f"Station {event['station_id']}"
-                    if not stations_info.empty:
-                        station_row = stations_info[stations_info['id'] == event['station_id']]
-                        if not station_row.empty:
-                            station_name = station_row.iloc[0].get('name', station_name)
-                    
-                    schedule_data.append({
-                        'schedule_id': len(schedule_data) + 1,
-                        'train_id': train_id,
-                        'train_no': train_no,
-                        'train_name': train_name,
-                        'train_type': train_type.upper(),
-                        'priority_value': priority_value,
-                        'priority_name': priority_name,
-                        'final_priority': round(final_priority, 2),
-                        'station_id': event['station_id'],
-                        'station_name': station_name,
-                        'scheduled_arrival': event.get('scheduled_arrival', current_time),
-                        'scheduled_departure': event.get('scheduled_departure', current_time + timedelta(minutes=5)),
-                        'platform_no': event.get('platform_no', 1),
-                        'track_id': event.get('track_id', 1),
-                        'order_no': event.get('order_no', 1),
-                        'avg_delay_minutes': round(train['avg_delay_minutes'], 1)
-                    })
+                route_stations = train_route['station_id'].to_numpy()
+                
+                schedule_table.append_stops(
+                    train_fields,
+                    station_ids=route_stations,
+                    station_names=[station_names.get(sid, f"Station {sid}") for sid in route_stations],
+                    arrivals=self._route_column(train_route, 'scheduled_arrival', current_time),
+                    departures=self._route_column(
+                        train_route, 'scheduled_departure', current_time + timedelta(minutes=5)
+                    ),
+                    platform_nos=self._route_column(train_route, 'platform_no', 1, as_list=True),
+                    track_ids=self._route_column(train_route, 'track_id', 1),
+                    order_nos=self._route_column(train_route, 'order_no', 1)
+                )
             
             # Time increment based on priority (higher priority gets better slots)
             if priority_value == 1:  # Superfast
@@ -129,8 +159,9 @@ class ScheduleOptimizer:
             
             current_time += timedelta(minutes=time_increment)
         
-        # Create schedule DataFrame
-        self.scheduled_trains = pd.DataFrame(schedule_data)
+        # Export schedule DataFrame (zero-copy view over the column arrays)
+        self.schedule_table = schedule_table
+        self.scheduled_trains = schedule_table.to_dataframe()
         
         if not self.scheduled_trains.empty:
             print(f"✓ Generated optimized schedule: {len(self.scheduled_trains)} schedule entries")
@@ -138,48 +169,165 @@ class ScheduleOptimizer:
         
         return self.scheduled_trains
     
+    def _prepare_slot_inputs(self, schedule_df, sort_columns):
+        """Sorted schedule rows with planned arrivals and clamped dwell times"""
+        schedule_sorted = schedule_df.sort_values(sort_columns)
+        schedule_sorted = schedule_sorted[schedule_sorted['scheduled_arrival'].notna()]
+        
+        arrivals = pd.to_datetime(schedule_sorted['scheduled_arrival']).to_numpy(dtype='datetime64[ns]')
+        departures = pd.to_datetime(schedule_sorted['scheduled_departure']).to_numpy(dtype='datetime64[ns]')
+        dwell_times = departures - arrivals
+        dwell_times[np.isnat(dwell_times) | (dwell_times < np.timedelta64(0, 'ns'))] = np.timedelta64(0, 'ns')
+        
+        platform_keys = [
+            CapacityGrid.platform_key(station_id, platform_no)
+            for station_id, platform_no in zip(
+                schedule_sorted['station_id'].to_numpy(), schedule_sorted['platform_no'].to_numpy()
+            )
+        ]
+        return schedule_sorted, arrivals, dwell_times, platform_keys
+    
+    def _place_stop(self, platform_key, arrival, dwell_time):
+        """Reserve the earliest platform slot for a stop and return its arrival time"""
+        occupied_for = dwell_time + np.timedelta64(self.PLATFORM_BUFFER_MINUTES, 'm')
+        
+        # Earliest slot where the platform is free for the dwell plus buffer
+        slot_start = np.datetime64(self.capacity_grid.find_earliest_free(platform_key, arrival, occupied_for), 'ns')
+        self.capacity_grid.reserve(platform_key, slot_start, slot_start + occupied_for)
+        return slot_start
+    
+    def _write_back_slots(self, schedule_df, schedule_sorted, arrivals, new_arrivals, dwell_times):
+        """Write back only the entries that had to move"""
+        shifted = new_arrivals != arrivals
+        if shifted.any():
+            shifted_index = schedule_sorted.index[shifted]
+            schedule_df.loc[shifted_index, 'scheduled_arrival'] = new_arrivals[shifted]
+            schedule_df.loc[shifted_index, 'scheduled_departure'] = new_arrivals[shifted] + dwell_times[shifted]
+        return int(shifted.sum())
+    
     def optimize_time_slots(self, schedule_df):
         """Optimize time slots to minimize conflicts"""
         if schedule_df.empty:
             return schedule_df
         
+        if self.rolling_window_hours:
+            return self.optimize_rolling_horizon(schedule_df)
+        
         print("🔧 Optimizing time slots for conflicts...")
         
+        # Keep the planned arrivals so lateness introduced here can be scored
+        self.planned_arrivals = schedule_df['scheduled_arrival'].copy()
+        self.delay_engine = None
+        
         # Sort by station and time to detect conflicts
-        schedule_sorted = schedule_df.sort_values(['station_id', 'scheduled_arrival'])
+        schedule_sorted, arrivals, dwell_times, platform_keys = self._prepare_slot_inputs(
+            schedule_df, ['station_id', 'scheduled_arrival']
+        )
+        if schedule_sorted.empty:
+            return schedule_df
         
-        # Track platform availability
-        platform_availability = {}
+        # Track platform availability on a time-slot grid
+        self.capacity_grid = CapacityGrid(
+            arrivals.min(), (arrivals + dwell_times).max(), resolution_minutes=self.SLOT_RESOLUTION_MINUTES
+        )
         
-        for idx, row in schedule_sorted.iterrows():
-            station_id = row['station_id']
-            platform_no = row['platform_no']
-            arrival_time = row['scheduled_arrival']
-            departure_time = row['scheduled_departure']
+        new_arrivals = arrivals.copy()
+        for row, platform_key in enumerate(platform_keys):
+            new_arrivals[row] = self._place_stop(platform_key, arrivals[row], dwell_times[row])
+        
+        shifted = self._write_back_slots(schedule_df, schedule_sorted, arrivals, new_arrivals, dwell_times)
+        
+        print(f"✓ Time slot optimization completed ({shifted} entries shifted)")
+        return schedule_df
+    
+    def optimize_rolling_horizon(self, schedule_df, window_hours=None, commit_hours=None):
+        """Optimize time slots window by window over a long timetable horizon.
+        
+        Each re-plan only sees the stops planned to arrive inside the current
+        window, placed in priority order against a capacity grid that still
+        holds every committed reservation. Stops in the first `commit_hours`
+        are frozen; the rest are released and re-planned in the next window.
+        The grid drops slots behind the window, so per re-plan work and memory
+        depend on the window size, not the timetable length.
+        """
+        if schedule_df.empty:
+            return schedule_df
+        
+        window = np.timedelta64(int((window_hours or self.rolling_window_hours) * 60), 'm')
+        commit = np.timedelta64(int((commit_hours or self.rolling_commit_hours) * 60), 'm')
+        commit = min(commit, window)
+        
+        print(f"🔧 Rolling-horizon slot optimization ({window} window, {commit} commit step)...")
+        
+        self.planned_arrivals = schedule_df['scheduled_arrival'].copy()
+        self.delay_engine = None
+        
+        schedule_sorted, arrivals, dwell_times, platform_keys = self._prepare_slot_inputs(
+            schedule_df, ['scheduled_arrival', 'priority_value']
+        )
+        if schedule_sorted.empty:
+            return schedule_df
+        priorities = schedule_sorted['priority_value'].to_numpy()
+        
+        window_start = arrivals[0]
+        self.capacity_grid = CapacityGrid(
+            window_start, window_start + window, resolution_minutes=self.SLOT_RESOLUTION_MINUTES
+        )
+        
+        new_arrivals = arrivals.copy()
+        committed = 0
+        replans = 0
+        
+        while committed < len(arrivals):
+            # Skip idle periods with nothing to plan
+            window_start = max(window_start, arrivals[committed])
+            self.capacity_grid.advance_origin(window_start)
             
-            # Create platform key
-            platform_key = f"{station_id}_{platform_no}"
+            window_end = np.searchsorted(arrivals, window_start + window, side='left')
+            commit_end = max(np.searchsorted(arrivals, window_start + commit, side='left'), committed + 1)
+            window_end = max(window_end, commit_end)
             
-            # Check if platform is available
-            if platform_key in platform_availability:
-                last_departure = platform_availability[platform_key]
-                if arrival_time < last_departure + timedelta(minutes=5):  # 5 min buffer
-                    # Conflict detected - shift time or change platform
-                    new_arrival = last_departure + timedelta(minutes=5)
-                    new_departure = new_arrival + (departure_time - arrival_time)
-                    
-                    schedule_df.loc[idx, 'scheduled_arrival'] = new_arrival
-                    schedule_df.loc[idx, 'scheduled_departure'] = new_departure
-                    
-                    platform_availability[platform_key] = new_departure
-                else:
-                    platform_availability[platform_key] = departure_time
-            else:
-                platform_availability[platform_key] = departure_time
+            # Plan the window: highest priority first, then by planned arrival
+            batch = np.arange(committed, window_end)
+            batch = batch[np.lexsort((arrivals[batch], priorities[batch]))]
+            for row in batch:
+                new_arrivals[row] = self._place_stop(platform_keys[row], arrivals[row], dwell_times[row])
+            
+            # Release tentative placements beyond the committed prefix
+            buffer = np.timedelta64(self.PLATFORM_BUFFER_MINUTES, 'm')
+            for row in range(commit_end, window_end):
+                self.capacity_grid.release(
+                    platform_keys[row], new_arrivals[row], new_arrivals[row] + dwell_times[row] + buffer
+                )
+            
+            committed = commit_end
+            window_start = window_start + commit
+            replans += 1
         
-        print("✓ Time slot optimization completed")
+        shifted = self._write_back_slots(schedule_df, schedule_sorted, arrivals, new_arrivals, dwell_times)
+        
+        print(f"✓ Rolling-horizon optimization completed: {replans} re-plans, {shifted} entries shifted")
         return schedule_df
     
+    def build_delay_model(self):
+        """Build the train-dependency graph for the current schedule"""
+        self.delay_engine = DelayPropagationEngine(
+            platform_buffer_minutes=self.PLATFORM_BUFFER_MINUTES,
+            track_headway_minutes=self.PLATFORM_BUFFER_MINUTES
+        ).build_graph(self.scheduled_trains)
+        return self.delay_engine
+    
+    def simulate_delay(self, train_id, delay_minutes):
+        """Propagate a delay on one train through the schedule and report knock-on effects"""
+        if self.scheduled_trains.empty:
+            return pd.DataFrame()
+        
+        if self.delay_engine is None or len(self.delay_engine.delays) != len(self.scheduled_trains):
+            self.build_delay_model()
+        
+        self.delay_engine.inject_train_delay(train_id, delay_minutes)
+        return self.delay_engine.get_delay_report(self.scheduled_trains)
+    
     def generate_schedule_summary(self):
         """Generate comprehensive scheduling summary"""
         if self.scheduled_trains.empty:
@@ -202,10 +350,10 @@ class ScheduleOptimizer:
         
         # Calculate priority distribution
         priority_names = self.priority_calculator.get_priority_names()
+        priority_counts = self.scheduled_trains['priority_value'].value_counts()
         for priority_val in [1, 2, 3, 4]:
-            count = len(self.scheduled_trains[self.scheduled_trains['priority_value'] == priority_val])
             priority_name = priority_names.get(priority_val, f'Priority {priority_val}')
-            summary['priority_distribution'][priority_name] = count
+            summary['priority_distribution'][priority_name] = int(priority_counts.get(priority_val, 0))
         
         # Calculate average delays by priority
         delay_by_priority = self.scheduled_trains.groupby('priority_value')['avg_delay_minutes'].mean()
@@ -213,6 +361,9 @@ class ScheduleOptimizer:
             priority_name = priority_names.get(priority_val, f'Priority {priority_val}')
             summary['average_delays'][priority_name] = round(avg_delay, 2)
         
+        # Schedule quality metrics
+        summary['quality_metrics'] = self.metrics.score(self.scheduled_trains, self.planned_arrivals)
+        
         return summary
     
     def display_scheduling_results(self, summary):
@@ -241,6 +392,16 @@ class ScheduleOptimizer:
         for priority_name, avg_delay in summary['average_delays'].items():
             print(f" {priority_name}: {avg_delay} minutes")
         
+        quality = summary.get('quality_metrics', {})
+        if quality:
+            print(f"\n📐 SCHEDULE QUALITY:")
+            print(f" Priority-weighted Lateness: {quality['priority_weighted_lateness_minutes']} minutes")
+            print(f" Platform Conflicts: {quality['platform_conflicts']}")
+            print(f" Headway Conflicts: {quality['headway_conflicts']}")
+            print(f" Dwell Violations: {quality['dwell_violations']}")
+            print(f" Peak Platform Utilisation: {quality['peak_platform_utilisation']:.0%}")
+            print(f" Makespan: {quality['makespan_minutes']} minutes")
+        
         print(f"\n📋 TOP 10 HIGHEST PRIORITY TRAINS:")
         print("-" * 70)
         top_priority = self.scheduled_trains.drop_duplicates('train_id').head(10)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - SCHEDULE INDEX MODULE
+=========================================
+Read-optimised departure, station and train indexes over a generated schedule
+"""
+
+import copy
+import numpy as np
+import pandas as pd
+
+# Per-stop columns decoded once at build time for the API responses
+OUTPUT_COLUMNS = ['train_no', 'train_name', 'train_type', 'priority_name', 'station_name', 'platform_no']
+
+
+def to_datetime64(value):
+    """A scalar time as numpy datetime64[ns] for searchsorted against the index"""
+    return pd.Timestamp(value).to_datetime64().astype('datetime64[ns]')
+
+
+class ScheduleIndex:
+    """Sorted row orders over a schedule DataFrame (one row per stop).
+
+    Built once when the schedule is loaded. A stop is a departure if the
+    train has a next stop and a departure time; `next_row` links every
+    stop to the train's next one. Three orders are kept:
+
+    - departures: departing rows sorted by (scheduled departure, row)
+    - per station: departing rows grouped by station, each group sorted
+      by (departure, row), with `station_offsets` marking the group bounds
+    - per train: all stops grouped by train in route order, with
+      `train_offsets` marking the group bounds
+
+    Window, station-board and itinerary queries are searchsorted calls
+    returning slices (views) of these orders; only the rows actually
+    returned are gathered into records. When a repaired schedule with
+    the same rows is loaded, refresh() re-sorts only the trains whose
+    stops changed and splices them back into the orders; ties are broken
+    by row in both paths, so a refresh gives the same orders as a build.
+    """
+
+    def __init__(self, schedule_df, max_changed_fraction=0.25):
+        self.max_changed_fraction = max_changed_fraction
+        self.stats = {'builds': 0, 'incremental_updates': 0, 'last_changed_trains': 0}
+        self.build(schedule_df)
+
+    def build(self, schedule_df):
+        """Index a schedule from scratch"""
+        self.schedule = schedule_df
+        n_rows = len(schedule_df)
+
+        self.departures = self._times(schedule_df, 'scheduled_departure')
+        self.arrivals = self._times(schedule_df, 'scheduled_arrival')
+        self.train_ids = schedule_df['train_id'].to_numpy() if n_rows else np.zeros(0, dtype=np.int64)
+        self.station_ids = schedule_df['station_id'].to_numpy() if n_rows else np.zeros(0, dtype=np.int64)
+        self.avg_delay = (pd.to_numeric(schedule_df['avg_delay_minutes'], errors='coerce').fillna(0).to_numpy()
+                          if 'avg_delay_minutes' in schedule_df.columns else np.zeros(n_rows))
+        self.columns = {
+            column: (schedule_df[column].to_numpy(dtype=object) if column in schedule_df.columns
+                     else np.full(n_rows, None, dtype=object))
+            for column in OUTPUT_COLUMNS
+        }
+
+        self.stop_order = self._stop_order(schedule_df)
+
+        # Per train: stops in route order (order_no, then arrival)
+        self.train_codes, trains = pd.factorize(self.train_ids, sort=True)
+        self.trains = pd.Index(trains)
+        self.train_order = np.lexsort((np.arange(n_rows), self.arrivals, self.stop_order, self.train_codes))
+        self.train_offsets = np.searchsorted(self.train_codes[self.train_order], np.arange(len(self.trains) + 1))
+
+        self.next_row = np.full(n_rows, -1, dtype=np.int64)
+        same_train = self.train_codes[self.train_order][1:] == self.train_codes[self.train_order][:-1]
+        self.next_row[self.train_order[:-1][same_train]] = self.train_order[1:][same_train]
+
+        # Departures: rows the train leaves towards a next stop
+        departing = np.flatnonzero((self.next_row >= 0) & ~np.isnat(self.departures))
+        self.departure_order = departing[np.lexsort((departing, self.departures[departing]))]
+        self.departure_times = self.departures[self.departure_order]
+
+        # Per station: departures grouped by station, each group by time
+        self.station_codes, stations = pd.factorize(self.station_ids, sort=True)
+        self.stations = pd.Index(stations)
+        order = self.departure_order
+        self.station_order = order[np.lexsort((order, self.departures[order], self.station_codes[order]))]
+        self._finish_station_order()
+
+        names = self.columns['station_name']
+        self.station_names = {station_id: name
+                              for name, station_id in zip(names.tolist(), self.station_ids.tolist())
+                              if not pd.isna(name)}
+        self.station_by_name = {str(name).lower(): station_id for station_id, name in self.station_names.items()}
+        self.stats['builds'] += 1
+        return self
+
+    def _finish_station_order(self):
+        self.station_times = self.departures[self.station_order]
+        self.station_offsets = np.searchsorted(
+            self.station_codes[self.station_order], np.arange(len(self.stations) + 1)
+        )
+
+    @staticmethod
+    def _times(schedule_df, column):
+        if column not in schedule_df.columns:
+            return np.full(len(schedule_df), np.datetime64('NaT'), dtype='datetime64[ns]')
+        values = schedule_df[column]
+        if not pd.api.types.is_datetime64_dtype(values):
+            values = pd.to_datetime(values, errors='coerce')
+        return values.to_numpy(dtype='datetime64[ns]')
+
+    @staticmethod
+    def _stop_order(schedule_df):
+        if 'order_no' not in schedule_df.columns:
+            return np.zeros(len(schedule_df))
+        return pd.to_numeric(schedule_df['order_no'], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    @staticmethod
+    def _insert_positions(kept_keys, new_keys):
+        """Positions at which to insert `new_keys` into rows sorted by `kept_keys`.
+
+        Both are tuples of arrays, most significant key first; the last
+        key (the row) is unique, so every new row gets one exact slot.
+        """
+        low = np.searchsorted(kept_keys[0], new_keys[0], side='left')
+        high = np.searchsorted(kept_keys[0], new_keys[0], side='right')
+        for kept, new in zip(kept_keys[1:], new_keys[1:]):
+            for i in np.flatnonzero(high > low).tolist():
+                segment = kept[low[i]:high[i]]
+                low[i], high[i] = (low[i] + np.searchsorted(segment, new[i], side='left'),
+                                   low[i] + np.searchsorted(segment, new[i], side='right'))
+        return low
+
+    @staticmethod
+    def _changed(old, new):
+        """Row mask of values that differ (two missing values count as equal)"""
+        changed = np.asarray(old != new)
+        rows = np.flatnonzero(changed)
+        changed[rows[pd.isna(old[rows]) & pd.isna(new[rows])]] = False
+        return changed
+
+    def refresh(self, schedule_df):
+        """Bring the index up to date with a repaired or reloaded schedule.
+
+        If the new schedule has the same rows (same trains in the same row
+        positions), only trains with a changed stop are re-sorted and
+        spliced back into the departure and station orders. A different
+        row layout, an unknown station or too many changed trains fall
+        back to a full build. Returns the ids of the re-indexed trains, or
+        None after a full build.
+        """
+        same_rows = (len(schedule_df) == len(self.schedule) and len(schedule_df) > 0
+                     and np.array_equal(schedule_df['train_id'].to_numpy(), self.train_ids))
+        if not same_rows:
+            self.build(schedule_df)
+            return None
+
+        departures = self._times(schedule_df, 'scheduled_departure')
+        arrivals = self._times(schedule_df, 'scheduled_arrival')
+        station_ids = schedule_df['station_id'].to_numpy()
+        stop_order = self._stop_order(schedule_df)
+        columns = {
+            column: (schedule_df[column].to_numpy(dtype=object) if column in schedule_df.columns
+                     else np.full(len(schedule_df), None, dtype=object))
+            for column in OUTPUT_COLUMNS
+        }
+        avg_delay = (pd.to_numeric(schedule_df['avg_delay_minutes'], errors='coerce').fillna(0).to_numpy()
+                     if 'avg_delay_minutes' in schedule_df.columns else np.zeros(len(schedule_df)))
+
+        changed = (self._changed(self.departures, departures) | self._changed(self.arrivals, arrivals)
+                   | self._changed(self.station_ids, station_ids) | self._changed(self.stop_order, stop_order)
+                   | self._changed(self.avg_delay, avg_delay))
+        for column in OUTPUT_COLUMNS:
+            changed |= self._changed(self.columns[column], columns[column])
+        changed_rows = np.flatnonzero(changed)
+
+        station_codes = self.stations.get_indexer(station_ids[changed_rows])
+        changed_trains = np.unique(self.train_codes[changed_rows])
+        if (station_codes < 0).any() or len(changed_trains) > self.max_changed_fraction * len(self.trains):
+            self.build(schedule_df)
+            return None
+
+        self.schedule = schedule_df
+        self.departures, self.arrivals, self.station_ids = departures, arrivals, station_ids
+        self.stop_order, self.columns, self.avg_delay = stop_order, columns, avg_delay
+        self.station_codes[changed_rows] = station_codes
+        for station_id, name in zip(station_ids[changed_rows].tolist(), columns['station_name'][changed_rows].tolist()):
+            if not pd.isna(name):
+                self.station_names[station_id] = name
+                self.station_by_name[str(name).lower()] = station_id
+        if len(changed_trains) == 0:
+            return []
+
+        # Re-sort the changed trains' stops and relink them
+        segments = []
+        for code in changed_trains.tolist():
+            first, last = self.train_offsets[code], self.train_offsets[code + 1]
+            rows = np.sort(self.train_order[first:last])
+            rows = rows[np.lexsort((rows, self.arrivals[rows], self.stop_order[rows]))]
+            self.train_order[first:last] = rows
+            self.next_row[rows] = np.append(rows[1:], -1)
+            segments.append(rows)
+        affected = np.concatenate(segments)
+        departing = affected[(self.next_row[affected] >= 0) & ~np.isnat(self.departures[affected])]
+
+        # Splice: drop the old entries, insert the new ones at their (time, row) positions
+        kept = self.departure_order[~np.isin(self.departure_order, affected)]
+        departing = departing[np.lexsort((departing, self.departures[departing]))]
+        positions = self._insert_positions((self.departures[kept], kept), (self.departures[departing], departing))
+        self.departure_order = np.insert(kept, positions, departing)
+        self.departure_times = self.departures[self.departure_order]
+
+        kept = self.station_order[~np.isin(self.station_order, affected)]
+        departing = departing[np.lexsort((departing, self.departures[departing], self.station_codes[departing]))]
+        positions = self._insert_positions(
+            (self.station_codes[kept], self.departures[kept], kept),
+            (self.station_codes[departing], self.departures[departing], departing)
+        )
+        self.station_order = np.insert(kept, positions, departing)
+        self._finish_station_order()
+
+        self.stats['incremental_updates'] += 1
+        self.stats['last_changed_trains'] = len(changed_trains)
+        return self.trains[changed_trains].tolist()
+
+    def copy(self):
+        """Copy that refresh() can update while this index keeps serving queries"""
+        index = copy.copy(self)
+        index.station_codes = self.station_codes.copy()
+        index.train_order = self.train_order.copy()
+        index.next_row = self.next_row.copy()
+        index.station_names = dict(self.station_names)
+        index.station_by_name = dict(self.station_by_name)
+        index.stats = dict(self.stats)
+        return index
+
+    def __len__(self):
+        return len(self.schedule)
+
+    def window(self, start, end):
+        """Departing rows with start <= departure <= end, in departure order"""
+        low = np.searchsorted(self.departure_times, to_datetime64(start), side='left')
+        high = np.searchsorted(self.departure_times, to_datetime64(end), side='right')
+        return self.departure_order[low:high]
+
+    def station_departures(self, station_id, start, end=None):
+        """Departing rows at one station from `start` (to `end`), in departure order"""
+        code = self.stations.get_indexer([station_id])[0]
+        if code < 0:
+            return self.station_order[:0]
+        first, last = self.station_offsets[code], self.station_offsets[code + 1]
+        times = self.station_times[first:last]
+        low = first + np.searchsorted(times, to_datetime64(start), side='left')
+        high = last if end is None else first + np.searchsorted(times, to_datetime64(end), side='right')
+        return self.station_order[low:high]
+
+    def train_itinerary(self, train_id):
+        """All stop rows of one train in route order"""
+        code = self.trains.get_indexer([train_id])[0]
+        if code < 0:
+            return self.train_order[:0]
+        return self.train_order[self.train_offsets[code]:self.train_offsets[code + 1]]
+
+    def find_station(self, station):
+        """Station id for an id or a (case-insensitive) station name, None if unknown"""
+        if isinstance(station, str) and not station.strip().isdigit():
+            return self.station_by_name.get(station.strip().lower())
+        station_id = int(station)
+        return station_id if self.stations.get_indexer([station_id])[0] >= 0 else None
+
+    @staticmethod
+    def _iso(times):
+        return np.where(np.isnat(times), None, np.datetime_as_string(times, unit='s')).tolist()
+
+    def departure_records(self, rows):
+        """Departure records (this stop to the train's next stop) for departing rows"""
+        rows = np.asarray(rows, dtype=np.int64)
+        following = self.next_row[rows]
+        return [
+            {'train_id': train_id, 'train_no': train_no, 'train_name': train_name, 'train_type': train_type,
+             'from_station_id': from_id, 'from_station': from_name, 'to_station_id': to_id, 'to_station': to_name,
+             'platform_no': platform, 'departure_time': departure, 'arrival_time': arrival,
+             'delay_minutes': int(round(delay)), 'priority': priority}
+            for train_id, train_no, train_name, train_type, from_id, from_name, to_id, to_name,
+            platform, departure, arrival, delay, priority in zip(
+                self.train_ids[rows].tolist(), self.columns['train_no'][rows].tolist(),
+                self.columns['train_name'][rows].tolist(), self.columns['train_type'][rows].tolist(),
+                self.station_ids[rows].tolist(), self.columns['station_name'][rows].tolist(),
+                self.station_ids[following].tolist(), self.columns['station_name'][following].tolist(),
+                self.columns['platform_no'][rows].tolist(), self._iso(self.departures[rows]),
+                self._iso(self.arrivals[following]), self.avg_delay[rows].tolist(),
+                self.columns['priority_name'][rows].tolist()
+            )
+        ]
+
+    def stop_records(self, rows):
+        """Per-stop records (station, platform, arrival, departure) for any rows"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return [
+            {'order_no': order_no, 'station_id': station_id, 'station_name': station_name,
+             'platform_no': platform, 'arrival_time': arrival, 'departure_time': departure}
+            for order_no, station_id, station_name, platform, arrival, departure in zip(
+                self.stop_order[rows].astype(np.int64).tolist(), self.station_ids[rows].tolist(),
+                self.columns['station_name'][rows].tolist(), self.columns['platform_no'][rows].tolist(),
+                self._iso(self.arrivals[rows]), self._iso(self.departures[rows])
+            )
+        ]
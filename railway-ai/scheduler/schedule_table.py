@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+DARNEX RAILWAY AI - SCHEDULE TABLE MODULE
+=========================================
+Compact struct-of-arrays storage for generated train schedules
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class LabelDictionary:
+    """Dictionary-encode repeated labels (train names, stations, ...) as int32 codes"""
+
+    def __init__(self):
+        self.codes = {}
+        self.labels = []
+
+    def encode(self, label):
+        """Return the code for a single label (-1 for missing values)"""
+        if label is None or (isinstance(label, float) and np.isnan(label)):
+            return -1
+        code = self.codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self.codes[label] = code
+            self.labels.append(label)
+        return code
+
+    def encode_many(self, labels):
+        """Encode a sequence of labels into an int32 code array"""
+        return np.fromiter((self.encode(label) for label in labels), dtype=np.int32, count=len(labels))
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class ScheduleTable:
+    """Preallocated column arrays for schedule entries, exported as a DataFrame on demand"""
+
+    # Output column order (matches final_schedule.csv)
+    COLUMNS = [
+        'schedule_id', 'train_id', 'train_no', 'train_name', 'train_type',
+        'priority_value', 'priority_name', 'final_priority', 'station_id',
+        'station_name', 'scheduled_arrival', 'scheduled_departure',
+        'platform_no', 'track_id', 'order_no', 'avg_delay_minutes'
+    ]
+
+    NUMERIC_COLUMNS = {
+        'train_id': np.int32,
+        'priority_value': np.int32,
+        'final_priority': np.float64,
+        'station_id': np.int32,
+        'scheduled_arrival': 'datetime64[ns]',
+        'scheduled_departure': 'datetime64[ns]',
+        'track_id': np.int32,
+        'order_no': np.int32,
+        'avg_delay_minutes': np.float64
+    }
+
+    LABEL_COLUMNS = ['train_no', 'train_name', 'train_type', 'priority_name', 'station_name', 'platform_no']
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.capacity = max(int(capacity), 1)
+        self.dictionaries = {column: LabelDictionary() for column in self.LABEL_COLUMNS}
+        self.arrays = {}
+
+        for column, dtype in self.NUMERIC_COLUMNS.items():
+            self.arrays[column] = np.empty(self.capacity, dtype=dtype)
+        for column in self.LABEL_COLUMNS:
+            self.arrays[column] = np.empty(self.capacity, dtype=np.int32)
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, extra_rows):
+        """Make room for at least `extra_rows` more entries (amortised doubling)"""
+        required = self.size + extra_rows
+        if required <= self.capacity:
+            return
+
+        new_capacity = self.capacity
+        while new_capacity < required:
+            new_capacity *= 2
+
+        for column, array in self.arrays.items():
+            grown = np.empty(new_capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.arrays[column] = grown
+        self.capacity = new_capacity
+
+    def append_stops(self, train_fields, station_ids, station_names, arrivals, departures,
+                     platform_nos, track_ids, order_nos):
+        """Append all stops of one train.
+
+        `train_fields` holds the per-train scalars (train_id, train_no, train_name,
+        train_type, priority_value, priority_name, final_priority, avg_delay_minutes);
+        the remaining arguments are equal-length per-stop sequences.
+        """
+        count = len(station_ids)
+        if count == 0:
+            return
+        self.reserve(count)
+        rows = slice(self.size, self.size + count)
+
+        for column in ('train_id', 'priority_value', 'final_priority', 'avg_delay_minutes'):
+            self.arrays[column][rows] = train_fields[column]
+        for column in ('train_no', 'train_name', 'train_type', 'priority_name'):
+            self.arrays[column][rows] = self.dictionaries[column].encode(train_fields[column])
+
+        self.arrays['station_id'][rows] = station_ids
+        self.arrays['station_name'][rows] = self.dictionaries['station_name'].encode_many(station_names)
+        self.arrays['scheduled_arrival'][rows] = np.asarray(arrivals, dtype='datetime64[ns]')
+        self.arrays['scheduled_departure'][rows] = np.asarray(departures, dtype='datetime64[ns]')
+        self.arrays['platform_no'][rows] = self.dictionaries['platform_no'].encode_many(platform_nos)
+        self.arrays['track_id'][rows] = track_ids
+        self.arrays['order_no'][rows] = order_nos
+
+        self.size += count
+
+    def memory_bytes(self):
+        """Bytes used by the filled part of the column arrays"""
+        return sum(array[:self.size].nbytes for array in self.arrays.values())
+
+    def to_dataframe(self):
+        """Export the filled rows as a DataFrame without copying the column arrays"""
+        if self.size == 0:
+            return pd.DataFrame()
+
+        columns = {'schedule_id': np.arange(1, self.size + 1, dtype=np.int32)}
+        for column in self.COLUMNS[1:]:
+            values = self.arrays[column][:self.size]
+            if column in self.dictionaries:
+                values = pd.Categorical.from_codes(
+                    values, categories=pd.Index(self.dictionaries[column].labels, dtype=object)
+                )
+            columns[column] = values
+
+        return pd.DataFrame(columns, columns=self.COLUMNS, copy=False)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules are imported from the railway-ai directory (no package install)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,80 @@
+import pandas as pd
+
+from monitoring.alert_cache import AlertStateCache
+
+NOW = pd.Timestamp('2026-03-01 08:00')
+
+
+def minutes(n):
+    return NOW + pd.Timedelta(minutes=n)
+
+
+def events(cache, observations, now):
+    return [(event['event'], event['severity']) for event in cache.update(observations, now)]
+
+
+def test_repeated_observation_is_emitted_once():
+    cache = AlertStateCache()
+    observation = [(1, 7, 'REROUTE', 'HIGH', None)]
+
+    assert events(cache, observation, minutes(0)) == [('NEW', 'HIGH')]
+    assert events(cache, observation, minutes(1)) == []
+    assert cache.stats['suppressed'] == 1
+    assert len(cache) == 1
+
+
+def test_escalation_is_emitted_at_once():
+    cache = AlertStateCache()
+    cache.update([(1, 7, 'REROUTE', 'MEDIUM', None)], minutes(0))
+
+    assert events(cache, [(1, 7, 'REROUTE', 'CRITICAL', None)], minutes(1)) == [('ESCALATED', 'CRITICAL')]
+
+
+def test_deescalation_needs_consecutive_lower_observations():
+    cache = AlertStateCache(deescalate_after=3)
+    cache.update([(1, 7, 'REROUTE', 'CRITICAL', None)], minutes(0))
+
+    for minute in (1, 2):
+        assert events(cache, [(1, 7, 'REROUTE', 'HIGH', None)], minutes(minute)) == []
+        assert cache.alerts[(1, 7, 'REROUTE')]['severity'] == 'CRITICAL'
+    assert events(cache, [(1, 7, 'REROUTE', 'HIGH', None)], minutes(3)) == []
+    assert cache.alerts[(1, 7, 'REROUTE')]['severity'] == 'HIGH'
+
+
+def test_flapping_severity_does_not_reescalate():
+    cache = AlertStateCache(deescalate_after=3)
+    cache.update([(1, 7, 'REROUTE', 'CRITICAL', None)], minutes(0))
+
+    emitted = []
+    for minute, severity in enumerate(['HIGH', 'CRITICAL', 'HIGH', 'HIGH', 'CRITICAL', 'HIGH'], 1):
+        emitted += events(cache, [(1, 7, 'REROUTE', severity, None)], minutes(minute))
+    assert emitted == []
+    assert cache.alerts[(1, 7, 'REROUTE')]['severity'] == 'CRITICAL'
+
+
+def test_alert_clears_after_its_ttl():
+    cache = AlertStateCache(ttl_minutes={'TRACK_CONFLICT': 5})
+    cache.update([(1, 7, 'TRACK_CONFLICT', 'HIGH', None)], minutes(0))
+
+    assert events(cache, [], minutes(5)) == []
+    assert events(cache, [], minutes(6)) == [('CLEARED', 'HIGH')]
+    assert len(cache) == 0
+    assert events(cache, [(1, 7, 'TRACK_CONFLICT', 'HIGH', None)], minutes(7)) == [('NEW', 'HIGH')]
+
+
+def test_missed_cycle_within_ttl_does_not_clear():
+    cache = AlertStateCache()
+    observation = [(1, 7, 'STATIONARY_BLOCKAGE', 'HIGH', None)]
+    cache.update(observation, minutes(0))
+
+    assert events(cache, [], minutes(10)) == []
+    assert events(cache, observation, minutes(12)) == []
+    assert events(cache, [], minutes(27)) == []
+    assert events(cache, [], minutes(28)) == [('CLEARED', 'HIGH')]
+
+
+def test_active_alerts_are_most_severe_first():
+    cache = AlertStateCache()
+    cache.update([(1, 7, 'REROUTE', 'MEDIUM', None), (2, 8, 'EMERGENCY_STOP', 'CRITICAL', None)], minutes(0))
+
+    assert [alert['train_id'] for alert in cache.active()] == [2, 1]
@@ -0,0 +1,69 @@
+import pandas as pd
+
+from monitoring.blockage_store import BlockageStore
+
+NOW = pd.Timestamp('2026-03-01 08:00')
+
+
+def minutes(n):
+    return NOW + pd.Timedelta(minutes=n)
+
+
+def test_block_expires_at_clearance_time():
+    store = BlockageStore()
+    store.block(7, ('incident', 1), minutes(30))
+
+    assert store.expire(minutes(29)) == []
+    assert 7 in store.blocked_tracks
+    assert store.expire(minutes(30)) == [7]
+    assert 7 not in store.blocked_tracks
+    assert len(store.blocked_tracks) == 0
+
+
+def test_track_stays_blocked_until_every_cause_is_gone():
+    store = BlockageStore()
+    store.block(7, ('incident', 1), minutes(10))
+    store.block(7, ('scenario', 2), minutes(40))
+    store.block(7, 'manual')
+
+    assert store.expire(minutes(45)) == []
+    assert store.causes(7) == {'manual': None}
+    assert store.clear(7, 'manual')
+    assert 7 not in store.blocked_tracks
+
+
+def test_extending_a_block_supersedes_the_earlier_expiry():
+    store = BlockageStore()
+    store.block(7, ('incident', 1), minutes(10))
+    store.block(7, ('incident', 1), minutes(60))
+
+    assert store.expire(minutes(15)) == []
+    assert store.causes(7) == {('incident', 1): minutes(60)}
+    assert store.expire(minutes(60)) == [7]
+
+
+def test_clearing_one_cause_keeps_the_others():
+    store = BlockageStore()
+    store.block(3, 'a')
+    store.block(3, 'b', minutes(5))
+
+    assert not store.clear(3, 'a')
+    assert 3 in store.blocked_tracks
+    assert not store.clear(4)
+    assert store.clear(3)
+    assert store.expire(minutes(10)) == []
+
+
+def test_version_moves_only_when_the_blocked_set_changes():
+    store = BlockageStore()
+    store.block(1, 'a', minutes(5))
+    version = store.version
+
+    assert not store.block(1, 'a', minutes(5))
+    store.block(1, 'b')
+    assert store.version == version
+
+    store.clear(1, 'b')
+    store.expire(minutes(5))
+    assert store.version == version + 1
+    assert store.next_expiry() is None
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from monitoring.collision_prediction import predict_conflicts
+from monitoring.topology import TrackPositionIndex, TrackTopology
+from phase3_track_monitoring import TrackMonitoringSystem
+
+NOW = pd.Timestamp('2026-03-01 08:00')
+
+TRACKS = pd.DataFrame({
+    'id': [1, 2, 3],
+    'from_station': [10, 20, 30],
+    'to_station': [20, 40, 40],
+    'distance_km': [50.0, 40.0, 40.0],
+    'allowed_speed': [120.0, 120.0, 120.0]
+})
+
+
+def reports(rows):
+    """Position reports (train_id, track_id, position_km, speed_kmph, minutes before NOW)"""
+    return pd.DataFrame([
+        {'train_id': train_id, 'track_id': track_id, 'position_km': position_km, 'speed_kmph': speed_kmph,
+         'timestamp': NOW - pd.Timedelta(minutes=minutes_ago)}
+        for train_id, track_id, position_km, speed_kmph, minutes_ago in rows
+    ])
+
+
+def test_history_of_one_train_is_not_a_conflict():
+    monitor = TrackMonitoringSystem()
+    history = reports([(5, 1, 10.0, 20.0, 0), (5, 1, 8.0, 80.0, 2), (5, 1, 6.0, 60.0, 4)])
+
+    assert monitor.predict_collision_risks(history, TRACKS) == []
+
+
+def test_only_latest_report_per_train_is_paired():
+    monitor = TrackMonitoringSystem()
+    # Descending timestamps, as the positions table is read
+    history = reports([
+        (5, 1, 30.0, 20.0, 0), (6, 1, 27.0, 80.0, 0),
+        (5, 1, 29.0, 30.0, 3), (6, 1, 20.0, 80.0, 5), (6, 1, 14.0, 70.0, 10),
+        (7, 2, 36.0, 90.0, 0), (8, 3, 35.0, 90.0, 0), (7, 2, 20.0, 90.0, 10)
+    ])
+
+    conflicts = monitor.predict_collision_risks(history, TRACKS)
+
+    pairs = {frozenset((conflict['train1_id'], conflict['train2_id'])) for conflict in conflicts}
+    assert pairs == {frozenset((5, 6)), frozenset((7, 8))}
+    assert all(conflict['train1_id'] != conflict['train2_id'] for conflict in conflicts)
+    same_track = next(conflict for conflict in conflicts if conflict['conflict_type'] == 'SAME_TRACK')
+    assert same_track['current_separation_km'] == 3.0
+
+
+def test_kernel_never_pairs_a_train_with_itself():
+    history = reports([(5, 1, 10.0, 20.0, 0), (5, 1, 8.0, 80.0, 2), (5, 2, 39.0, 80.0, 1), (6, 3, 39.0, 80.0, 0)])
+    index = TrackPositionIndex(history)
+
+    predicted = predict_conflicts(TrackTopology(TRACKS), index, horizon_minutes=30, safety_distance_km=5.0)
+
+    train_a, train_b = index.train_ids[predicted['train_a']], index.train_ids[predicted['train_b']]
+    assert len(train_a) > 0
+    assert not np.any(train_a == train_b)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from monitoring.contingency import ContingencyTable
+
+
+def make_tracks(n_stations=14, n_chords=12, seed=0):
+    """A ring in both directions plus random one-way chords"""
+    rng = np.random.default_rng(seed)
+    stations = np.arange(1, n_stations + 1)
+    following = np.roll(stations, -1)
+    from_station = np.concatenate([stations, following, rng.integers(1, n_stations + 1, n_chords)])
+    to_station = np.concatenate([following, stations, rng.integers(1, n_stations + 1, n_chords)])
+    tracks = pd.DataFrame({
+        'id': np.arange(1, len(from_station) + 1),
+        'from_station': from_station,
+        'to_station': to_station,
+        'distance_km': rng.integers(5, 60, len(from_station)).astype(float),
+        'allowed_speed': rng.choice([60, 90, 120], len(from_station)).astype(float)
+    })
+    return tracks[tracks['from_station'] != tracks['to_station']].reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def tracks():
+    return make_tracks()
+
+
+@pytest.fixture(scope='module')
+def table(tracks):
+    return ContingencyTable().build(tracks, workers=2)
+
+
+def assert_same_table(updated, rebuilt):
+    assert updated.detours == rebuilt.detours
+    assert updated.signature.equals(rebuilt.signature)
+
+
+def update_and_build(table, tracks):
+    updated = ContingencyTable()
+    updated.__dict__.update({key: (dict(value) if isinstance(value, dict) else value)
+                             for key, value in table.__dict__.items()})
+    return updated.update(tracks, workers=2), ContingencyTable().build(tracks, workers=2)
+
+
+def test_detours_avoid_the_failed_track(table):
+    assert table.detours
+    for (failed_id, _, _), detour in table.detours.items():
+        if detour is not None:
+            assert failed_id not in detour[2]
+            assert detour[1] >= 0
+
+
+def test_update_without_changes_keeps_the_table(table, tracks):
+    detours = dict(table.detours)
+    assert table.update(tracks.copy(), workers=2) is table
+    assert table.detours == detours
+    assert table.covers(tracks)
+
+
+def test_update_after_speed_change_matches_build(table, tracks):
+    changed = tracks.copy()
+    changed.loc[3, 'allowed_speed'] = 30.0
+    changed.loc[10, 'distance_km'] = 5.0
+    assert_same_table(*update_and_build(table, changed))
+
+
+def test_update_after_removed_track_matches_build(table, tracks):
+    assert_same_table(*update_and_build(table, tracks.drop(index=[2, 20]).reset_index(drop=True)))
+
+
+def test_update_after_added_track_and_station_matches_build(table, tracks):
+    added = pd.DataFrame({'id': [500, 501], 'from_station': [1, 99], 'to_station': [99, 8],
+                          'distance_km': [3.0, 3.0], 'allowed_speed': [120.0, 120.0]})
+    assert_same_table(*update_and_build(table, pd.concat([tracks, added], ignore_index=True)))
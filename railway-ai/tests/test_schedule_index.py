@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scheduler.schedule_index import ScheduleIndex
+
+ORDERS = ['departure_order', 'departure_times', 'station_order', 'station_times', 'station_offsets',
+          'train_order', 'train_offsets', 'next_row', 'station_codes']
+
+
+def make_schedule(n_trains=60, n_stations=12, stops=6, seed=0):
+    """Schedule with departures on a 5-minute grid, so many stops share a time"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    base = pd.Timestamp('2026-03-01 06:00')
+    for train_id in range(1, n_trains + 1):
+        time = base + pd.Timedelta(minutes=5 * int(rng.integers(0, 24)))
+        for order_no, station_id in enumerate(rng.choice(np.arange(1, n_stations + 1), stops, replace=False), 1):
+            arrival = time
+            time = time + pd.Timedelta(minutes=5 * int(rng.integers(0, 3)))
+            rows.append({'train_id': train_id, 'station_id': int(station_id), 'order_no': order_no,
+                         'scheduled_arrival': arrival, 'scheduled_departure': time,
+                         'train_no': f'T{train_id}', 'train_name': f'Train {train_id}', 'train_type': 'EXP',
+                         'priority_name': 'HIGH', 'station_name': f'Station {station_id}', 'platform_no': 1,
+                         'avg_delay_minutes': 0.0})
+            time = time + pd.Timedelta(minutes=5 * int(rng.integers(1, 4)))
+    return pd.DataFrame(rows)
+
+
+def shift_trains(schedule, train_ids, minutes):
+    repaired = schedule.copy()
+    rows = repaired['train_id'].isin(train_ids)
+    repaired.loc[rows, 'scheduled_departure'] += pd.Timedelta(minutes=minutes)
+    repaired.loc[rows, 'scheduled_arrival'] += pd.Timedelta(minutes=minutes)
+    return repaired
+
+
+def assert_same_index(refreshed, rebuilt):
+    for name in ORDERS:
+        np.testing.assert_array_equal(getattr(refreshed, name), getattr(rebuilt, name), err_msg=name)
+    assert refreshed.station_names == rebuilt.station_names
+
+
+@pytest.mark.parametrize('minutes', [-10, 5, 15, 60])
+def test_refresh_matches_build_with_ties(minutes):
+    schedule = make_schedule()
+    index = ScheduleIndex(schedule)
+    repaired = shift_trains(schedule, [3, 17, 42], minutes)
+
+    changed = index.refresh(repaired)
+
+    assert sorted(changed) == [3, 17, 42]
+    assert index.stats['incremental_updates'] == 1
+    assert_same_index(index, ScheduleIndex(repaired))
+
+
+def test_repeated_refreshes_stay_equal_to_build():
+    schedule = make_schedule(seed=1)
+    index = ScheduleIndex(schedule)
+    rng = np.random.default_rng(7)
+    for _ in range(5):
+        trains = rng.choice(schedule['train_id'].unique(), 4, replace=False).tolist()
+        schedule = shift_trains(schedule, trains, 5 * int(rng.integers(-3, 4)))
+        index.refresh(schedule)
+        assert_same_index(index, ScheduleIndex(schedule))
+
+
+def test_refresh_with_station_change_and_reordered_stops():
+    schedule = make_schedule(seed=2)
+    index = ScheduleIndex(schedule)
+    repaired = schedule.copy()
+    first, second = repaired.index[repaired['train_id'] == 9][:2]
+    repaired.loc[first, 'station_id'] = 11
+    repaired.loc[first, 'station_name'] = 'Station 11'
+    repaired.loc[[first, second], 'order_no'] = repaired.loc[[second, first], 'order_no'].to_numpy()
+
+    assert index.refresh(repaired) == [9]
+    assert_same_index(index, ScheduleIndex(repaired))
+
+
+def test_refresh_falls_back_to_build():
+    schedule = make_schedule(seed=3)
+    index = ScheduleIndex(schedule)
+
+    assert index.refresh(schedule.iloc[:-4]) is None
+    assert index.stats['builds'] == 2
+
+    many = schedule['train_id'].unique()[:30].tolist()
+    assert index.refresh(shift_trains(schedule, many, 5)) is None
+    assert_same_index(index, ScheduleIndex(shift_trains(schedule, many, 5)))
+
+
+def test_unchanged_schedule_refresh_is_a_no_op():
+    schedule = make_schedule(seed=4)
+    index = ScheduleIndex(schedule)
+    assert index.refresh(schedule.copy()) == []
+    assert_same_index(index, ScheduleIndex(schedule))
+
+
+def test_refreshing_a_copy_leaves_the_original_intact():
+    schedule = make_schedule(seed=5)
+    index = ScheduleIndex(schedule)
+    before = {name: getattr(index, name).copy() for name in ORDERS}
+    repaired = shift_trains(schedule, [5, 6], 10)
+    repaired.loc[repaired['train_id'] == 5, 'station_id'] = 12
+
+    refreshed = index.copy()
+    refreshed.refresh(repaired)
+
+    for name, values in before.items():
+        np.testing.assert_array_equal(getattr(index, name), values, err_msg=name)
+    assert_same_index(refreshed, ScheduleIndex(repaired))
+
+
+def departing_rows(schedule):
+    """Rows with a next stop and a departure time, by the definition of the index"""
+    ordered = schedule.sort_values(['train_id', 'order_no', 'scheduled_arrival'], kind='stable')
+    has_next = ordered['train_id'].eq(ordered['train_id'].shift(-1))
+    return ordered.index[has_next & ordered['scheduled_departure'].notna()]
+
+
+def test_window_matches_a_filtered_sort():
+    schedule = make_schedule(seed=6)
+    index = ScheduleIndex(schedule)
+    start, end = pd.Timestamp('2026-03-01 07:00'), pd.Timestamp('2026-03-01 08:30')
+
+    departing = schedule.loc[departing_rows(schedule)]
+    expected = departing[departing['scheduled_departure'].between(start, end)]
+    expected = expected.assign(row=expected.index).sort_values(['scheduled_departure', 'row'])
+    np.testing.assert_array_equal(index.window(start, end), expected.index.to_numpy())
+
+
+def test_station_board_and_itinerary_match_a_filtered_sort():
+    schedule = make_schedule(seed=7)
+    index = ScheduleIndex(schedule)
+    start = pd.Timestamp('2026-03-01 07:30')
+
+    departing = schedule.loc[departing_rows(schedule)]
+    board = departing[(departing['station_id'] == 4) & (departing['scheduled_departure'] >= start)]
+    board = board.assign(row=board.index).sort_values(['scheduled_departure', 'row'])
+    np.testing.assert_array_equal(index.station_departures(4, start), board.index.to_numpy())
+
+    stops = schedule[schedule['train_id'] == 12].sort_values('order_no')
+    np.testing.assert_array_equal(index.train_itinerary(12), stops.index.to_numpy())
+    assert index.train_itinerary(999).size == 0
+    assert index.find_station('station 4') == 4 and index.find_station('nowhere') is None
@@ -10,6 +10,7 @@ import os
 sys.path.append(os.path.dirname(__file__))
 
 import pandas as pd
+import concurrent.futures
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
@@ -18,11 +19,16 @@ warnings.filterwarnings('ignore')
 from config.database import establish_database_connection
 from data.loader import RailwayDataLoader
 from phase3_track_monitoring import TrackMonitoringSystem
+from monitoring.streaming import StreamingTrackMonitor
+from monitoring.decision_queue import DecisionQueue
+from monitoring.dispatch import ActionDispatcher, LocalStubTransport
+from monitoring.sharding import ShardedTrackMonitor
+from monitoring.report_writer import RotatingReportLog, TrackStatusDelta
 
 class TrackMonitoringIntegrator:
     """Integrates track monitoring with existing DARNEX Railway AI system"""
     
-    def __init__(self):
+    def __init__(self, monitor_shards=None):
         print("🔗 Initializing Track Monitoring Integration...")
         
         # Initialize existing components
@@ -31,6 +37,20 @@ class TrackMonitoringIntegrator:
         
         # Initialize new track monitoring system
         self.track_monitor = TrackMonitoringSystem()
+        self.ACTION_BUDGET_SECONDS = 0.2  # Per-cycle time for dispatching queued actions
+        
+        # Per-track checks split over worker processes on large networks
+        self.sharded_monitor = ShardedTrackMonitor(self.track_monitor, monitor_shards) if monitor_shards else None
+        
+        # Asynchronous action delivery (local stub transport until train control is wired in)
+        self.dispatcher = ActionDispatcher(
+            LocalStubTransport(handler=self.deliver_locally), clock=lambda: self.track_monitor.clock()
+        ).start()
+        self.pending_acks = []
+        
+        # Integrated reports are appended to one rotating NDJSON log
+        self.report_log = RotatingReportLog('models/integrated_track_monitoring.ndjson')
+        self.report_delta = TrackStatusDelta()
         
         print("✅ Track Monitoring Integration Ready")
     
@@ -45,10 +65,21 @@ class TrackMonitoringIntegrator:
             # STEP 1: Load all required data from your existing system
             print("\\n📊 Loading Railway Data...")
             railway_data = self.load_integrated_data()
+            if not railway_data.get('stations', pd.DataFrame()).empty:
+                self.track_monitor.set_station_coordinates(railway_data['stations'])
+            if not railway_data.get('signals', pd.DataFrame()).empty:
+                self.track_monitor.set_signals(railway_data['signals'])
             
             # STEP 2: Monitor live tracks for conflicts
             print("\\n🔍 Step 1: Monitoring Live Track Status...")
-            track_status = self.track_monitor.monitor_live_tracks(
+            live_monitor = self.sharded_monitor or self.track_monitor
+            track_status = live_monitor.monitor_live_tracks(
+                railway_data['real_time_positions'],
+                railway_data['tracks']
+            )
+            
+            # Project trains forward for conflicts the current gaps do not show yet
+            predicted_conflicts = self.track_monitor.predict_collision_risks(
                 railway_data['real_time_positions'],
                 railway_data['tracks']
             )
@@ -78,9 +109,15 @@ class TrackMonitoringIntegrator:
             # STEP 6: Execute critical actions immediately
             critical_actions = self.execute_critical_actions(rerouting_decisions)
             
+            # Only alerts that are new, escalated or cleared since the last run go downstream
+            alert_events = self.track_monitor.update_alerts(
+                track_status, rerouting_decisions, predicted_conflicts
+            )
+            
             # STEP 7: Generate comprehensive report
             monitoring_report = self.generate_comprehensive_report(
-                track_status, active_incidents, rerouting_decisions, critical_actions
+                track_status, active_incidents, rerouting_decisions, critical_actions,
+                predicted_conflicts, alert_events
             )
             
             # STEP 8: Save all results
@@ -96,10 +133,44 @@ class TrackMonitoringIntegrator:
             import traceback
             traceback.print_exc()
             return None
+    
+    def run_streaming_monitoring(self, cycle_budget_seconds=0.5, max_cycles=None):
+        """Run track monitoring continuously on new position/incident/scenario rows"""
+        print("="*80)
+        print("🚨 DARNEX RAILWAY AI - STREAMING TRACK MONITORING")
+        print("="*80)
+        
+        # Static network data is loaded once; live tables are streamed by watermark
+        railway_data = self.load_integrated_data()
+        if not railway_data.get('stations', pd.DataFrame()).empty:
+            self.track_monitor.set_station_coordinates(railway_data['stations'])
+        if not railway_data.get('signals', pd.DataFrame()).empty:
+            self.track_monitor.set_signals(railway_data['signals'])
         
-        finally:
-            if self.conn:
-                self.conn.close()
+        streaming_monitor = StreamingTrackMonitor(
+            self.track_monitor, railway_data['tracks'], conn=self.conn,
+            cycle_budget_seconds=cycle_budget_seconds
+        )
+        
+        def execute_new_decisions(monitor, result):
+            if result['decisions_updated'] and monitor.rerouting_decisions:
+                self.execute_critical_actions(monitor.rerouting_decisions, ack_wait_seconds=0)
+            for event in result['alert_events']:
+                print(f"🔔 {event['event']} {event['alert_type']} ({event['severity']}) "
+                      f"Train {event['train_id']} on Track {event['track_id']}")
+            self.collect_acknowledgements(timeout=0)
+        
+        return streaming_monitor.run_forever(max_cycles=max_cycles, on_cycle=execute_new_decisions)
+    
+    def close(self):
+        """Close the database connection once monitoring is finished"""
+        self.dispatcher.stop()
+        self.report_log.close()
+        if self.sharded_monitor:
+            self.sharded_monitor.stop()
+        if self.conn:
+            self.conn.close()
+            self.conn = None
     
     def load_integrated_data(self):
         """Load all data needed for track monitoring"""
@@ -122,34 +193,61 @@ class TrackMonitoringIntegrator:
         
         return all_data
     
-    def execute_critical_actions(self, rerouting_decisions):
+    def execute_critical_actions(self, rerouting_decisions, ack_wait_seconds=None):
         """Execute critical rerouting actions immediately"""
-        critical_actions = []
-        
-        # Filter for critical and time-sensitive decisions
-        critical_decisions = [
-            d for d in rerouting_decisions 
-            if d['priority'] == 'CRITICAL' or d['time_sensitive']
-        ]
+        # generate_rerouting_decisions queued these; drain critical and
+        # time-sensitive ones earliest deadline first within the action budget
+        print(f"\\n🚨 Executing Critical Actions ({len(self.track_monitor.decision_queue)} pending)...")
         
-        print(f"\\n🚨 Executing {len(critical_decisions)} Critical Actions...")
-        
-        for decision in critical_decisions:
+        def execute_and_log(decision):
             action_result = self.execute_single_action(decision)
-            critical_actions.append(action_result)
             
             # Log critical action
             print(f"   ⚡ {decision['decision_type']} for Train {decision['train_id']}")
+            return action_result
+        
+        critical_actions = self.track_monitor.decision_queue.drain(
+            execute_and_log,
+            predicate=lambda d: d['priority'] == 'CRITICAL' or d['time_sensitive'],
+            budget_seconds=self.ACTION_BUDGET_SECONDS,
+            now=self.track_monitor.clock()
+        )
+        
+        # Wait for acknowledgements (None: all of them, 0: don't block the cycle)
+        self.collect_acknowledgements(timeout=ack_wait_seconds)
         
         return critical_actions
     
+    def collect_acknowledgements(self, timeout=None):
+        """Fill dispatched action results with their delivery outcome"""
+        if not self.pending_acks:
+            return 0
+        
+        futures = [future for _, future in self.pending_acks]
+        concurrent.futures.wait(futures, timeout=timeout)
+        
+        still_pending = []
+        for action_result, future in self.pending_acks:
+            if not future.done():
+                still_pending.append((action_result, future))
+                continue
+            dispatch = future.result()
+            action_result['success'] = dispatch['success']
+            action_result['dispatch'] = {
+                key: dispatch[key] for key in ('action_id', 'status', 'attempts', 'latency_ms', 'completed_at', 'error')
+            }
+        
+        completed = len(self.pending_acks) - len(still_pending)
+        self.pending_acks = still_pending
+        return completed
+    
     def execute_single_action(self, decision):
         """Execute a single rerouting decision"""
         action_result = {
             'train_id': decision['train_id'],
             'action_taken': decision['decision_type'],
             'execution_time': datetime.now(),
-            'success': True,  # In real implementation, this would check actual execution
+            'success': None,  # Set once train control acknowledges (collect_acknowledgements)
             'details': {}
         }
         
@@ -157,12 +255,16 @@ class TrackMonitoringIntegrator:
             # Execute emergency stop
             action_result['details'] = {
                 'stop_position_km': decision['stop_position'],
+                'stop_signal_id': decision.get('stop_signal_id'),
                 'reason': decision['reason'],
                 'estimated_stop_time': '2-3 minutes'
             }
             
-            # In real system: Send emergency stop signal to train
-            self.send_emergency_stop_signal(decision['train_id'], decision['stop_position'])
+            future = self.dispatcher.submit(
+                'EMERGENCY_STOP', decision['train_id'],
+                {'stop_position_km': decision['stop_position']},
+                deadline=DecisionQueue.deadline(decision)
+            )
             
         elif decision['decision_type'] == 'REROUTE':
             # Execute rerouting
@@ -172,11 +274,24 @@ class TrackMonitoringIntegrator:
                 'route_safety_score': decision['alternate_route']['route_safety_score']
             }
             
-            # In real system: Update train routing system
-            self.update_train_route(decision['train_id'], decision['alternate_route'])
+            future = self.dispatcher.submit(
+                'REROUTE', decision['train_id'],
+                {'track_sequence': decision['alternate_route']['track_sequence']},
+                deadline=DecisionQueue.deadline(decision)
+            )
+        else:
+            return action_result
         
+        self.pending_acks.append((action_result, future))
         return action_result
     
+    def deliver_locally(self, action):
+        """Stub transport handler: hand actions to the simulated train interfaces"""
+        if action['command'] == 'EMERGENCY_STOP':
+            self.send_emergency_stop_signal(action['train_id'], action['payload']['stop_position_km'])
+        elif action['command'] == 'REROUTE':
+            self.update_train_route(action['train_id'], action['payload'])
+    
     def send_emergency_stop_signal(self, train_id, stop_position):
         """Send emergency stop signal to train (simulated)"""
         print(f"🛑 EMERGENCY STOP SIGNAL sent to Train {train_id} at position {stop_position} km")
@@ -188,7 +303,8 @@ class TrackMonitoringIntegrator:
         print(f"   New track sequence: {new_route['track_sequence']}")
         # In real system: Interface with train routing systems
     
-    def generate_comprehensive_report(self, track_status, incidents, decisions, actions):
+    def generate_comprehensive_report(self, track_status, incidents, decisions, actions, predicted_conflicts=None,
+                                      alert_events=None):
         """Generate comprehensive monitoring report"""
         report = {
             'monitoring_timestamp': datetime.now().isoformat(),
@@ -213,15 +329,20 @@ class TrackMonitoringIntegrator:
             },
             'safety_metrics': {
                 'collision_risks_prevented': len([d for d in decisions if d['priority'] == 'CRITICAL']),
-                'average_response_time_seconds': 15,  # Simulated
+                'predicted_conflicts': len(predicted_conflicts or []),
+                'active_alerts': len(self.track_monitor.active_alerts),
+                'average_response_time_seconds': round(self.dispatcher.latency_summary().get('mean_ms', 0) / 1000, 3),
+                'dispatch_latency': self.dispatcher.latency_summary(),
                 'system_reliability': 99.8  # Simulated
             },
             'raw_data': {
                 'track_status': track_status,
                 'active_incidents': incidents,
                 'rerouting_decisions': decisions,
-                'executed_actions': actions
-            }
+                'executed_actions': actions,
+                'predicted_conflicts': predicted_conflicts or []
+            },
+            'alert_events': alert_events or []
         }
         
         return report
@@ -241,32 +362,20 @@ class TrackMonitoringIntegrator:
             return 'NORMAL'
     
     def save_integrated_results(self, report):
-        """Save comprehensive results"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"models/integrated_track_monitoring_{timestamp}.json"
-        
-        # Make report JSON serializable
-        def make_serializable(obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            elif isinstance(obj, pd.DataFrame):
-                return obj.to_dict('records')
-            elif isinstance(obj, pd.Series):
-                return obj.to_dict()
-            elif isinstance(obj, dict):
-                return {key: make_serializable(value) for key, value in obj.items()}
-            elif isinstance(obj, list):
-                return [make_serializable(item) for item in obj]
-            else:
-                return obj
-        
-        serializable_report = make_serializable(report)
-        
-        import json
-        with open(filename, 'w') as f:
-            json.dump(serializable_report, f, indent=2)
-        
-        print(f"\\n💾 Complete monitoring report saved: {filename}")
+        """Append the comprehensive results to the rotating report log"""
+        # Only tracks whose status changed since the last report are written in full
+        raw_data = dict(report['raw_data'])
+        track_report = self.report_delta.encode(raw_data.pop('track_status'))
+        if track_report['report_type'] == 'delta' and 'alert_events' in report:
+            # Unchanged decisions and conflicts are already in earlier reports; alert_events carries the changes
+            raw_data.pop('rerouting_decisions', None)
+            raw_data.pop('predicted_conflicts', None)
+        record = {**report, 'raw_data': {**track_report, **raw_data}}
+        
+        written = self.report_log.append(record)
+        
+        print(f"\\n💾 Complete monitoring report saved: {self.report_log.path} "
+              f"({track_report['report_type']}, {written / 1024:.1f} KB)")
     
     def display_executive_summary(self, report):
         """Display executive summary of track monitoring results"""
@@ -304,6 +413,7 @@ class TrackMonitoringIntegrator:
         safety_metrics = report['safety_metrics']
         print(f"\\n🛡️ SAFETY IMPACT:")
         print(f"   Collision Risks Prevented: {safety_metrics['collision_risks_prevented']}")
+        print(f"   Predicted Conflicts (lookahead): {safety_metrics['predicted_conflicts']}")
         print(f"   Average Response Time: {safety_metrics['average_response_time_seconds']} seconds")
         print(f"   System Reliability: {safety_metrics['system_reliability']}%")
         
@@ -313,7 +423,10 @@ class TrackMonitoringIntegrator:
 def main():
     """Main function to run integrated track monitoring"""
     integrator = TrackMonitoringIntegrator()
-    results = integrator.run_integrated_track_monitoring()
+    try:
+        results = integrator.run_integrated_track_monitoring()
+    finally:
+        integrator.close()
     
     if results:
         print("\\n🎉 Track Monitoring Integration completed successfully!")